@@ -0,0 +1,197 @@
+import os
+import json
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+
+from .config import CACHE_ENABLED, CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES
+from .metrics import CACHE_REQUESTS
+from .projects import DEFAULT_PROJECT
+
+# Cache namespaces
+TEST_CASES = "test_cases"
+SCRIPTS = "scripts"
+
+
+def test_case_namespace(project_id: str):
+    """
+    Test cases are cached per project so one project's ingestion only
+    invalidates its own answers.
+    """
+    return TEST_CASES if project_id == DEFAULT_PROJECT else f"{TEST_CASES}:{project_id}"
+
+
+def make_key(*parts):
+    """
+    Stable cache key from JSON-serialisable parts.
+    """
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def normalize_query(query: str):
+    return " ".join(query.lower().split())
+
+
+class ResponseCache:
+    """
+    Persistent (SQLite) cache for LLM responses with TTL expiry and LRU eviction.
+    get_or_compute also coalesces identical concurrent requests onto one
+    in-flight call.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float, max_entries: int, enabled: bool = True):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._conn = None
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def _connection(self):
+        if self._conn is None:
+            folder = os.path.dirname(self.path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, last_access REAL NOT NULL, "
+                "PRIMARY KEY (namespace, key))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON entries (last_access)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, namespace: str, key: str):
+        if not self.enabled:
+            return None
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT value, created_at FROM entries WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+            if row is None:
+                return None
+            value, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM entries WHERE namespace = ? AND key = ?", (namespace, key))
+                conn.commit()
+                return None
+            conn.execute(
+                "UPDATE entries SET last_access = ? WHERE namespace = ? AND key = ?",
+                (now, namespace, key)
+            )
+            conn.commit()
+        return json.loads(value)
+
+    def set(self, namespace: str, key: str, value):
+        if not self.enabled:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (namespace, key, value, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), now, now)
+            )
+            # Evict least recently used entries beyond the cap
+            (count,) = conn.execute("SELECT COUNT(*) FROM entries").fetchone()
+            if count > self.max_entries:
+                conn.execute(
+                    "DELETE FROM entries WHERE rowid IN "
+                    "(SELECT rowid FROM entries ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                )
+            conn.commit()
+
+    def clear(self, namespace: str = None):
+        with self._lock:
+            conn = self._connection()
+            if namespace is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE namespace = ?", (namespace,))
+            conn.commit()
+
+    def lookup(self, namespace: str, key: str):
+        """
+        get() that also records the hit/miss for stats.
+        """
+        value = self.get(namespace, key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        CACHE_REQUESTS.inc(namespace=namespace, result="miss" if value is None else "hit")
+        return value
+
+    # Every hit updates last_access and every write counts and commits: the
+    # SQLite work (and its fsyncs) must not block the event loop
+    async def alookup(self, namespace: str, key: str):
+        return await asyncio.to_thread(self.lookup, namespace, key)
+
+    async def aset(self, namespace: str, key: str, value):
+        await asyncio.to_thread(self.set, namespace, key, value)
+
+    async def get_or_compute(self, namespace: str, key: str, compute, cache_if=None):
+        """
+        Returns the cached value, or awaits compute() and caches its result
+        (unless cache_if(result) is false). Concurrent callers with the same
+        key share a single compute() call.
+        """
+        value = await self.alookup(namespace, key)
+        if value is not None:
+            return value
+
+        flight_key = (namespace, key)
+        pending = self._in_flight.get(flight_key)
+        if pending is not None:
+            self.coalesced += 1
+            CACHE_REQUESTS.inc(namespace=namespace, result="coalesced")
+            # shield: one waiter giving up must not cancel the shared call
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[flight_key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an un-awaited future does not log a warning
+            future.exception()
+            raise
+        else:
+            # Waiters get the value right away; the write happens after
+            future.set_result(value)
+            if cache_if is None or cache_if(value):
+                await self.aset(namespace, key, value)
+        finally:
+            self._in_flight.pop(flight_key, None)
+        return value
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+response_cache = ResponseCache(CACHE_PATH, CACHE_TTL_SECONDS, CACHE_MAX_ENTRIES, enabled=CACHE_ENABLED)
@@ -0,0 +1,130 @@
+import re
+import json
+
+from .stream_parser import IncrementalJSONParser
+
+# ---------------------------------------------------------
+# Validated test-case records.
+#
+# The model's answer is parsed incrementally (stream_parser) and every
+# object is checked against the record shape the rest of the app uses:
+# test_id, description, expected_result and grounded_in, all non-empty
+# strings. Key spelling is normalised ("Expected Result", "Test_ID").
+# What does not validate (or parse, or was cut off) is kept as an
+# invalid item so that only those can be re-requested.
+# ---------------------------------------------------------
+
+RECORD_FIELDS = ("test_id", "description", "expected_result", "grounded_in")
+# Other names models use for the same fields
+FIELD_ALIASES = {
+    "id": "test_id", "testid": "test_id", "test_case_id": "test_id",
+    "test_scenario": "description", "scenario": "description", "summary": "description", "title": "description",
+    "expected": "expected_result", "expected_outcome": "expected_result", "expected_results": "expected_result",
+    "source": "grounded_in", "grounding": "grounded_in", "reference": "grounded_in",
+}
+# Invalid items are quoted back to the model up to this length
+MAX_RAW_CHARS = 1500
+
+KEY_RE = re.compile(r"[\s\-]+")
+TEST_ID_RE = re.compile(r'"test[_ ]?id"\s*:\s*"([^"]+)"', re.IGNORECASE)
+
+
+def _text(value):
+    if isinstance(value, list):
+        value = ", ".join(str(v) for v in value)
+    return "" if value is None else str(value).strip()
+
+
+def validate_test_case(item):
+    """
+    Returns (record, None) for a valid test case, (None, reason) otherwise.
+    The record holds exactly RECORD_FIELDS.
+    """
+    if not isinstance(item, dict):
+        return None, "not a JSON object"
+    fields = {}
+    for key, value in item.items():
+        key = KEY_RE.sub("_", str(key).strip().lower())
+        fields.setdefault(FIELD_ALIASES.get(key, key), value)
+    record = {field: _text(fields.get(field)) for field in RECORD_FIELDS}
+    missing = [field for field in RECORD_FIELDS if not record[field]]
+    if missing:
+        return None, f"missing {', '.join(missing)}"
+    return record, None
+
+
+class TestCaseCollector:
+    """
+    Feeds an answer (whole or token by token) through the incremental
+    parser and sorts what comes out into valid records and invalid items
+    ({"raw", "error", "test_id"}). Repeated test ids get a suffix.
+    """
+
+    def __init__(self):
+        self.parser = IncrementalJSONParser()
+        self.records = []
+        self.invalid = []
+        self._ids = set()
+        self._errors_seen = 0
+
+    def _accept(self, items):
+        accepted = []
+        for item in items:
+            record, error = validate_test_case(item)
+            if error is not None:
+                raw = item if isinstance(item, str) else json.dumps(item)
+                self.add_invalid(raw, error)
+                continue
+            accepted.append(self.add_record(record))
+        return accepted
+
+    def _collect_errors(self):
+        for failure in self.parser.errors[self._errors_seen:]:
+            self.add_invalid(failure["raw"], failure["error"])
+        self._errors_seen = len(self.parser.errors)
+
+    def add_record(self, record):
+        base, n = record["test_id"], 1
+        while record["test_id"] in self._ids:
+            n += 1
+            record["test_id"] = f"{base}-{n}"
+        self._ids.add(record["test_id"])
+        self.records.append(record)
+        return record
+
+    def add_invalid(self, raw: str, error: str):
+        match = TEST_ID_RE.search(raw)
+        self.invalid.append({"raw": raw[:MAX_RAW_CHARS], "error": error, "test_id": match.group(1) if match else None})
+
+    def feed(self, text: str):
+        """
+        Returns the records completed by this text.
+        """
+        accepted = self._accept(self.parser.feed(text))
+        self._collect_errors()
+        return accepted
+
+    def finish(self):
+        """
+        Returns the records only found at the end (single object, fenced
+        JSON). An answer with no test case at all becomes one invalid item.
+        """
+        accepted = self._accept(self.parser.finish())
+        self._collect_errors()
+        if not self.records and not self.invalid:
+            self.add_invalid(self.parser.buffer.strip(), "no test cases found")
+        return accepted
+
+    @property
+    def test_ids(self):
+        return set(self._ids)
+
+
+def parse_test_cases(answer: str):
+    """
+    (records, invalid items) of a complete answer.
+    """
+    collector = TestCaseCollector()
+    collector.feed(answer)
+    collector.finish()
+    return collector.records, collector.invalid
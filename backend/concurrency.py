@@ -0,0 +1,100 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+from .config import MAX_CONCURRENT_GENERATIONS, MAX_QUEUED_GENERATIONS, QUEUE_TIMEOUT_SECONDS
+
+
+class QueueFullError(Exception):
+    """
+    Raised when every generation slot is busy and the wait queue is full
+    (or the wait timed out). The app turns it into a 429.
+    """
+
+
+class LLMUnavailableError(RuntimeError):
+    """
+    Every LLM route stayed rate limited or failing through all retries
+    (raised by llm_gateway). The app turns it into a 503.
+    """
+
+    def __init__(self, message: str, retry_after: float = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class ConcurrencyLimiter:
+    """
+    Caps how many LLM generations run at once. Callers beyond the cap wait
+    in a bounded queue; once the queue is full they are rejected immediately
+    instead of piling up behind slow requests.
+    """
+
+    def __init__(self, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.queued = 0
+
+    def check_admission(self):
+        """
+        Raises QueueFullError if a new request would be turned away right now.
+        """
+        # Admitted requests = running + waiting; anything past the sum is turned away
+        if self.in_flight + self.queued >= self.max_concurrent + self.max_queued:
+            raise QueueFullError("Generation queue is full, retry shortly.")
+
+    async def acquire(self):
+        """
+        Takes a slot (waiting in the queue if needed); pair with release().
+        Raises QueueFullError when turned away or the wait times out.
+        """
+        self.check_admission()
+
+        self.queued += 1
+        # asyncio.wait, not wait_for: wait_for on Python <= 3.11 can time out
+        # after the acquire succeeded and leak the permit (and asyncio.timeout
+        # needs 3.11). A cancelled acquire never takes a permit.
+        waiter = asyncio.ensure_future(self._semaphore.acquire())
+        try:
+            await asyncio.wait({waiter}, timeout=self.queue_timeout)
+        except BaseException:
+            # The request itself was cancelled while queued
+            self._abandon(waiter)
+            raise
+        finally:
+            self.queued -= 1
+        if not waiter.done():
+            self._abandon(waiter)
+            raise QueueFullError("Timed out waiting for a generation slot, retry shortly.")
+        self.in_flight += 1
+
+    def _abandon(self, waiter):
+        if not waiter.done():
+            waiter.cancel()
+        elif not waiter.cancelled() and waiter.exception() is None:
+            self._semaphore.release()
+
+    def release(self):
+        self.in_flight -= 1
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def status(self):
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queued": self.max_queued,
+        }
+
+
+generation_limiter = ConcurrencyLimiter(MAX_CONCURRENT_GENERATIONS, MAX_QUEUED_GENERATIONS, QUEUE_TIMEOUT_SECONDS)
@@ -0,0 +1,140 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# ---------------------------------------------------------
+# Storage
+# ---------------------------------------------------------
+DB_PATH = os.getenv("DB_PATH", "./vector_db")
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./temp_uploads")
+# Uploads wait here until their ingestion job runs
+STAGING_DIR = os.getenv("STAGING_DIR", "./temp_staging")
+# Target pages registered once by clients and referenced by html_id afterwards
+PAGES_DIR = os.getenv("PAGES_DIR", "./temp_pages")
+MAX_PAGES = int(os.getenv("MAX_PAGES", "256"))
+# Every project other than "default" gets PROJECTS_DIR/<project_id>/{vector_db,uploads}
+PROJECTS_DIR = os.getenv("PROJECTS_DIR", "./projects")
+# Open vector-store handles kept warm, by count and by index size on disk
+MAX_OPEN_PROJECTS = int(os.getenv("MAX_OPEN_PROJECTS", "16"))
+PROJECT_CACHE_MAX_MB = float(os.getenv("PROJECT_CACHE_MAX_MB", "1024"))
+# Ingestion jobs of different projects that may run at the same time
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "2"))
+# Processes that read and split uploaded files during ingestion (1 = in-process)
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# ---------------------------------------------------------
+# Models
+# ---------------------------------------------------------
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "sentence-transformers/all-MiniLM-L6-v2")
+# Embedding engine: "torch" (sentence-transformers), "onnx" or "onnx-int8" (ONNX Runtime, CPU)
+EMBEDDING_ENGINE = os.getenv("EMBEDDING_ENGINE", "torch").lower()
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "64"))
+# >1 encodes large ingestion batches across this many worker processes (torch engine)
+EMBEDDING_PROCESSES = int(os.getenv("EMBEDDING_PROCESSES", "1"))
+EMBEDDING_DEVICE = os.getenv("EMBEDDING_DEVICE", "cpu")
+# ONNX Runtime intra-op threads (0 = one per core)
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", "0"))
+# ONNX model files inside the model repo (int8 default targets AVX2 CPUs)
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "onnx/model.onnx")
+EMBEDDING_ONNX_INT8_FILE = os.getenv("EMBEDDING_ONNX_INT8_FILE", "onnx/model_quint8_avx2.onnx")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.3-70b-versatile")
+LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.1"))
+# Hugging Face tokenizer used to count prompt tokens (Llama 3 family, like LLM_MODEL)
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "Xenova/Meta-Llama-3.1-Tokenizer")
+
+# ---------------------------------------------------------
+# Retrieval
+# ---------------------------------------------------------
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", "3"))
+# Context packing: RETRIEVER_FETCH_K candidates are reordered by MMR, merged,
+# de-duplicated and packed until CONTEXT_TOKEN_BUDGET (or CONTEXT_MAX_CHUNKS) is reached
+RETRIEVER_FETCH_K = int(os.getenv("RETRIEVER_FETCH_K", "12"))
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1200"))
+CONTEXT_MAX_CHUNKS = int(os.getenv("CONTEXT_MAX_CHUNKS", "6"))
+# 1.0 = pure relevance, 0.0 = pure diversity
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Word-shingle Jaccard similarity above which two chunks count as duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.8"))
+# "chroma" (persistent Chroma/SQLite) or "numpy" (memory-mapped brute-force matrix,
+# fastest for corpora up to tens of thousands of chunks)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma").lower()
+# Storage precision of the numpy index: "float32" or "float16" (half the memory)
+NUMPY_INDEX_DTYPE = os.getenv("NUMPY_INDEX_DTYPE", "float32")
+
+# ---------------------------------------------------------
+# Concurrency
+# ---------------------------------------------------------
+# LLM generations allowed to run at once per worker process
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "8"))
+# Requests allowed to wait for a slot before we answer 429
+MAX_QUEUED_GENERATIONS = int(os.getenv("MAX_QUEUED_GENERATIONS", "16"))
+# Longest a queued request waits for a slot before giving up with 429
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("QUEUE_TIMEOUT_SECONDS", "30"))
+# Thread pool for blocking work (vector search, embedding) called from async code
+BLOCKING_WORKERS = int(os.getenv("BLOCKING_WORKERS", "16"))
+
+# Send a compact DOM digest instead of the raw HTML in script prompts
+DOM_DIGEST_ENABLED = os.getenv("DOM_DIGEST_ENABLED", "true").lower() == "true"
+
+# ---------------------------------------------------------
+# Response cache
+# ---------------------------------------------------------
+CACHE_ENABLED = os.getenv("CACHE_ENABLED", "true").lower() == "true"
+CACHE_PATH = os.getenv("CACHE_PATH", "./cache/responses.sqlite3")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", str(24 * 3600)))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "2000"))
+
+# ---------------------------------------------------------
+# LLM gateway
+# ---------------------------------------------------------
+# Provider limits, applied per API key and model
+LLM_REQUESTS_PER_MINUTE = int(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+LLM_TOKENS_PER_MINUTE = int(os.getenv("LLM_TOKENS_PER_MINUTE", "12000"))
+# Rough completion size reserved from the token budget per call
+LLM_OUTPUT_TOKENS = int(os.getenv("LLM_OUTPUT_TOKENS", os.getenv("SCRIPT_OUTPUT_TOKENS", "800")))
+# Comma-separated keys to rotate across (GROQ_API_KEY is used when unset)
+GROQ_API_KEYS = [k.strip() for k in os.getenv("GROQ_API_KEYS", "").split(",") if k.strip()]
+# Point the client at another OpenAI-compatible server (e.g. benchmarks/stub_llm_server.py)
+LLM_BASE_URL = os.getenv("LLM_BASE_URL") or None
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+# Retries of 429 / 5xx / connection errors, with full-jitter exponential backoff
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "0.5"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+# Smaller/faster model used while LLM_MODEL breaches its SLOs (empty disables)
+LLM_FALLBACK_MODEL = os.getenv("LLM_FALLBACK_MODEL", "llama-3.1-8b-instant")
+LLM_SLO_P95_SECONDS = float(os.getenv("LLM_SLO_P95_SECONDS", "30"))
+LLM_SLO_ERROR_RATE = float(os.getenv("LLM_SLO_ERROR_RATE", "0.25"))
+# SLOs are judged over the last LLM_SLO_WINDOW calls (once LLM_SLO_MIN_CALLS were made)
+LLM_SLO_WINDOW = int(os.getenv("LLM_SLO_WINDOW", "50"))
+LLM_SLO_MIN_CALLS = int(os.getenv("LLM_SLO_MIN_CALLS", "10"))
+LLM_FALLBACK_SECONDS = float(os.getenv("LLM_FALLBACK_SECONDS", "60"))
+# Scripts generated in parallel by one batch request
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "4"))
+# Feature queries accepted by one test-plan request (generated BATCH_MAX_PARALLEL at a time)
+PLAN_MAX_FEATURES = int(os.getenv("PLAN_MAX_FEATURES", "20"))
+# Test cases from different features whose description + expected result
+# overlap at least this much (word-shingle Jaccard) are merged into one
+PLAN_DEDUP_THRESHOLD = float(os.getenv("PLAN_DEDUP_THRESHOLD", "0.6"))
+# Follow-up calls that re-request only the malformed or incomplete test cases
+# of an answer (0 disables; the valid ones are always kept)
+TEST_CASE_REPAIR_ATTEMPTS = int(os.getenv("TEST_CASE_REPAIR_ATTEMPTS", "1"))
+
+# ---------------------------------------------------------
+# Script runner
+# ---------------------------------------------------------
+# POST /run-scripts/ executes the Python it is sent: off unless the
+# operator turns it on (and the API is not reachable by untrusted clients)
+RUNNER_ENABLED = os.getenv("RUNNER_ENABLED", "false").lower() == "true"
+# Browser sessions (one per worker thread), reused from test to test
+RUNNER_WORKERS = int(os.getenv("RUNNER_WORKERS", "4"))
+# "chrome" (headless Chromium) or "fake" (in-process model of checkout.html)
+RUNNER_DRIVER = os.getenv("RUNNER_DRIVER", "chrome").lower()
+# Chromium binary and chromedriver paths (Selenium Manager finds them when unset)
+CHROME_BINARY = os.getenv("CHROME_BINARY") or None
+CHROMEDRIVER_PATH = os.getenv("CHROMEDRIVER_PATH") or None
+RUNNER_TEST_TIMEOUT_SECONDS = float(os.getenv("RUNNER_TEST_TIMEOUT_SECONDS", "60"))
+# Hard limit on a whole suite run through the API
+RUNNER_SUITE_TIMEOUT_SECONDS = float(os.getenv("RUNNER_SUITE_TIMEOUT_SECONDS", "900"))
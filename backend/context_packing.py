@@ -0,0 +1,179 @@
+import re
+
+from .config import CONTEXT_TOKEN_BUDGET, CONTEXT_MAX_CHUNKS, DEDUP_THRESHOLD
+from .tokens import count_tokens
+
+# ---------------------------------------------------------
+# Context packing between the retriever and the prompt.
+#
+# Candidates arrive in MMR order (relevant but diverse). Near-duplicates
+# are dropped, chunks that overlap a neighbour from the same file are
+# stitched back together (the splitter repeats up to 200 characters
+# between consecutive chunks), and the result is filled up to a token
+# budget instead of a fixed k.
+# ---------------------------------------------------------
+
+SHINGLE_SIZE = 5
+# Shortest shared text that counts as a splitter overlap
+MIN_OVERLAP_CHARS = 32
+# Joins documents in the stuffed prompt (create_stuff_documents_chain default)
+DOCUMENT_SEPARATOR = "\n\n"
+
+WORD_RE = re.compile(r"\w+")
+
+
+def shingles(text: str):
+    words = WORD_RE.findall(text.lower())
+    if len(words) < SHINGLE_SIZE:
+        return {tuple(words)}
+    return {tuple(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+
+
+def jaccard(a, b):
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def remove_near_duplicates(docs, threshold: float = DEDUP_THRESHOLD):
+    """
+    Keeps the first of any group of chunks whose word-shingle Jaccard
+    similarity is at least threshold (order is preserved).
+    """
+    kept, kept_shingles = [], []
+    for doc in docs:
+        doc_shingles = shingles(doc.page_content)
+        if any(jaccard(doc_shingles, other) >= threshold for other in kept_shingles):
+            continue
+        kept.append(doc)
+        kept_shingles.append(doc_shingles)
+    return kept
+
+
+def _stitch(first: str, second: str):
+    """
+    first + second without the text they share (second starts with the end
+    of first), or None if they do not overlap.
+    """
+    if second in first:
+        return first
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return None
+    position = first.find(probe)
+    while position != -1:
+        if second.startswith(first[position:]):
+            return first[:position] + second
+        position = first.find(probe, position + 1)
+    return None
+
+
+def merge_overlapping(first: str, second: str, first_start=None, second_start=None):
+    """
+    Merges two chunks of the same file if they overlap, in document order.
+    start_index metadata decides the order when present; otherwise both are tried.
+    """
+    if first_start is not None and second_start is not None:
+        if second_start < first_start:
+            first, second = second, first
+        return _stitch(first, second)
+    return _stitch(first, second) or _stitch(second, first)
+
+
+class _Passage:
+    """
+    One or more stitched chunks of the same source.
+    """
+
+    def __init__(self, doc):
+        self.source = doc.metadata.get("source")
+        self.text = doc.page_content
+        self.start = doc.metadata.get("start_index")
+        self.chunk_ids = [doc.metadata.get("chunk_id") or doc.id or doc.page_content[:32]]
+        self.metadata = dict(doc.metadata)
+
+    def absorb(self, other):
+        merged = merge_overlapping(self.text, other.text, self.start, other.start)
+        if merged is None:
+            return False
+        self.text = merged
+        if self.start is not None and other.start is not None:
+            self.start = min(self.start, other.start)
+        self.chunk_ids.extend(other.chunk_ids)
+        return True
+
+    def to_document(self):
+        from langchain_core.documents import Document
+
+        metadata = dict(self.metadata)
+        metadata["chunk_ids"] = self.chunk_ids
+        metadata["chunk_id"] = "+".join(sorted(self.chunk_ids))
+        if self.start is not None:
+            metadata["start_index"] = self.start
+        return Document(page_content=self.text, metadata=metadata)
+
+
+def _copy(passage):
+    clone = _Passage.__new__(_Passage)
+    clone.source = passage.source
+    clone.text = passage.text
+    clone.start = passage.start
+    clone.chunk_ids = list(passage.chunk_ids)
+    clone.metadata = passage.metadata
+    return clone
+
+
+def _add_passage(passages, candidate):
+    """
+    Returns a new passage list with candidate merged into an overlapping
+    passage of the same source (transitively), or appended.
+    """
+    passages = [_copy(p) for p in passages]
+    for passage in passages:
+        if passage.source == candidate.source and passage.absorb(candidate):
+            # The grown passage may now bridge to another one
+            merged = True
+            while merged:
+                merged = False
+                for other in passages:
+                    if other is not passage and other.source == passage.source and passage.absorb(other):
+                        passages.remove(other)
+                        merged = True
+                        break
+            return passages
+    passages.append(candidate)
+    return passages
+
+
+def _tokens(passages):
+    return count_tokens(DOCUMENT_SEPARATOR.join(p.text for p in passages))
+
+
+def pack_context(candidates, token_budget: int = CONTEXT_TOKEN_BUDGET, max_chunks: int = CONTEXT_MAX_CHUNKS):
+    """
+    Packs candidates (best first) into at most token_budget tokens of context.
+    Returns (documents, stats).
+    """
+    unique = remove_near_duplicates(candidates)
+    passages = []
+    used_chunks = 0
+    for doc in unique:
+        if used_chunks >= max_chunks:
+            break
+        attempt = _add_passage(passages, _Passage(doc))
+        if _tokens(attempt) > token_budget:
+            # Too big for what is left: a later, shorter candidate may still fit
+            continue
+        passages = attempt
+        used_chunks += 1
+
+    docs = [p.to_document() for p in passages]
+    stats = {
+        "candidates": len(candidates),
+        "duplicates_removed": len(candidates) - len(unique),
+        "chunks_used": used_chunks,
+        "passages": len(docs),
+        "context_tokens": _tokens(passages),
+        "token_budget": token_budget,
+    }
+    return docs, stats
@@ -0,0 +1,304 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from html.parser import HTMLParser
+
+# ---------------------------------------------------------
+# Compact DOM digest for script-generation prompts.
+#
+# The LLM only needs what a Selenium script can touch:
+# interactive elements, their ids/names/labels, form structure
+# and which handlers they trigger. Styles, layout markup and
+# script bodies are dropped.
+# ---------------------------------------------------------
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+SKIP_TAGS = {"style", "noscript", "svg", "template"}
+INTERACTIVE_TAGS = {"a", "button", "input", "select", "textarea", "option", "form", "label", "details", "summary"}
+HEADING_TAGS = {"h1", "h2", "h3", "h4", "h5", "h6", "legend"}
+KEPT_ATTRS = ("name", "type", "value", "placeholder", "href", "min", "max", "for", "role", "aria-label", "checked", "disabled", "required", "data-testid")
+
+MAX_TEXT = 60
+DIGEST_CACHE_SIZE = 128
+
+# document.getElementById('x').addEventListener('click', ...) / querySelector('#x')
+LISTENER_RE = re.compile(
+    r"""(?:getElementById\(\s*['"]([\w-]+)['"]\s*\)|querySelector\(\s*['"]([^'"]+)['"]\s*\))"""
+    r"""\s*\.\s*(?:addEventListener\(\s*['"](\w+)['"]|on(\w+)\s*=)"""
+)
+FUNCTION_RE = re.compile(r"function\s+(\w+)\s*\(([^)]*)\)")
+ID_REF_RE = re.compile(r"""getElementById\(\s*[`'"]([\w${}-]+)[`'"]\s*\)""")
+STRING_LITERAL_RE = re.compile(r"""===?\s*['"]([^'"]{1,40})['"]""")
+
+
+class _Node:
+    __slots__ = ("tag", "attrs", "children", "text", "parent")
+
+    def __init__(self, tag, attrs, parent):
+        self.tag = tag
+        self.attrs = attrs
+        self.children = []
+        self.text = []
+        self.parent = parent
+
+    def full_text(self):
+        parts = list(self.text)
+        for child in self.children:
+            parts.append(child.full_text())
+        return " ".join(" ".join(parts).split())
+
+
+class _TreeBuilder(HTMLParser):
+    """
+    Forgiving HTML -> node tree. Script bodies are collected separately.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.root = _Node("#root", {}, None)
+        self.current = self.root
+        self.scripts = []
+        self.title = ""
+        self._in_script = False
+        self._in_title = False
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._skip_depth:
+            if tag in SKIP_TAGS:
+                self._skip_depth += 1
+            return
+        if tag in SKIP_TAGS:
+            self._skip_depth = 1
+            return
+        if tag == "script":
+            self._in_script = True
+            return
+        if tag == "title":
+            self._in_title = True
+            return
+        node = _Node(tag, dict((k, v if v is not None else "") for k, v in attrs), self.current)
+        self.current.children.append(node)
+        if tag not in VOID_TAGS:
+            self.current = node
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS and not self._skip_depth and tag not in ("script", "title") and tag not in SKIP_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if self._skip_depth:
+            if tag in SKIP_TAGS:
+                self._skip_depth -= 1
+            return
+        if tag == "script":
+            self._in_script = False
+            return
+        if tag == "title":
+            self._in_title = False
+            return
+        # Close up to the matching open tag; ignore stray end tags
+        node = self.current
+        while node is not None and node.tag != tag:
+            node = node.parent
+        if node is not None and node.parent is not None:
+            self.current = node.parent
+
+    def handle_data(self, data):
+        if self._skip_depth:
+            return
+        if self._in_script:
+            self.scripts.append(data)
+        elif self._in_title:
+            self.title += data.strip()
+        elif data.strip():
+            self.current.text.append(data.strip())
+
+
+def _short(text: str, limit: int = MAX_TEXT):
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+def _is_hidden(node):
+    classes = node.attrs.get("class", "").split()
+    style = node.attrs.get("style", "").replace(" ", "").lower()
+    return "hidden" in node.attrs or "hidden" in classes or "display:none" in style
+
+
+def _handlers(node):
+    return {k: v for k, v in node.attrs.items() if k.startswith("on")}
+
+
+def _is_kept(node):
+    return (
+        node.tag in INTERACTIVE_TAGS
+        or node.tag in HEADING_TAGS
+        or "id" in node.attrs
+        or bool(_handlers(node))
+    )
+
+
+def _has_kept_descendant(node):
+    return any(_is_kept(child) or _has_kept_descendant(child) for child in node.children)
+
+
+def _label_index(root):
+    """
+    Maps input ids to the text of <label for=...>.
+    """
+    labels = {}
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node.tag == "label" and node.attrs.get("for"):
+            labels[node.attrs["for"]] = node.full_text()
+        stack.extend(node.children)
+    return labels
+
+
+def _context_label(node, labels):
+    """
+    Best human-readable label for a control: label[for], wrapping <label>,
+    or the text of the nearest preceding sibling.
+    """
+    if node.attrs.get("id") in labels:
+        return labels[node.attrs["id"]]
+    parent = node.parent
+    while parent is not None and parent.tag != "#root":
+        if parent.tag == "label":
+            return parent.full_text()
+        if parent.tag in ("form", "body"):
+            break
+        parent = parent.parent
+    if node.parent is not None:
+        siblings = node.parent.children
+        index = siblings.index(node)
+        for sibling in reversed(siblings[:index]):
+            if sibling.tag in INTERACTIVE_TAGS - {"label"}:
+                break
+            text = sibling.full_text()
+            if text:
+                return text
+    return ""
+
+
+def _describe(node, labels):
+    tag = node.tag
+    if tag in HEADING_TAGS:
+        return f"# {_short(node.full_text())}"
+
+    selector = tag
+    if node.attrs.get("id"):
+        selector += f"#{node.attrs['id']}"
+    if tag in ("button", "a", "input", "select", "textarea") and node.attrs.get("class"):
+        selector += "." + ".".join(node.attrs["class"].split()[:2])
+
+    attrs = [f"{k}={_short(node.attrs[k], 40)!r}" if node.attrs[k] else k for k in KEPT_ATTRS if k in node.attrs]
+    parts = [selector + (f"[{' '.join(attrs)}]" if attrs else "")]
+
+    # Containers are described by their children; only leaves carry text
+    if tag not in ("form", "select", "label") and not _has_kept_descendant(node):
+        text = node.full_text()
+        if text:
+            parts.append(f'"{_short(text)}"')
+    for event, code in _handlers(node).items():
+        parts.append(f"{event}={_short(code, 50)!r}")
+    if tag in ("input", "select", "textarea"):
+        label = _context_label(node, labels)
+        if label:
+            parts.append(f"label={_short(label)!r}")
+    if _is_hidden(node):
+        parts.append("(hidden)")
+    return " ".join(parts)
+
+
+def _walk(node, labels, depth, lines):
+    for child in node.children:
+        if child.tag == "label" and child.attrs.get("for"):
+            # Already attached to the control it names
+            continue
+        if child.tag == "label" and not child.children:
+            # Bare text label: folded into the next control's label=
+            continue
+        if _is_kept(child) and child.tag != "label":
+            lines.append("  " * depth + _describe(child, labels))
+            if child.tag not in ("select", "button", "a"):
+                _walk(child, labels, depth + 1, lines)
+            else:
+                for option in (c for c in child.children if c.tag == "option"):
+                    lines.append("  " * (depth + 1) + _describe(option, labels))
+        else:
+            _walk(child, labels, depth, lines)
+
+
+def _script_summary(scripts):
+    code = "\n".join(scripts)
+    # Strip comments before mining the code
+    code = re.sub(r"/\*.*?\*/", "", code, flags=re.S)
+    code = re.sub(r"(?m)//.*$", "", code)
+
+    lines = []
+    listeners = []
+    for by_id, by_selector, event, prop_event in LISTENER_RE.findall(code):
+        target = f"#{by_id}" if by_id else by_selector
+        listeners.append(f"{target} {event or prop_event}")
+    if listeners:
+        lines.append("JS LISTENERS: " + ", ".join(dict.fromkeys(listeners)))
+
+    functions = [f"{name}({' '.join(args.split())})" for name, args in FUNCTION_RE.findall(code)]
+    if functions:
+        lines.append("JS FUNCTIONS: " + ", ".join(dict.fromkeys(functions)))
+
+    ids = ID_REF_RE.findall(code)
+    if ids:
+        lines.append("JS READS/WRITES IDS: " + ", ".join(dict.fromkeys(ids)))
+
+    literals = STRING_LITERAL_RE.findall(code)
+    if literals:
+        lines.append("JS COMPARES AGAINST: " + ", ".join(dict.fromkeys(literals)))
+    return lines
+
+
+def build_dom_digest(html_content: str):
+    """
+    Returns a compact, line-oriented description of the page's
+    interactive structure for use in LLM prompts.
+    """
+    builder = _TreeBuilder()
+    builder.feed(html_content)
+    builder.close()
+
+    labels = _label_index(builder.root)
+    lines = []
+    if builder.title:
+        lines.append(f"TITLE: {builder.title}")
+    _walk(builder.root, labels, 0, lines)
+    lines.extend(_script_summary(builder.scripts))
+    return "\n".join(lines)
+
+
+_digest_cache = OrderedDict()
+_digest_lock = threading.Lock()
+
+
+def get_dom_digest(html_content: str):
+    """
+    build_dom_digest with an LRU cache keyed by the HTML hash, so the same
+    page is only parsed once per process.
+    """
+    html_hash = hashlib.sha256(html_content.encode("utf-8")).hexdigest()
+    with _digest_lock:
+        if html_hash in _digest_cache:
+            _digest_cache.move_to_end(html_hash)
+            return _digest_cache[html_hash]
+
+    digest = build_dom_digest(html_content)
+
+    with _digest_lock:
+        _digest_cache[html_hash] = digest
+        while len(_digest_cache) > DIGEST_CACHE_SIZE:
+            _digest_cache.popitem(last=False)
+    return digest
@@ -0,0 +1,154 @@
+import os
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .config import (
+    EMBEDDING_MODEL_NAME, EMBEDDING_ENGINE, EMBEDDING_BATCH_SIZE, EMBEDDING_PROCESSES,
+    EMBEDDING_DEVICE, EMBEDDING_THREADS, EMBEDDING_ONNX_FILE, EMBEDDING_ONNX_INT8_FILE
+)
+
+# all-MiniLM-L6-v2 was trained with 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+
+def _normalize(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class SentenceTransformerEmbeddings(Embeddings):
+    """
+    sentence-transformers on torch with a tunable batch size and an optional
+    multi-process pool (kept alive between calls) for large ingestion batches.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, processes: int = 1, device: str = "cpu"):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.processes = processes
+        self.model = SentenceTransformer(model_name, device=device)
+        self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = self.model.start_multi_process_pool(["cpu"] * self.processes)
+        return self._pool
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        # A single batch is not worth shipping to the pool
+        if self.processes > 1 and len(texts) > self.batch_size:
+            vectors = self.model.encode_multi_process(texts, self._get_pool(), batch_size=self.batch_size)
+        else:
+            vectors = self.model.encode(texts, batch_size=self.batch_size, convert_to_numpy=True)
+        return _normalize(np.asarray(vectors, dtype=np.float32)).tolist()
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+    def close(self):
+        if self._pool is not None:
+            self.model.stop_multi_process_pool(self._pool)
+            self._pool = None
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    The same MiniLM model exported to ONNX and run on ONNX Runtime (no torch),
+    optionally int8-quantized. Mean pooling + L2 normalisation reproduce the
+    sentence-transformers pipeline. ORT already spreads each batch across all
+    cores, so there is no process pool here.
+    """
+
+    def __init__(self, model_name: str, batch_size: int = 64, quantized: bool = False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        from huggingface_hub import hf_hub_download
+
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.quantized = quantized
+        model_file = EMBEDDING_ONNX_INT8_FILE if quantized else EMBEDDING_ONNX_FILE
+        model_path = hf_hub_download(model_name, model_file)
+
+        self.tokenizer = Tokenizer.from_file(hf_hub_download(model_name, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = EMBEDDING_THREADS or os.cpu_count() or 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+
+    def _encode_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.array([e.ids for e in encodings], dtype=np.int64)
+        attention_mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+
+        token_embeddings = self.session.run(None, feeds)[0]
+        # Mean pooling over real (non-padding) tokens
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return _normalize(pooled.astype(np.float32))
+
+    def embed_documents(self, texts):
+        texts = list(texts)
+        if not texts:
+            return []
+        vectors = [
+            self._encode_batch(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return np.vstack(vectors).tolist()
+
+    def embed_query(self, text: str):
+        return self.embed_documents([text])[0]
+
+
+def create_embedding_engine(engine: str = EMBEDDING_ENGINE, model_name: str = EMBEDDING_MODEL_NAME):
+    if engine == "onnx":
+        return OnnxEmbeddings(model_name, batch_size=EMBEDDING_BATCH_SIZE)
+    if engine == "onnx-int8":
+        return OnnxEmbeddings(model_name, batch_size=EMBEDDING_BATCH_SIZE, quantized=True)
+    if engine == "torch":
+        return SentenceTransformerEmbeddings(
+            model_name, batch_size=EMBEDDING_BATCH_SIZE, processes=EMBEDDING_PROCESSES, device=EMBEDDING_DEVICE
+        )
+    raise ValueError(f"Unknown EMBEDDING_ENGINE: {engine}")
+
+
+def check_retrieval_equivalence(reference, candidate, texts, queries, k: int = 3,
+                                min_cosine: float = 0.98, min_overlap: float = 0.9):
+    """
+    Compares a candidate embedding engine against a reference one:
+    per-text cosine similarity of the two embeddings, and top-k retrieval
+    overlap over `texts` for each query. Passes when the worst cosine is at
+    least min_cosine and the mean top-k overlap at least min_overlap.
+    """
+    ref_docs = np.asarray(reference.embed_documents(texts), dtype=np.float32)
+    cand_docs = np.asarray(candidate.embed_documents(texts), dtype=np.float32)
+    cosines = np.sum(_normalize(ref_docs) * _normalize(cand_docs), axis=1)
+
+    ref_queries = np.asarray(reference.embed_documents(queries), dtype=np.float32)
+    cand_queries = np.asarray(candidate.embed_documents(queries), dtype=np.float32)
+    k = min(k, len(texts))
+    ref_top = np.argsort(-(ref_queries @ ref_docs.T), axis=1)[:, :k]
+    cand_top = np.argsort(-(cand_queries @ cand_docs.T), axis=1)[:, :k]
+    overlaps = [len(set(a) & set(b)) / k for a, b in zip(ref_top, cand_top)]
+
+    report = {
+        "min_cosine": round(float(cosines.min()), 5),
+        "mean_cosine": round(float(cosines.mean()), 5),
+        "mean_topk_overlap": round(float(np.mean(overlaps)), 4),
+        "k": k,
+    }
+    report["equivalent"] = report["min_cosine"] >= min_cosine and report["mean_topk_overlap"] >= min_overlap
+    return report
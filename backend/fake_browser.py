@@ -0,0 +1,274 @@
+import re
+
+# ---------------------------------------------------------
+# In-process stand-in for a Selenium WebDriver that models
+# assets/checkout.html (cart, coupons, shipping, checkout form).
+#
+# Lets the script runner execute generated scripts without a browser:
+# on CI, in benchmarks, or on a box without Chromium.
+# ---------------------------------------------------------
+
+PRICES = {"headphones": 150, "keyboard": 100}
+EMAIL_RE = re.compile(r"^[^\s@]+@[^\s@]+\.[^\s@]+$")
+# input[name="shipping"][value="express"] and friends
+ATTRIBUTE_RE = re.compile(r'\[\s*([\w-]+)\s*=\s*["\']?([^"\'\]]+)["\']?\s*\]')
+
+
+class NoSuchElementException(Exception):
+    pass
+
+
+class FakeElement:
+    def __init__(self, page, element_id: str, tag: str = "div", text: str = "", value: str = "",
+                 name: str = None, checked: bool = False, hidden: bool = False):
+        self.page = page
+        self.id = element_id
+        self.tag_name = tag
+        self._text = text
+        self.value = value
+        self.name = name
+        self.checked = checked
+        self.hidden = hidden
+
+    @property
+    def text(self):
+        return "" if self.hidden else self._text
+
+    def get_attribute(self, name: str):
+        if name == "value":
+            return self.value
+        if name == "id":
+            return self.id
+        if name == "checked":
+            return "true" if self.checked else None
+        if name == "class":
+            return "hidden" if self.hidden else ""
+        return None
+
+    def get_dom_attribute(self, name: str):
+        return self.get_attribute(name)
+
+    def is_displayed(self):
+        return not self.hidden and not self.page.section_hidden(self.id)
+
+    def is_enabled(self):
+        return True
+
+    def is_selected(self):
+        return self.checked
+
+    def clear(self):
+        self.value = ""
+
+    def send_keys(self, *keys):
+        self.value += "".join(str(k) for k in keys)
+        if self.id.startswith("qty-"):
+            self.page.calculate_total()
+
+    def click(self):
+        self.page.click(self)
+
+    def submit(self):
+        self.page.submit_form()
+
+    def find_element(self, by, value):
+        return self.page.find_element(by, value)
+
+    def find_elements(self, by, value):
+        return self.page.find_elements(by, value)
+
+
+class CheckoutPage:
+    """
+    Python port of the page's script: addToCart, calculateTotal,
+    the coupon handler and the form validation.
+    """
+
+    def __init__(self):
+        self.discount = 0.0
+        self.free_shipping = False
+        self.submitted = False
+        elements = [
+            FakeElement(self, "btn-add-headphones", "button", "Add to Cart"),
+            FakeElement(self, "btn-add-keyboard", "button", "Add to Cart"),
+            FakeElement(self, "qty-headphones", "input", value="0"),
+            FakeElement(self, "qty-keyboard", "input", value="0"),
+            FakeElement(self, "total-price", "span", "0.00"),
+            FakeElement(self, "discount-code", "input"),
+            FakeElement(self, "apply-coupon-btn", "button", "Apply"),
+            FakeElement(self, "coupon-message", "p"),
+            FakeElement(self, "fullname", "input"),
+            FakeElement(self, "error-name", "div", "Name is required", hidden=True),
+            FakeElement(self, "email", "input"),
+            FakeElement(self, "error-email", "div", "Invalid email format", hidden=True),
+            FakeElement(self, "shipping-standard", "input", value="standard", name="shipping", checked=True),
+            FakeElement(self, "shipping-express", "input", value="express", name="shipping"),
+            FakeElement(self, "payment-cc", "input", value="cc", name="payment"),
+            FakeElement(self, "payment-paypal", "input", value="paypal", name="payment"),
+            FakeElement(self, "pay-now-btn", "button", "Pay Now"),
+            FakeElement(self, "checkout-form", "form"),
+            FakeElement(self, "cart-summary", "div"),
+            FakeElement(self, "success-msg", "div", "Payment Successful!", hidden=True),
+        ]
+        self.elements = {e.id: e for e in elements}
+        self.calculate_total()
+
+    def _quantity(self, item: str):
+        try:
+            return int(float(self.elements[f"qty-{item}"].value or 0))
+        except ValueError:
+            return 0
+
+    def calculate_total(self):
+        subtotal = sum(self._quantity(item) * price for item, price in PRICES.items())
+        shipping = 0
+        if self.elements["shipping-express"].checked:
+            shipping = 0 if subtotal > 200 else 10
+        if self.free_shipping:
+            shipping = 0
+        total = max(0.0, subtotal - subtotal * self.discount + shipping)
+        self.elements["total-price"]._text = f"{total:.2f}"
+
+    def apply_coupon(self):
+        code = self.elements["discount-code"].value.strip().upper()
+        message = self.elements["coupon-message"]
+        self.discount = 0.0
+        self.free_shipping = False
+        if code == "SAVE15":
+            self.discount = 0.15
+            message._text = "15% Discount Applied!"
+        elif code == "FREESHIP":
+            self.free_shipping = True
+            message._text = "Free Shipping Applied!"
+        else:
+            message._text = "Invalid Coupon"
+        self.calculate_total()
+
+    def submit_form(self):
+        name_ok = bool(self.elements["fullname"].value.strip())
+        email_ok = bool(EMAIL_RE.match(self.elements["email"].value.strip()))
+        self.elements["error-name"].hidden = name_ok
+        self.elements["error-email"].hidden = email_ok
+        if name_ok and email_ok:
+            self.submitted = True
+            self.elements["success-msg"].hidden = False
+
+    def section_hidden(self, element_id: str):
+        return self.submitted and element_id in ("checkout-form", "cart-summary")
+
+    def click(self, element):
+        if element.id.startswith("btn-add-"):
+            quantity = self.elements[element.id.replace("btn-add-", "qty-")]
+            quantity.value = str(int(float(quantity.value or 0)) + 1)
+            self.calculate_total()
+        elif element.id == "apply-coupon-btn":
+            self.apply_coupon()
+        elif element.id == "pay-now-btn":
+            self.submit_form()
+        elif element.name:
+            for other in self.elements.values():
+                if other.name == element.name:
+                    other.checked = other is element
+            if element.name == "shipping":
+                self.calculate_total()
+
+    def find_elements(self, by, value):
+        by = str(by).lower()
+        if by == "id":
+            return [self.elements[value]] if value in self.elements else []
+        if by == "name":
+            return [e for e in self.elements.values() if e.name == value or (e.name is None and e.id == value)]
+        if by in ("css selector", "xpath"):
+            if value.startswith("#"):
+                return self.find_elements("id", value[1:])
+            attributes = dict(ATTRIBUTE_RE.findall(value.replace("@", "")))
+            if "id" in attributes:
+                return self.find_elements("id", attributes["id"])
+            if attributes:
+                return [
+                    e for e in self.elements.values()
+                    if all((e.name if key == "name" else e.get_attribute(key)) == wanted for key, wanted in attributes.items())
+                ]
+        if by == "tag name":
+            return [e for e in self.elements.values() if e.tag_name == value]
+        return []
+
+    def find_element(self, by, value):
+        found = self.find_elements(by, value)
+        if not found:
+            raise NoSuchElementException(f"no element for {by}={value!r}")
+        return found[0]
+
+
+class FakeCheckoutDriver:
+    """
+    The subset of the WebDriver API generated scripts use. Any get()
+    loads a fresh CheckoutPage; quit() makes later calls fail, like a
+    closed browser.
+    """
+
+    def __init__(self):
+        self.page = None
+        self.current_url = "about:blank"
+        self.closed = False
+        self.pages_loaded = 0
+
+    def _check(self):
+        if self.closed:
+            raise RuntimeError("fake browser session is closed")
+
+    def get(self, url: str):
+        self._check()
+        self.current_url = url
+        self.page = None if url == "about:blank" else CheckoutPage()
+        self.pages_loaded += 1
+
+    def refresh(self):
+        self.get(self.current_url)
+
+    def find_element(self, by="id", value=None):
+        self._check()
+        if self.page is None:
+            raise NoSuchElementException("no page loaded")
+        return self.page.find_element(by, value)
+
+    def find_elements(self, by="id", value=None):
+        self._check()
+        return self.page.find_elements(by, value) if self.page else []
+
+    def execute_script(self, script, *args):
+        self._check()
+        if "document.readyState" in script:
+            return "complete"
+        return None
+
+    def delete_all_cookies(self):
+        self._check()
+
+    def implicitly_wait(self, seconds):
+        pass
+
+    def set_page_load_timeout(self, seconds):
+        pass
+
+    def set_window_size(self, width, height):
+        pass
+
+    def maximize_window(self):
+        pass
+
+    def save_screenshot(self, filename):
+        return False
+
+    @property
+    def title(self):
+        return "Checkout" if self.page else ""
+
+    @property
+    def page_source(self):
+        return "" if self.page is None else "<html>checkout</html>"
+
+    def quit(self):
+        self.closed = True
+
+    close = quit
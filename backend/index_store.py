@@ -0,0 +1,96 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+
+from .config import DB_PATH
+
+# ---------------------------------------------------------
+# Blue/green index generations.
+#
+# Every build writes a complete vector DB into its own
+# directory (DB_PATH/gen-...). A small pointer file names the
+# generation queries should use; it is replaced atomically
+# once the new generation is fully persisted, so readers
+# never see a half-built DB.
+# ---------------------------------------------------------
+
+POINTER_FILE = "current.json"
+GENERATION_PREFIX = "gen-"
+
+def _read_pointer(db_root: str = DB_PATH):
+    pointer_path = os.path.join(db_root, POINTER_FILE)
+    if not os.path.exists(pointer_path):
+        return {}
+    with open(pointer_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def active_db_path(db_root: str = DB_PATH):
+    """
+    Path of the generation currently serving queries, or None before the first build.
+    """
+    active = _read_pointer(db_root).get("active")
+    if not active:
+        return None
+    return os.path.join(db_root, active)
+
+def new_generation_path(db_root: str = DB_PATH):
+    name = f"{GENERATION_PREFIX}{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    return os.path.join(db_root, name)
+
+def prepare_generation(db_root: str = DB_PATH, copy_active: bool = True):
+    """
+    Creates the side directory for the next build, seeded with a copy of the
+    active generation so the incremental diff only has to apply the changes.
+    copy_active=False starts from an empty directory (full rebuild).
+    """
+    os.makedirs(db_root, exist_ok=True)
+    new_path = new_generation_path(db_root)
+    current = active_db_path(db_root)
+    if copy_active and current and os.path.isdir(current):
+        shutil.copytree(current, new_path)
+    else:
+        os.makedirs(new_path)
+    return new_path
+
+def activate_generation(new_path: str, db_root: str = DB_PATH):
+    """
+    Atomically points queries at new_path and garbage-collects generations
+    older than the previous one (which may still be serving in-flight requests).
+    """
+    pointer = _read_pointer(db_root)
+    new_pointer = {
+        "active": os.path.basename(new_path),
+        "previous": pointer.get("active"),
+        "activated_at": time.time(),
+    }
+    pointer_path = os.path.join(db_root, POINTER_FILE)
+    tmp_path = pointer_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(new_pointer, f)
+    os.replace(tmp_path, pointer_path)
+
+    keep = {new_pointer["active"], new_pointer["previous"]}
+    for name in os.listdir(db_root):
+        if name.startswith(GENERATION_PREFIX) and name not in keep:
+            discard_generation(os.path.join(db_root, name))
+
+def discard_generation(path: str):
+    close_vector_store(path)
+    shutil.rmtree(path, ignore_errors=True)
+
+def close_vector_store(db_path: str):
+    """
+    Stops the Chroma system this process has open on db_path, if any.
+    chromadb keeps one system (SQLite connection, HNSW segments) per
+    directory for the whole process, so dropping a store object frees nothing.
+    """
+    # Only loaded once a Chroma store was opened (never on the numpy backend)
+    shared = sys.modules.get("chromadb.api.shared_system_client")
+    if shared is None or not db_path:
+        return
+    system = shared.SharedSystemClient._identifier_to_system.pop(db_path, None)
+    if system is not None:
+        system.stop()
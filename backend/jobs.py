@@ -0,0 +1,123 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from .config import INGEST_CONCURRENCY
+from .projects import DEFAULT_PROJECT
+
+# Finished jobs are kept around for status polling, up to this many
+MAX_JOB_HISTORY = 50
+
+
+class IngestionJob:
+    """
+    One background knowledge-base build, as seen by the status endpoint.
+    """
+
+    def __init__(self, files, project_id: str = DEFAULT_PROJECT):
+        self.job_id = uuid.uuid4().hex
+        self.project_id = project_id
+        self.files = files
+        self.status = "queued"
+        self.progress = 0.0
+        self.stage = "queued"
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+
+    def update_progress(self, fraction: float, stage: str):
+        self.progress = round(min(max(fraction, 0.0), 1.0), 3)
+        self.stage = stage
+
+    def to_dict(self):
+        return {
+            "job_id": self.job_id,
+            "project_id": self.project_id,
+            "status": self.status,
+            "progress": self.progress,
+            "stage": self.stage,
+            "files": self.files,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs ingestion jobs on background threads.
+    Jobs of one project run one at a time, in submission order, so two jobs
+    never diff against the same generation. Different projects build in
+    parallel, up to max_workers at once.
+    """
+
+    def __init__(self, max_history: int = MAX_JOB_HISTORY, max_workers: int = INGEST_CONCURRENCY):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ingestion")
+        self._jobs = OrderedDict()
+        # project_id -> jobs waiting behind the one currently running
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._max_history = max_history
+
+    def submit(self, target, files, *args, project_id: str = DEFAULT_PROJECT):
+        """
+        Queues target(job, *args); its return value becomes job.result.
+        """
+        job = IngestionJob(files, project_id)
+        with self._lock:
+            self._jobs[job.job_id] = job
+            self._trim()
+            queue = self._queues.get(project_id)
+            start_worker = queue is None
+            if start_worker:
+                queue = self._queues[project_id] = deque()
+            queue.append((job, target, args))
+        if start_worker:
+            self._executor.submit(self._drain, project_id)
+        return job
+
+    def _drain(self, project_id: str):
+        # One worker per busy project: run its queue until empty
+        while True:
+            with self._lock:
+                queue = self._queues[project_id]
+                if not queue:
+                    del self._queues[project_id]
+                    return
+                job, target, args = queue.popleft()
+            self._run(job, target, args)
+
+    def get(self, job_id: str):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, target, args):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = target(job, *args)
+            job.status = "failed" if job.result.get("status") == "error" else "succeeded"
+            job.update_progress(1.0, "done")
+        except Exception as e:
+            print(f"Ingestion job {job.job_id} failed: {e}")
+            job.status = "failed"
+            job.stage = "failed"
+            job.error = str(e)
+        job.finished_at = time.time()
+
+    def _trim(self):
+        # Drop the oldest finished jobs once the history is full
+        while len(self._jobs) > self._max_history:
+            oldest_id, oldest = next(iter(self._jobs.items()))
+            if oldest.status in ("queued", "running"):
+                break
+            del self._jobs[oldest_id]
+
+
+jobs = JobManager()
@@ -0,0 +1,430 @@
+import time
+import random
+import asyncio
+import itertools
+import threading
+import contextvars
+from collections import deque
+from typing import Any, List
+from pydantic import PrivateAttr
+from langchain_core.language_models.chat_models import BaseChatModel
+
+from .config import (
+    LLM_MODEL, LLM_TEMPERATURE, LLM_FALLBACK_MODEL, LLM_BASE_URL, LLM_TIMEOUT_SECONDS,
+    LLM_REQUESTS_PER_MINUTE, LLM_TOKENS_PER_MINUTE, LLM_OUTPUT_TOKENS,
+    LLM_MAX_RETRIES, LLM_BACKOFF_BASE_SECONDS, LLM_BACKOFF_MAX_SECONDS,
+    LLM_SLO_P95_SECONDS, LLM_SLO_ERROR_RATE, LLM_SLO_WINDOW, LLM_SLO_MIN_CALLS, LLM_FALLBACK_SECONDS
+)
+from .ratelimit import RateBudget
+from .concurrency import LLMUnavailableError
+from .tokens import count_tokens
+from .metrics import stage, LLM_CALL_SECONDS, LLM_RETRIES, LLM_FALLBACKS
+
+# ---------------------------------------------------------
+# Shared LLM gateway.
+#
+# A chat model that spreads calls over routes (one per API key and
+# model), each with its own RPM/TPM token buckets. Rate-limit, server and
+# connection errors are retried with full-jitter exponential backoff,
+# moving to another key when one is throttled. While the primary model
+# breaches its latency or error SLO, calls go to the fallback model.
+# Both chains are built on it, so every generation path shares it.
+# ---------------------------------------------------------
+
+
+def _status_code(error):
+    code = getattr(error, "status_code", None)
+    if code is None:
+        code = getattr(getattr(error, "response", None), "status_code", None)
+    return code
+
+
+def is_retryable(error):
+    code = _status_code(error)
+    if code is not None:
+        return code in (408, 409, 429) or code >= 500
+    # Connection resets and timeouts (groq.APIConnectionError / APITimeoutError)
+    return isinstance(error, (ConnectionError, TimeoutError, asyncio.TimeoutError)) or \
+        type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def retry_after_seconds(error):
+    """
+    The server's Retry-After hint in seconds, if it sent one.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, base: float = LLM_BACKOFF_BASE_SECONDS, cap: float = LLM_BACKOFF_MAX_SECONDS):
+    # "Full jitter": uniform over [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# Set by track_answering_models(): the models that answered this task's calls
+_answered_by = contextvars.ContextVar("llm_answered_by", default=None)
+
+
+def track_answering_models():
+    """
+    Starts collecting the models that answer the LLM calls made from here
+    on in this task (and the tasks it starts). Returns the live set, e.g.
+    to keep fallback-model answers out of the response cache.
+    """
+    models = set()
+    _answered_by.set(models)
+    return models
+
+
+def _p95(samples):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] if ordered else 0.0
+
+
+class Route:
+    """
+    One API key + model: its client, its rate budget and live stats.
+    """
+
+    def __init__(self, name: str, model: str, client, requests_per_minute: int = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: int = LLM_TOKENS_PER_MINUTE):
+        self.name = name
+        self.model = model
+        self.client = client
+        self.budget = RateBudget(requests_per_minute, tokens_per_minute)
+        # Callers waiting on the budget / calls in progress
+        self.waiting = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        # Set on a 429: the route is skipped until then
+        self.cooldown_until = 0.0
+        self.latencies = deque(maxlen=LLM_SLO_WINDOW)
+
+    @property
+    def queue_depth(self):
+        return self.waiting + self.in_flight
+
+    def cooldown_left(self):
+        return max(0.0, self.cooldown_until - time.monotonic())
+
+    def status(self):
+        return {
+            "route": self.name,
+            "model": self.model,
+            "queue_depth": self.queue_depth,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "rate_limited": self.rate_limited,
+            "cooldown_s": round(self.cooldown_left(), 2),
+            "latency_p95_s": round(_p95(self.latencies), 3),
+            **self.budget.status(),
+        }
+
+
+class ModelHealth:
+    """
+    Sliding window of (ok, seconds) outcomes of one model, judged
+    against the latency and error-rate SLOs.
+    """
+
+    def __init__(self, window: int = LLM_SLO_WINDOW, min_calls: int = LLM_SLO_MIN_CALLS,
+                 p95_seconds: float = LLM_SLO_P95_SECONDS, error_rate: float = LLM_SLO_ERROR_RATE):
+        self.outcomes = deque(maxlen=window)
+        self.min_calls = min_calls
+        self.p95_seconds = p95_seconds
+        self.error_rate = error_rate
+
+    def record(self, ok: bool, seconds: float):
+        self.outcomes.append((ok, seconds))
+
+    def breach(self):
+        """
+        Why the SLO is breached ("error_rate" / "latency"), or None.
+        """
+        if len(self.outcomes) < self.min_calls:
+            return None
+        errors = sum(1 for ok, _ in self.outcomes if not ok)
+        if errors / len(self.outcomes) > self.error_rate:
+            return "error_rate"
+        if _p95([seconds for ok, seconds in self.outcomes if ok]) > self.p95_seconds:
+            return "latency"
+        return None
+
+    def clear(self):
+        self.outcomes.clear()
+
+
+class LLMGateway(BaseChatModel):
+    """
+    Chat model routing every call over `routes` (see module comment).
+    Async calls wait on the per-route rate budget; sync calls (required by
+    BaseChatModel, unused by the app) get retries and fallback but do not
+    wait on it.
+    """
+
+    routes: List[Any]
+    primary_model: str
+    fallback_model: str = ""
+    max_retries: int = LLM_MAX_RETRIES
+    backoff_base: float = LLM_BACKOFF_BASE_SECONDS
+    backoff_max: float = LLM_BACKOFF_MAX_SECONDS
+    fallback_seconds: float = LLM_FALLBACK_SECONDS
+    # Completion tokens reserved from the budget per call
+    output_tokens: int = LLM_OUTPUT_TOKENS
+
+    _health: dict = PrivateAttr(default_factory=dict)
+    _fallback_until: float = PrivateAttr(default=0.0)
+    _fallback_reason: str = PrivateAttr(default=None)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+    _turns: Any = PrivateAttr(default_factory=itertools.count)
+
+    @property
+    def _llm_type(self):
+        return "llm-gateway"
+
+    # ---------------- Routing ----------------
+    def _models(self):
+        """
+        Models to try, in order: the fallback goes first while the primary breaches its SLO.
+        """
+        if not self.fallback_model:
+            return [self.primary_model]
+        with self._lock:
+            if self._fallback_until and time.monotonic() >= self._fallback_until:
+                # Give the primary a fresh window
+                self._fallback_until = 0.0
+                self._fallback_reason = None
+                self._model_health(self.primary_model).clear()
+                print(f"LLM gateway: back to {self.primary_model}")
+            if self._fallback_until:
+                return [self.fallback_model, self.primary_model]
+        return [self.primary_model, self.fallback_model]
+
+    def _model_health(self, model: str):
+        if model not in self._health:
+            self._health[model] = ModelHealth()
+        return self._health[model]
+
+    def _pick(self, model: str):
+        """
+        The route of the model that is not cooling down, has the shortest
+        queue and the most token budget left (in whole calls); ties go round
+        robin, so idle keys share the load evenly.
+        """
+        candidates = [route for route in self.routes if route.model == model]
+        turn = next(self._turns)
+        return min(
+            enumerate(candidates),
+            key=lambda item: (
+                item[1].cooldown_left(), item[1].queue_depth,
+                -int(item[1].budget.tokens.available() // max(self.output_tokens, 1)),
+                (item[0] - turn) % len(candidates),
+            ),
+        )[1]
+
+    def _cost(self, messages):
+        return count_tokens("\n".join(str(m.content) for m in messages)) + self.output_tokens
+
+    def _retry_delay(self, route, error, attempt: int):
+        """
+        Seconds to wait before the next attempt on route.model, or None when
+        every key of the model cools down longer than backoff_max (retrying
+        early would only earn more 429s). A throttled route cools down for
+        its Retry-After; another key is used right away.
+        """
+        delay = backoff_delay(attempt, self.backoff_base, self.backoff_max)
+        if _status_code(error) == 429:
+            route.rate_limited += 1
+            route.cooldown_until = time.monotonic() + (retry_after_seconds(error) or delay)
+            cooldown = self._pick(route.model).cooldown_left()
+            if cooldown == 0:
+                return 0.0
+            if cooldown > self.backoff_max:
+                return None
+            # The cooldown is waited out in full, not capped
+            delay = max(delay, cooldown)
+        return delay
+
+    def _attempts(self, failures):
+        """
+        Yields (model, seconds to wait first) per attempt. failures is the
+        caller's list of (route, error); a model is given up for the next
+        one when its retries run out or _retry_delay says so.
+        """
+        for model in self._models():
+            for attempt in range(self.max_retries + 1):
+                delay = 0.0
+                if attempt > 0:
+                    delay = self._retry_delay(*failures[-1], attempt - 1)
+                    if delay is None:
+                        break
+                yield model, delay
+
+    # ---------------- Outcomes ----------------
+    def _finish(self, route, started: float, error=None):
+        elapsed = time.monotonic() - started
+        route.calls += 1
+        if error is None:
+            route.latencies.append(elapsed)
+            answered_by = _answered_by.get()
+            if answered_by is not None:
+                answered_by.add(route.model)
+        else:
+            route.errors += 1
+        outcome = "ok" if error is None else ("rate_limited" if _status_code(error) == 429 else "error")
+        LLM_CALL_SECONDS.observe(elapsed, route=route.name, model=route.model, outcome=outcome)
+
+        # Only provider trouble counts against the SLO, not bad requests
+        if error is not None and not is_retryable(error):
+            return
+        with self._lock:
+            health = self._model_health(route.model)
+            health.record(error is None, elapsed)
+            if route.model != self.primary_model or not self.fallback_model or self._fallback_until:
+                return
+            reason = health.breach()
+            if reason is not None:
+                self._fallback_until = time.monotonic() + self.fallback_seconds
+                self._fallback_reason = reason
+                LLM_FALLBACKS.inc(reason=reason)
+                print(f"LLM gateway: {self.primary_model} breached its {reason} SLO, "
+                      f"using {self.fallback_model} for {self.fallback_seconds:.0f}s")
+
+    def _give_up(self, failures):
+        retry_after = min((r.cooldown_left() for r in self.routes), default=None) or None
+        error = failures[-1][1] if failures else None
+        detail = f"{type(error).__name__}: {error}" if failures else "no route"
+        return LLMUnavailableError(f"LLM unavailable after {len(failures)} attempts ({detail})", retry_after)
+
+    async def _acquire(self, model: str, messages):
+        route = self._pick(model)
+        route.waiting += 1
+        try:
+            with stage("llm_gateway", "rate_limit"):
+                await route.budget.acquire(self._cost(messages))
+        finally:
+            route.waiting -= 1
+        return route
+
+    # ---------------- Calls ----------------
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        failures = []
+        for model, delay in self._attempts(failures):
+            if delay:
+                time.sleep(delay)
+            route = self._pick(model)
+            route.in_flight += 1
+            started = time.monotonic()
+            try:
+                result = route.client._generate(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self._finish(route, started, e)
+                if not is_retryable(e):
+                    raise
+                LLM_RETRIES.inc(route=route.name)
+                failures.append((route, e))
+                continue
+            finally:
+                route.in_flight -= 1
+            self._finish(route, started)
+            return result
+        raise self._give_up(failures) from failures[-1][1]
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        failures = []
+        for model, delay in self._attempts(failures):
+            if delay:
+                await asyncio.sleep(delay)
+            route = await self._acquire(model, messages)
+            route.in_flight += 1
+            started = time.monotonic()
+            try:
+                result = await route.client._agenerate(messages, stop=stop, **kwargs)
+            except Exception as e:
+                self._finish(route, started, e)
+                if not is_retryable(e):
+                    raise
+                LLM_RETRIES.inc(route=route.name)
+                failures.append((route, e))
+                continue
+            finally:
+                route.in_flight -= 1
+            self._finish(route, started)
+            return result
+        raise self._give_up(failures) from failures[-1][1]
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        """
+        Retries and falls back only until the first chunk has been
+        emitted; after that an error is raised to the caller.
+        """
+        failures = []
+        for model, delay in self._attempts(failures):
+            if delay:
+                await asyncio.sleep(delay)
+            route = await self._acquire(model, messages)
+            route.in_flight += 1
+            started = time.monotonic()
+            emitted = False
+            try:
+                async for chunk in route.client._astream(messages, stop=stop, **kwargs):
+                    emitted = True
+                    if run_manager:
+                        await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+            except Exception as e:
+                self._finish(route, started, e)
+                if emitted or not is_retryable(e):
+                    raise
+                LLM_RETRIES.inc(route=route.name)
+                failures.append((route, e))
+                continue
+            finally:
+                route.in_flight -= 1
+            self._finish(route, started)
+            return
+        raise self._give_up(failures) from failures[-1][1]
+
+    # ---------------- Introspection ----------------
+    def status(self):
+        with self._lock:
+            fallback_active = bool(self._fallback_until)
+            reason = self._fallback_reason
+        return {
+            "primary_model": self.primary_model,
+            "fallback_model": self.fallback_model or None,
+            "fallback_active": fallback_active,
+            "fallback_reason": reason,
+            "routes": [route.status() for route in self.routes],
+        }
+
+
+def create_gateway(api_keys, model: str = LLM_MODEL, fallback_model: str = LLM_FALLBACK_MODEL):
+    """
+    One ChatGroq client per key and model. The clients do not retry
+    themselves; the gateway does.
+    """
+    from langchain_groq import ChatGroq
+
+    models = [model] + ([fallback_model] if fallback_model and fallback_model != model else [])
+    routes = []
+    for name in models:
+        for i, api_key in enumerate(api_keys):
+            client = ChatGroq(
+                model=name,
+                temperature=LLM_TEMPERATURE,
+                api_key=api_key,
+                base_url=LLM_BASE_URL,
+                timeout=LLM_TIMEOUT_SECONDS,
+                max_retries=0,
+            )
+            # Keys are never shown, only their position
+            routes.append(Route(f"key{i + 1}/{name}", name, client))
+    return LLMGateway(routes=routes, primary_model=model, fallback_model=models[-1] if len(models) > 1 else "")
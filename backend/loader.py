@@ -0,0 +1,190 @@
+import os
+import time
+import codecs
+import hashlib
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .config import INGEST_WORKERS
+
+# ---------------------------------------------------------
+# Streaming document loader for ingestion.
+#
+# Files are read, hashed and split in worker processes and come back
+# one file at a time, in a stable order, with only a small window of
+# files in flight. Unchanged files (same hash as in the manifest) are
+# never split, and binary or undecodable files are skipped.
+# ---------------------------------------------------------
+
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# Bytes inspected for NUL bytes when deciding whether a file is binary
+BINARY_SNIFF_BYTES = 8192
+# Below this many files, starting worker processes costs more than it saves
+PARALLEL_MIN_FILES = 200
+# Files in flight per worker (bounds memory held by finished-but-unconsumed results)
+WINDOW_PER_WORKER = 2
+
+_text_splitter = None
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def content_hash(text: str):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def assign_chunk_ids(source: str, chunks):
+    """
+    Gives every chunk a stable id derived from its source and content.
+    Identical chunks inside one file get an occurrence suffix.
+    """
+    seen = {}
+    for chunk in chunks:
+        base_id = content_hash(f"{source}\x00{chunk.page_content}")
+        occurrence = seen.get(base_id, 0)
+        seen[base_id] = occurrence + 1
+        chunk.id = base_id if occurrence == 0 else f"{base_id}-{occurrence}"
+        chunk.metadata["chunk_id"] = chunk.id
+    return chunks
+
+
+def list_files(upload_dir: str):
+    """
+    (path, source) for every non-hidden file under upload_dir, sorted by
+    source so builds are deterministic. source is the path relative to upload_dir.
+    """
+    files = []
+    for root, dirs, names in os.walk(upload_dir):
+        dirs[:] = [d for d in dirs if not d.startswith(".")]
+        for name in names:
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            files.append((path, os.path.relpath(path, upload_dir)))
+    return sorted(files, key=lambda item: item[1])
+
+
+def decode_text(data: bytes):
+    """
+    Returns the text of a file, or None if it looks binary or is not
+    UTF-8/UTF-16 text.
+    """
+    if data.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        try:
+            return data.decode("utf-16")
+        except UnicodeDecodeError:
+            return None
+    if b"\x00" in data[:BINARY_SNIFF_BYTES]:
+        return None
+    try:
+        return data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        return None
+
+
+def _get_splitter():
+    # Built on first split (in each worker process), so importing this
+    # module does not load LangChain
+    global _text_splitter
+    if _text_splitter is None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        # start_index lets context packing stitch overlapping neighbours back in order
+        _text_splitter = RecursiveCharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP, add_start_index=True)
+    return _text_splitter
+
+
+def load_and_split(path: str, source: str, known_hash: str = None):
+    """
+    Reads one file and splits it into chunks with stable ids.
+    Runs in a worker process; everything returned must be picklable.
+    """
+    started = time.perf_counter()
+    result = {"source": source, "status": "split", "hash": None, "chunks": [], "reason": None}
+    try:
+        with open(path, "rb") as f:
+            text = decode_text(f.read())
+    except OSError as e:
+        text = None
+        result["reason"] = f"unreadable: {e}"
+    if text is None:
+        result["status"] = "skipped"
+        result["reason"] = result["reason"] or "binary or not valid UTF-8/UTF-16 text"
+        result["load_seconds"] = time.perf_counter() - started
+        result["split_seconds"] = 0.0
+        return result
+
+    result["hash"] = content_hash(text)
+    result["load_seconds"] = time.perf_counter() - started
+    if result["hash"] == known_hash:
+        result["status"] = "unchanged"
+        result["split_seconds"] = 0.0
+        return result
+
+    from langchain_core.documents import Document
+
+    started = time.perf_counter()
+    doc = Document(page_content=text, metadata={"source": source, "doc_hash": result["hash"]})
+    result["chunks"] = assign_chunk_ids(source, _get_splitter().split_documents([doc]))
+    result["split_seconds"] = time.perf_counter() - started
+    return result
+
+
+def _get_pool(workers: int):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the server process has live threads (and
+            # tokenizer/torch thread pools) that must not be forked
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _reset_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def iter_split_files(files, known_hashes=None, workers: int = INGEST_WORKERS):
+    """
+    Yields load_and_split() results for `files` ((path, source) pairs) in
+    order. With more than one worker, files are processed in a process
+    pool with at most WINDOW_PER_WORKER * workers files in flight.
+    """
+    known_hashes = known_hashes or {}
+    if workers <= 1 or len(files) < PARALLEL_MIN_FILES:
+        for path, source in files:
+            yield load_and_split(path, source, known_hashes.get(source))
+        return
+
+    pool = _get_pool(workers)
+    window = WINDOW_PER_WORKER * workers
+    remaining = iter(files)
+    pending = deque()
+    try:
+        for path, source in remaining:
+            pending.append(pool.submit(load_and_split, path, source, known_hashes.get(source)))
+            if len(pending) >= window:
+                break
+        while pending:
+            result = pending.popleft().result()
+            next_file = next(remaining, None)
+            if next_file is not None:
+                path, source = next_file
+                pending.append(pool.submit(load_and_split, path, source, known_hashes.get(source)))
+            yield result
+    except BrokenProcessPool:
+        # A worker died (e.g. killed for memory): start a fresh pool next build
+        _reset_pool()
+        raise
+    finally:
+        # Build failed or was abandoned: drop work that has not started
+        for future in pending:
+            future.cancel()
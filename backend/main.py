@@ -1,63 +1,545 @@
 import os
+import sys
+import uuid
 import shutil
-from fastapi import FastAPI, UploadFile, File
+import json
+import time
+import asyncio
+import tempfile
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.routing import Match
 from typing import List
-from .rag_utils import build_knowledge_base # Import our logic function
+from .rag_utils import build_knowledge_base, check_documents # Import our logic function
 from fastapi import Form
-from .rag_utils import generate_test_cases, generate_selenium_script # Update import
+from .rag_utils import agenerate_test_cases, agenerate_selenium_script, agenerate_selenium_scripts # Update import
+from .rag_utils import agenerate_test_plan
+from .rag_utils import astream_test_cases, astream_selenium_script
+from .config import UPLOAD_DIR, STAGING_DIR, BLOCKING_WORKERS
+from .config import RUNNER_ENABLED, RUNNER_WORKERS, RUNNER_DRIVER, RUNNER_SUITE_TIMEOUT_SECONDS, PLAN_MAX_FEATURES
+from .prompts import SCRIPT_MODES
+from .pages import register_page, load_page
+from .runner import DRIVERS, parse_tests
+from .resources import registry
+from .jobs import jobs
+from .concurrency import generation_limiter, QueueFullError, LLMUnavailableError
+from .projects import DEFAULT_PROJECT, validate_project_id, project_upload_dir, project_db_root, list_projects
+from .index_store import active_db_path
+from .cache import response_cache
+from .metrics import metrics, Gauge, HTTP_REQUEST_SECONDS, start_request_timings, server_timing_header
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Blocking calls made from async code (vector search, embeddings) run on
+    # a bounded pool instead of the unbounded-by-default loop executor.
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=BLOCKING_WORKERS, thread_name_prefix="blocking"))
 
-# Create a temporary folder to store uploaded files
-UPLOAD_DIR = "./temp_uploads"
-if not os.path.exists(UPLOAD_DIR):
-    os.makedirs(UPLOAD_DIR)
+    # Warm up the shared resources in a worker thread so the server
+    # starts answering health checks while the model is loading.
+    warmup_task = asyncio.create_task(asyncio.to_thread(registry.warm_up))
+    yield
+    if not warmup_task.done():
+        warmup_task.cancel()
+
+app = FastAPI(lifespan=lifespan)
+
+@app.exception_handler(QueueFullError)
+async def queue_full_handler(request: Request, exc: QueueFullError):
+    return JSONResponse(status_code=429, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(LLMUnavailableError)
+async def llm_unavailable_handler(request: Request, exc: LLMUnavailableError):
+    # The provider kept throttling or failing: tell the client when to come back
+    retry_after = max(1, round(exc.retry_after or 1))
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": str(retry_after)})
+
+def llm_routes():
+    return registry.llm_status().get("routes", [])
+
+# Live state read at scrape time
+metrics.register(Gauge(
+    "qa_generation_requests", "Generation requests holding or waiting for a slot.",
+    lambda: {"in_flight": generation_limiter.in_flight, "queued": generation_limiter.queued}, labelname="state"
+))
+metrics.register(Gauge(
+    "qa_llm_queue_depth", "LLM calls waiting for or holding each gateway route (key/model).",
+    lambda: {r["route"]: r["queue_depth"] for r in llm_routes()}, labelname="route"
+))
+metrics.register(Gauge(
+    "qa_llm_latency_p95_seconds", "p95 latency of recent successful calls per gateway route.",
+    lambda: {r["route"]: r["latency_p95_s"] for r in llm_routes()}, labelname="route"
+))
+metrics.register(Gauge(
+    "qa_llm_budget_tokens_available", "Tokens left in each gateway route's rate budget.",
+    lambda: {r["route"]: r["tokens_available"] for r in llm_routes()}, labelname="route"
+))
+metrics.register(Gauge(
+    "qa_llm_fallback_active", "1 while calls go to the fallback model.",
+    lambda: int(registry.llm_status().get("fallback_active", False))
+))
+metrics.register(Gauge(
+    "qa_cache_hit_ratio", "Response-cache hit ratio since start-up.", lambda: response_cache.stats()["hit_rate"]
+))
+
+def route_template(request: Request):
+    # Label by route pattern ("/jobs/{job_id}"), not the raw path
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    """
+    Adds a Server-Timing header (one entry per pipeline stage that ran
+    before the response started, plus total) and records request latency.
+    For streaming endpoints that is the time to the first byte.
+    """
+    timings = start_request_timings()
+    start = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - start
+    response.headers["Server-Timing"] = server_timing_header(timings, total)
+    HTTP_REQUEST_SECONDS.observe(total, method=request.method, route=route_template(request), status=response.status_code)
+    return response
+
+# Create temporary folders to store uploaded files
+for folder in (UPLOAD_DIR, STAGING_DIR):
+    if not os.path.exists(folder):
+        os.makedirs(folder)
 
 @app.get("/")
 def home():
     return {"message": "QA Agent Backend is Running!"}
 
-@app.post("/upload-documents/")
-async def upload_documents(files: List[UploadFile] = File(...)):
+@app.get("/ready")
+def ready():
     """
-    Receives a list of files, saves them locally, 
-    and triggers the Vector DB build.
+    Readiness probe: 200 once the embedding model, vector store
+    and chains are loaded, 503 while warm-up is still running or failed.
     """
-    # 1. Clear old uploads to keep things clean
-    for filename in os.listdir(UPLOAD_DIR):
-        file_path = os.path.join(UPLOAD_DIR, filename)
-        os.remove(file_path)
+    status = registry.status()
+    status["generation"] = generation_limiter.status()
+    status["llm_gateway"] = registry.llm_status()
+    return JSONResponse(status_code=200 if status["ready"] else 503, content=status)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """
+    Prometheus text exposition of stage latencies, token and chunk counts,
+    cache outcomes and limiter/budget state.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+def resolve_project(project_id: str):
+    try:
+        return validate_project_id(project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+@app.get("/projects")
+def projects_endpoint():
+    """
+    Known projects and whether each has a built knowledge base.
+    """
+    return {
+        "projects": [
+            {"project_id": project_id, "active_index": active_db_path(project_db_root(project_id))}
+            for project_id in list_projects()
+        ],
+        "open": registry.status()["open_projects"],
+    }
+
+def run_ingestion(job, staging_dir: str, prune: bool, keep=()):
+    """
+    Background job: moves the staged upload into the project's upload
+    directory and builds its next index generation from it.
+    Files named in `keep` are part of the document set without being
+    re-sent (the client found them unchanged via /documents/check).
+    """
+    upload_dir = project_upload_dir(job.project_id)
+    os.makedirs(upload_dir, exist_ok=True)
+    incoming = set(os.listdir(staging_dir))
+
+    # 1. Remove files that are no longer part of the corpus
+    if prune:
+        for filename in os.listdir(upload_dir):
+            if filename not in incoming and filename not in keep:
+                os.remove(os.path.join(upload_dir, filename))
+
+    # 2. Move the staged files in
+    for filename in incoming:
+        os.replace(os.path.join(staging_dir, filename), os.path.join(upload_dir, filename))
+    shutil.rmtree(staging_dir, ignore_errors=True)
+
+    # 3. Update the Knowledge Base (only new/changed chunks are embedded)
+    return build_knowledge_base(upload_dir, progress=job.update_progress, project_id=job.project_id)
+
+@app.post("/documents/check")
+def check_documents_endpoint(hashes_json: str = Form(...), project_id: str = Form(DEFAULT_PROJECT)):
+    """
+    Takes {filename: SHA-256 of its bytes} for the client's document set and
+    says which files must be uploaded. up_to_date=true means the project's
+    index already holds exactly this set: no upload needed.
+    """
+    project_id = resolve_project(project_id)
+    try:
+        hashes = json.loads(hashes_json)
+    except ValueError:
+        hashes = None
+    if not isinstance(hashes, dict):
+        raise HTTPException(status_code=422, detail="hashes_json must be a JSON object of filename -> sha256")
+    return check_documents({os.path.basename(name): str(digest) for name, digest in hashes.items()}, project_id)
+
+@app.post("/upload-documents/", status_code=202)
+def upload_documents(files: List[UploadFile] = File(None), prune: bool = Form(True), project_id: str = Form(DEFAULT_PROJECT),
+                     keep_json: str = Form("[]")):
+    """
+    Receives a list of files, stages them locally 
+    and queues a background job that updates the project's Vector DB.
+    With prune=True (default) the upload is the complete document set and
+    files missing from it are removed; with prune=False it is added on top.
+    keep_json lists files already on the server that stay in the set
+    without being re-sent. Poll /jobs/{job_id} for progress.
+    """
+    project_id = resolve_project(project_id)
+    try:
+        keep = {os.path.basename(name) for name in json.loads(keep_json)}
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="keep_json must be a JSON list of filenames")
+    files = files or []
+    if not files and not (keep and prune):
+        raise HTTPException(status_code=422, detail="No files uploaded")
+    staging_dir = os.path.join(STAGING_DIR, uuid.uuid4().hex)
+    os.makedirs(staging_dir)
 
-    # 2. Save new files
     saved_files = []
     for file in files:
-        file_location = os.path.join(UPLOAD_DIR, file.filename)
+        filename = os.path.basename(file.filename)
+        file_location = os.path.join(staging_dir, filename)
         with open(file_location, "wb") as buffer:
             # Read the uploaded file and write it to disk
             shutil.copyfileobj(file.file, buffer)
-        saved_files.append(file.filename)
+        saved_files.append(filename)
 
-    # 3. Build the Knowledge Base (Call the function from rag_utils)
-    result = build_knowledge_base(UPLOAD_DIR)
+    job = jobs.submit(run_ingestion, saved_files, staging_dir, prune, keep, project_id=project_id)
 
     return {
-        "message": "Files uploaded and Knowledge Base Built successfully",
+        "message": "Files uploaded. Knowledge Base update queued.",
         "files": saved_files,
-        "db_status": result
+        "job_id": job.job_id,
+        "project_id": project_id,
+        "status_url": f"/jobs/{job.job_id}"
     }
 
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown job id")
+    return job.to_dict()
+
 @app.post("/generate-tests/")
-async def generate_tests_endpoint(query: str = Form(...)):
+async def generate_tests_endpoint(query: str = Form(...), project_id: str = Form(DEFAULT_PROJECT)):
     """
     Example query: "Generate positive and negative tests for the discount code."
+    Context is retrieved from the given project's knowledge base.
+    test_cases are the validated records; malformed ones are re-requested
+    once and what still fails is listed under invalid.
+    """
+    project_id = resolve_project(project_id)
+    try:
+        async with generation_limiter.slot():
+            result = await agenerate_test_cases(query, project_id)
+    except ValueError as e:
+        # No knowledge base yet, or the LLM is not configured
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "test_cases": result["test_cases"], "invalid": result["invalid"], "repaired": result["repaired"],
+        "answer": result["answer"], "prompt_tokens": result["prompt_tokens"], "context": result["context"],
+    }
+
+@app.post("/generate-test-plan/")
+async def generate_test_plan_endpoint(queries_json: str = Form(...), project_id: str = Form(DEFAULT_PROJECT)):
+    """
+    Takes a JSON list of feature queries ("discount codes", "shipping", ...)
+    and returns one merged, de-duplicated test plan with stable test ids,
+    plus per-feature stats. Retrieval for all features is batched and the
+    generations run concurrently under one admitted request.
     """
-    result = generate_test_cases(query)
-    return {"test_cases": result}
+    project_id = resolve_project(project_id)
+    try:
+        queries = json.loads(queries_json)
+    except ValueError:
+        queries = None
+    if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+        raise HTTPException(status_code=422, detail="queries_json must be a JSON list of strings")
+    queries = [q for q in queries if q.strip()]
+    if not queries:
+        raise HTTPException(status_code=422, detail="queries_json has no queries")
+    if len(queries) > PLAN_MAX_FEATURES:
+        raise HTTPException(status_code=422, detail=f"At most {PLAN_MAX_FEATURES} feature queries per plan")
+
+    try:
+        async with generation_limiter.slot():
+            return await agenerate_test_plan(queries, project_id)
+    except ValueError as e:
+        # No knowledge base yet, or the LLM is not configured
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.post("/pages/")
+def register_page_endpoint(html_content: str = Form(...)):
+    """
+    Registers the target page once; script endpoints then take its
+    html_id instead of the full HTML. Same page, same id.
+    """
+    return {"html_id": register_page(html_content), "bytes": len(html_content.encode("utf-8"))}
+
+def resolve_html(html_content: str, html_id: str):
+    if html_content:
+        return html_content
+    if not html_id:
+        raise HTTPException(status_code=422, detail="html_content or html_id is required")
+    html_content = load_page(html_id)
+    if html_content is None:
+        # Pruned or never registered: the client registers it again
+        raise HTTPException(status_code=404, detail="Unknown html_id; register the page with POST /pages/")
+    return html_content
+
+def resolve_mode(mode: str):
+    if mode not in SCRIPT_MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {', '.join(SCRIPT_MODES)}")
+    return mode
 
 @app.post("/generate-script/")
-async def generate_script_endpoint(test_case_json: str = Form(...), html_content: str = Form(...)):
+async def generate_script_endpoint(test_case_json: str = Form(...), html_content: str = Form(None),
+                                   mode: str = Form("standard"), html_id: str = Form(None)):
+    """
+    Takes a specific test case and the HTML string (or the html_id of a
+    page registered with POST /pages/), returns Python code.
+    mode="fast" waits on page conditions instead of fixed sleeps; "fast"
+    in the response then reports the sleeps rewritten and the estimated
+    wall-clock saving per run.
+    """
+    mode = resolve_mode(mode)
+    html_content = resolve_html(html_content, html_id)
+    try:
+        async with generation_limiter.slot():
+            script, report = await agenerate_selenium_script(test_case_json, html_content, mode)
+    except ValueError as e:
+        # The LLM is not configured
+        raise HTTPException(status_code=503, detail=str(e))
+    return {"script": script, "fast": report}
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    Streaming response for a request that already holds a generation slot.
+    The slot is taken before the 200 goes out (so a saturated server still
+    answers a real 429) and released when the response ends, however it ends.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            generation_limiter.release()
+
+async def check_generation_ready(project_id: str = None):
+    """
+    Answers 503 before a stream starts, like the non-stream endpoints, when
+    the project has no knowledge base yet or the LLM is not configured.
+    """
+    try:
+        # Opening the store or creating the LLM client blocks: not on the event loop
+        if project_id is not None:
+            await asyncio.to_thread(registry.get_retriever, project_id)
+        await asyncio.to_thread(registry.get_llm)
+    except ValueError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+async def stream_with_slot(body, media_type: str):
+    await generation_limiter.acquire()
+    return SlotStreamingResponse(body, media_type=media_type)
+
+def sse_event(event: str, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def sse_stream(events):
     """
-    Takes a specific test case and the HTML string, returns Python code.
+    Wraps an (event, data) async generator as a server-sent-event body.
+    Errors after the 200 has been sent end the stream with an 'error' event.
     """
-    script = generate_selenium_script(test_case_json, html_content)
-    return {"script": script}
\ No newline at end of file
+    try:
+        async for event, data in events:
+            yield sse_event(event, data)
+    except LLMUnavailableError as e:
+        yield sse_event("error", {"status": 503, "detail": str(e)})
+    except ValueError as e:
+        yield sse_event("error", {"status": 503, "detail": str(e)})
+    except Exception as e:
+        print(f"Stream failed: {e}")
+        yield sse_event("error", {"status": 500, "detail": str(e)})
+
+@app.post("/generate-tests/stream")
+async def generate_tests_stream_endpoint(query: str = Form(...), project_id: str = Form(DEFAULT_PROJECT)):
+    """
+    Server-sent events: 'token' (raw text delta), 'test_case' (each validated
+    test case as soon as it closes, then any repaired ones), then 'done' with
+    the full answer, the records, what stayed invalid and the prompt tokens used.
+    """
+    project_id = resolve_project(project_id)
+    await check_generation_ready(project_id)
+    return await stream_with_slot(sse_stream(astream_test_cases(query, project_id)), "text/event-stream")
+
+@app.post("/generate-script/stream")
+async def generate_script_stream_endpoint(test_case_json: str = Form(...), html_content: str = Form(None),
+                                          mode: str = Form("standard"), html_id: str = Form(None)):
+    """
+    Server-sent events: 'token' (code delta), then 'done' with the full
+    script (rewritten in fast mode, with its "fast" report).
+    """
+    mode = resolve_mode(mode)
+    html_content = resolve_html(html_content, html_id)
+    await check_generation_ready()
+    return await stream_with_slot(sse_stream(astream_selenium_script(test_case_json, html_content, mode)), "text/event-stream")
+
+@app.post("/generate-scripts/batch")
+async def generate_scripts_batch_endpoint(test_cases_json: str = Form(...), html_content: str = Form(None),
+                                          mode: str = Form("standard"), html_id: str = Form(None)):
+    """
+    Takes the whole test plan (JSON list) and the HTML once and streams back
+    one NDJSON line per script as soon as it is generated:
+    {"index", "test_id", "script", "fast"} or {"index", "test_id", "error"},
+    followed by a final {"done": true, ...} summary line.
+    """
+    mode = resolve_mode(mode)
+    html_content = resolve_html(html_content, html_id)
+    try:
+        test_cases = json.loads(test_cases_json)
+    except ValueError:
+        raise HTTPException(status_code=422, detail="test_cases_json must be a JSON list")
+    if isinstance(test_cases, dict):
+        test_cases = test_cases.get("test_cases", [test_cases])
+    if not isinstance(test_cases, list):
+        raise HTTPException(status_code=422, detail="test_cases_json must be a JSON list")
+
+    async def stream():
+        failed = 0
+        seconds_saved = 0.0
+        summary = {"done": True, "count": len(test_cases)}
+        try:
+            async for index, script, report, error in agenerate_selenium_scripts(test_cases, html_content, mode=mode):
+                test_case = test_cases[index]
+                line = {
+                    "index": index,
+                    "test_id": test_case.get("test_id", f"TC-{index}") if isinstance(test_case, dict) else f"TC-{index}",
+                }
+                if error is None:
+                    line["script"] = script
+                    line["fast"] = report
+                    seconds_saved += report["estimated_seconds_saved"] if report else 0.0
+                else:
+                    failed += 1
+                    line["error"] = error
+                yield json.dumps(line) + "\n"
+        except (LLMUnavailableError, ValueError) as e:
+            # The LLM is throttled or not configured: the 200 is already sent
+            summary.update(error=str(e), status=503)
+        except Exception as e:
+            print(f"Batch failed: {e}")
+            summary.update(error=str(e), status=500)
+        summary["failed"] = failed
+        if mode == "fast":
+            summary["estimated_seconds_saved"] = round(seconds_saved, 2)
+        yield json.dumps(summary) + "\n"
+
+    await check_generation_ready()
+    # The batch counts as one admitted request: its slot is taken here, so a
+    # saturated server answers 429 before streaming. The fan-out is bounded
+    # by BATCH_MAX_PARALLEL and the RPM/TPM budget.
+    return await stream_with_slot(stream(), "application/x-ndjson")
+
+# One suite at a time: each already runs RUNNER_WORKERS browsers in parallel
+suite_lock = asyncio.Semaphore(1)
+
+@app.post("/run-scripts/")
+async def run_scripts_endpoint(scripts_json: str = Form(...), html_content: str = Form(None),
+                               workers: int = Form(RUNNER_WORKERS), driver: str = Form(RUNNER_DRIVER),
+                               fast: bool = Form(False), html_id: str = Form(None)):
+    """
+    Executes generated scripts ([{"test_id", "script"}] or {test_id: script})
+    on pooled headless browsers and streams one NDJSON result per script as
+    it finishes, then a {"done": true, ...} summary line. When html_content
+    (or a registered html_id) is given, scripts open it instead of their
+    local checkout.html path.
+    The scripts run as arbitrary Python on this host, so the endpoint
+    answers 403 unless RUNNER_ENABLED is set.
+    """
+    if not RUNNER_ENABLED:
+        raise HTTPException(status_code=403, detail="Script execution is disabled (set RUNNER_ENABLED=true to allow it)")
+    if html_id and not html_content:
+        html_content = resolve_html(html_content, html_id)
+    if driver not in DRIVERS:
+        raise HTTPException(status_code=422, detail=f"driver must be one of {', '.join(DRIVERS)}")
+    try:
+        tests = parse_tests(json.loads(scripts_json))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"scripts_json: {e}")
+    if not tests:
+        raise HTTPException(status_code=422, detail="scripts_json has no scripts")
+
+    async def stream():
+        # The suite runs in its own process: a hung browser or a script that
+        # calls sys.exit() cannot take the API down with it
+        work_dir = tempfile.mkdtemp(prefix="suite_")
+        suite_path = os.path.join(work_dir, "suite.json")
+        with open(suite_path, "w", encoding="utf-8") as f:
+            json.dump(tests, f)
+        # RUNNER_WORKERS caps the browsers one request can start
+        args = [sys.executable, "-m", "backend.runner", suite_path, "--ndjson",
+                "--workers", str(max(1, min(workers, RUNNER_WORKERS))), "--driver", driver]
+        if fast:
+            args.append("--fast")
+        if html_content:
+            page_path = os.path.join(work_dir, "page.html")
+            with open(page_path, "w", encoding="utf-8") as f:
+                f.write(html_content)
+            args += ["--page", page_path]
+
+        process = None
+        finished = False
+        log_path = os.path.join(work_dir, "runner.log")
+        try:
+            async with suite_lock:
+                with open(log_path, "wb") as log:
+                    process = await asyncio.create_subprocess_exec(
+                        *args, stdout=asyncio.subprocess.PIPE, stderr=log,
+                        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                    )
+                # One deadline for the whole suite (wait_for per read: asyncio.timeout needs Python 3.11)
+                loop = asyncio.get_running_loop()
+                deadline = loop.time() + RUNNER_SUITE_TIMEOUT_SECONDS
+                while raw := await asyncio.wait_for(process.stdout.readline(), max(deadline - loop.time(), 0)):
+                    line = raw.decode("utf-8", "replace").strip()
+                    if not line.startswith("{"):
+                        continue
+                    finished = finished or json.loads(line).get("done", False)
+                    yield line + "\n"
+                await asyncio.wait_for(process.wait(), max(deadline - loop.time(), 0))
+                if not finished:
+                    with open(log_path, "r", encoding="utf-8", errors="replace") as f:
+                        detail = f.read()[-2000:]
+                    yield json.dumps({"done": True, "error": f"runner exited with code {process.returncode}", "detail": detail}) + "\n"
+        except asyncio.TimeoutError:
+            yield json.dumps({"done": True, "error": f"suite timed out after {RUNNER_SUITE_TIMEOUT_SECONDS:g}s"}) + "\n"
+        finally:
+            if process is not None and process.returncode is None:
+                process.kill()
+                await process.wait()
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
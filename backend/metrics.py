@@ -0,0 +1,213 @@
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# ---------------------------------------------------------
+# Hot-path instrumentation.
+#
+# Stage timings feed latency histograms (Prometheus text format on
+# /metrics) and, per request, the Server-Timing response header.
+# Metrics are process-local, like the cache and the limiter.
+# ---------------------------------------------------------
+
+# Seconds: sub-millisecond cache hits up to multi-second LLM calls
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250, 500, 1000, 5000)
+TOKEN_BUCKETS = (100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+# Stage timings of the request being served (None outside a request)
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _label_key(labelnames, labels):
+    return tuple(str(labels.get(name, "")) for name in labelnames)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, key, extra=None):
+    pairs = list(zip(labelnames, key)) + list(extra or [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label key -> [bucket counts..., sum, count]
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(self.labelnames, labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key, [("le", "+Inf")])
+                lines.append(f"{self.name}_bucket{labels} {series[-1]}")
+                plain = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{plain} {_format_value(series[-2])}")
+                lines.append(f"{self.name}_count{plain} {series[-1]}")
+        return lines
+
+
+class Gauge:
+    """
+    Read at scrape time from a callback returning {label value: number}
+    (or a plain number when there are no labels).
+    """
+
+    def __init__(self, name: str, help_text: str, callback, labelname: str = None, kind: str = "gauge"):
+        self.name = name
+        self.help_text = help_text
+        self.callback = callback
+        self.labelname = labelname
+        self.kind = kind
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        try:
+            values = self.callback()
+        except Exception as e:
+            print(f"Metric {self.name} failed: {e}")
+            return lines
+        if self.labelname is None:
+            lines.append(f"{self.name} {_format_value(values)}")
+        else:
+            for label, value in sorted(values.items()):
+                lines.append(f'{self.name}{{{self.labelname}="{_escape(label)}"}} {_format_value(value)}')
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+STAGE_SECONDS = metrics.register(Histogram(
+    "qa_stage_seconds", "Time spent in each pipeline stage.", ("pipeline", "stage")
+))
+HTTP_REQUEST_SECONDS = metrics.register(Histogram(
+    "qa_http_request_seconds", "Time until the response starts (headers sent).", ("method", "route", "status")
+))
+LLM_TOKENS = metrics.register(Histogram(
+    "qa_llm_tokens", "Tokens per LLM call (LLM_TOKENIZER count, or estimated without it).", ("pipeline", "kind"), buckets=TOKEN_BUCKETS
+))
+RETRIEVED_CHUNKS = metrics.register(Histogram(
+    "qa_retrieved_chunks", "Chunks packed into the context per test-case generation.", (), buckets=COUNT_BUCKETS
+))
+INGESTED_CHUNKS = metrics.register(Counter(
+    "qa_ingested_chunks_total", "Chunks processed by knowledge-base builds.", ("action",)
+))
+CACHE_REQUESTS = metrics.register(Counter(
+    "qa_cache_requests_total", "Response-cache lookups by outcome.", ("namespace", "result")
+))
+LLM_CALL_SECONDS = metrics.register(Histogram(
+    "qa_llm_call_seconds", "Duration of each LLM gateway call attempt.", ("route", "model", "outcome")
+))
+LLM_RETRIES = metrics.register(Counter(
+    "qa_llm_retries_total", "LLM calls retried after a rate-limit, server or connection error.", ("route",)
+))
+LLM_FALLBACKS = metrics.register(Counter(
+    "qa_llm_fallbacks_total", "Switches to the fallback model after an SLO breach.", ("reason",)
+))
+TEST_CASE_REPAIRS = metrics.register(Counter(
+    "qa_test_case_repairs_total", "Malformed or incomplete test cases re-requested, by outcome.", ("outcome",)
+))
+
+
+@contextmanager
+def stage(pipeline: str, name: str):
+    """
+    Times the block into qa_stage_seconds and the current request's
+    Server-Timing header. Works around awaits and inside worker threads.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, pipeline=pipeline, stage=name)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((name, elapsed))
+
+
+def start_request_timings():
+    """
+    Starts collecting stage timings for the current request; returns the list.
+    """
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing_header(timings, total: float):
+    """
+    Server-Timing value: one entry per stage (repeated stages are summed),
+    durations in milliseconds.
+    """
+    merged = {}
+    for name, elapsed in timings:
+        merged[name] = merged.get(name, 0.0) + elapsed
+    entries = [f"{name};dur={elapsed * 1000:.1f}" for name, elapsed in merged.items()]
+    entries.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(entries)
@@ -0,0 +1,66 @@
+import os
+import re
+
+from .config import PAGES_DIR, MAX_PAGES
+from .loader import content_hash
+
+# ---------------------------------------------------------
+# Target pages, registered once and referenced by id.
+#
+# A client uploads the page under test once (POST /pages/) and then
+# sends only its html_id with every script request. The id is the
+# page's content hash (the same one the script cache keys on), so
+# registering the same page twice is a no-op. Pages live on disk so
+# ids survive a restart; the oldest are dropped beyond MAX_PAGES.
+# ---------------------------------------------------------
+
+HTML_ID_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def _page_path(html_id: str):
+    return os.path.join(PAGES_DIR, f"{html_id}.html")
+
+
+def register_page(html_content: str):
+    """
+    Stores the page (if new) and returns its html_id.
+    """
+    html_id = content_hash(html_content)
+    path = _page_path(html_id)
+    if os.path.exists(path):
+        # Touch it, so pruning drops least recently registered pages first
+        os.utime(path)
+        return html_id
+
+    os.makedirs(PAGES_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+    os.replace(tmp_path, path)
+    _prune()
+    return html_id
+
+
+def load_page(html_id: str):
+    """
+    The registered page's HTML, or None if the id is unknown.
+    """
+    if not html_id or not HTML_ID_RE.fullmatch(html_id):
+        return None
+    try:
+        with open(_page_path(html_id), "r", encoding="utf-8") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _prune():
+    pages = [os.path.join(PAGES_DIR, name) for name in os.listdir(PAGES_DIR) if name.endswith(".html")]
+    if len(pages) <= MAX_PAGES:
+        return
+    pages.sort(key=lambda path: os.path.getmtime(path))
+    for path in pages[:len(pages) - MAX_PAGES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,81 @@
+import re
+import hashlib
+
+from .config import PLAN_DEDUP_THRESHOLD
+from .context_packing import shingles, jaccard
+from .case_records import validate_test_case
+
+# ---------------------------------------------------------
+# Merging per-feature answers into one test plan.
+#
+# Each feature query yields its own list of test cases; neighbouring
+# features (discounts vs. shipping) often produce the same scenario
+# twice. Cases are merged in feature order, duplicates (same or nearly
+# the same description + expected result) are dropped, and every case
+# gets an id derived from its content, so regenerating an unchanged
+# plan gives the same ids.
+# ---------------------------------------------------------
+
+SPACE_RE = re.compile(r"\s+")
+
+
+def _case_text(case: dict):
+    text = f"{case.get('description', '')} {case.get('expected_result', '')}"
+    return SPACE_RE.sub(" ", str(text)).strip().lower()
+
+
+def stable_test_id(case: dict):
+    return "TP-" + hashlib.sha256(_case_text(case).encode("utf-8")).hexdigest()[:8].upper()
+
+
+def merge_test_cases(features, threshold: float = PLAN_DEDUP_THRESHOLD):
+    """
+    features: [(feature query, [test case, ...]), ...] in request order.
+    Returns (test cases, stats). Each kept case carries its stable
+    "test_id", the model's own id as "source_test_id" and the "feature"
+    it came from; a case duplicated across features lists them all.
+    """
+    merged, kept_shingles, by_text = [], [], {}
+    stats = {"generated": 0, "invalid": 0, "duplicates_removed": 0}
+
+    for feature, cases in features:
+        for case in cases:
+            stats["generated"] += 1
+            case, error = validate_test_case(case)
+            if error is not None:
+                stats["invalid"] += 1
+                continue
+            text = _case_text(case)
+
+            # Exact repeat first (cheap), then near-duplicates
+            duplicate = by_text.get(text)
+            if duplicate is None:
+                case_shingles = shingles(text)
+                for index, other in enumerate(kept_shingles):
+                    if jaccard(case_shingles, other) >= threshold:
+                        duplicate = merged[index]
+                        break
+            if duplicate is not None:
+                stats["duplicates_removed"] += 1
+                if feature not in duplicate["features"]:
+                    duplicate["features"].append(feature)
+                continue
+
+            source_id = case.pop("test_id", None)
+            merged_case = {"test_id": stable_test_id(case), **case}
+            merged_case["source_test_id"] = source_id
+            merged_case["feature"] = feature
+            merged_case["features"] = [feature]
+            merged.append(merged_case)
+            kept_shingles.append(case_shingles)
+            by_text[text] = merged_case
+
+    # Two different cases can share a hash prefix only by accident: keep ids unique
+    seen = {}
+    for case in merged:
+        count = seen.get(case["test_id"], 0)
+        seen[case["test_id"]] = count + 1
+        if count:
+            case["test_id"] = f"{case['test_id']}-{count}"
+    stats["test_cases"] = len(merged)
+    return merged, stats
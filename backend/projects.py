@@ -0,0 +1,47 @@
+import os
+import re
+
+from .config import DB_PATH, UPLOAD_DIR, PROJECTS_DIR
+
+# ---------------------------------------------------------
+# Project namespaces.
+#
+# Each project has its own upload directory and its own index
+# root (with its own generations and manifest). The "default"
+# project keeps the original DB_PATH / UPLOAD_DIR layout, so
+# existing single-tenant deployments keep their data.
+# ---------------------------------------------------------
+
+DEFAULT_PROJECT = "default"
+PROJECT_ID_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,63}")
+
+
+def validate_project_id(project_id: str):
+    """
+    Returns the project id, or raises ValueError if it is not safe to use as a directory name.
+    """
+    if not project_id or not PROJECT_ID_RE.fullmatch(project_id):
+        raise ValueError("project_id must be 1-64 letters, digits, '-' or '_' (starting with a letter or digit)")
+    return project_id
+
+
+def project_db_root(project_id: str = DEFAULT_PROJECT):
+    if project_id == DEFAULT_PROJECT:
+        return DB_PATH
+    return os.path.join(PROJECTS_DIR, validate_project_id(project_id), "vector_db")
+
+
+def project_upload_dir(project_id: str = DEFAULT_PROJECT):
+    if project_id == DEFAULT_PROJECT:
+        return UPLOAD_DIR
+    return os.path.join(PROJECTS_DIR, validate_project_id(project_id), "uploads")
+
+
+def list_projects():
+    projects = [DEFAULT_PROJECT]
+    if os.path.isdir(PROJECTS_DIR):
+        projects.extend(
+            name for name in sorted(os.listdir(PROJECTS_DIR))
+            if PROJECT_ID_RE.fullmatch(name) and name != DEFAULT_PROJECT
+        )
+    return projects
@@ -0,0 +1,158 @@
+from .config import DOM_DIGEST_ENABLED
+
+# ---------------------------------------------------------
+# Prompt texts. The LangChain prompt objects are built once, on first
+# use, by resources.ResourceRegistry and shared by every request; this
+# module stays free of LangChain so importing the app is fast.
+# ---------------------------------------------------------
+
+TEST_CASE_SYSTEM_PROMPT = (
+    "You are a QA Automation Lead. Use the context provided below to generate comprehensive test cases. "
+    "Output strictly JSON format with keys: test_id, description, expected_result, grounded_in. "
+    "Do not output Markdown code blocks.\n\n"
+    "Context: {context}"
+)
+
+# Follow-up for the test cases of an answer that did not parse or lacked
+# fields: only those are sent back, never the whole answer or context
+TEST_CASE_REPAIR_PROMPT = (
+    "You are a QA Automation Lead. Some test cases you wrote for the request below were malformed or incomplete. "
+    "Rewrite ONLY these {count} test case(s) as a JSON array of objects with the non-empty string keys: "
+    "test_id, description, expected_result, grounded_in. Keep each test_id if it has one; "
+    "do not reuse these ids: {existing_ids}. "
+    "Documents available for grounded_in: {sources}. "
+    "Do not output Markdown code blocks or any other text.\n\n"
+    "Request: {input}"
+)
+
+SELENIUM_SCRIPT_TEMPLATE = """
+    You are a Senior SDET. Write a Python Selenium script for the SPECIFIC test case provided below.
+    
+    --- INPUT DATA ---
+    Test Case JSON: {test_case}
+    Target Page ({target_page_kind}):
+    {target_page}
+    
+    --- FILE LOCATION ---
+    The HTML file is located at: "assets/checkout.html" (Relative to the script).
+    
+    --- SCOPE RESTRICTION ---
+    1. Generate code ONLY for the specific test case.
+    
+    --- LOGIC FLOW ---
+    1. SETUP:
+       - Init Driver.
+       - Define path: `file_path = os.path.abspath("assets/checkout.html")`
+       - Open file: `driver.get(f"file:///{{file_path}}")`
+       
+       # --- SMART CART LOGIC ---
+       - IF the test description contains "empty", DO NOT add items.
+       - ELSE IF testing 'SAVE15' or generic discount, add items (`btn-add-headphones`) to ensure total > 0.
+       - IF testing 'FREESHIP', select 'express' shipping.
+       
+       - Wait 1s for JS updates.
+    
+    2. CAPTURE & ACTION:
+       - Capture `price_before` (float).
+       - Perform Action (Input Code -> Click Apply).
+       - Wait 1s (or WebDriverWait if text expects to change).
+       - Capture `price_after` (float).
+    
+    3. ASSERTION:
+       - IF "empty" or "invalid": `expected = price_before` (No change).
+       - IF "SAVE15" and valid: `expected = price_before * 0.85`.
+       - IF "FREESHIP": `expected = price_before - 10`.
+       - Assert `abs(price_after - expected) < 0.01`.
+    
+    4. FINISH:
+       - time.sleep(10)
+       - driver.quit()
+       
+    Return ONLY raw Python code.
+    """
+
+# Fixed pauses the standard template asks for (two 1s waits + 10s before quitting)
+STANDARD_SCRIPT_SLEEP_SECONDS = 12.0
+
+# Fast mode: same flow, but every wait is an explicit WebDriverWait on the
+# page changing and there is no pause before quitting.
+SELENIUM_FAST_SCRIPT_TEMPLATE = """
+    You are a Senior SDET. Write a FAST Python Selenium script for the SPECIFIC test case provided below.
+    
+    --- INPUT DATA ---
+    Test Case JSON: {test_case}
+    Target Page ({target_page_kind}):
+    {target_page}
+    
+    --- FILE LOCATION ---
+    The HTML file is located at: "assets/checkout.html" (Relative to the script).
+    
+    --- SCOPE RESTRICTION ---
+    1. Generate code ONLY for the specific test case.
+    2. NEVER use `time.sleep`. Every wait is an explicit `WebDriverWait(driver, 5).until(...)` condition.
+    
+    --- LOGIC FLOW ---
+    1. SETUP:
+       - Init Driver.
+       - Define path: `file_path = os.path.abspath("assets/checkout.html")`
+       - Open file: `driver.get(f"file:///{{file_path}}")`
+       - Wait until `total-price` is present.
+       
+       # --- SMART CART LOGIC ---
+       - IF the test description contains "empty", DO NOT add items.
+       - ELSE IF testing 'SAVE15' or generic discount, add items (`btn-add-headphones`) to ensure total > 0.
+       - IF testing 'FREESHIP', select 'express' shipping.
+       
+       - After each cart change, wait until the `total-price` text differs from its text before the click.
+    
+    2. CAPTURE & ACTION:
+       - Capture `price_before` (float) and the raw `total-price` text.
+       - Perform Action (Input Code -> Click Apply).
+       - Wait until the `total-price` text changes OR `coupon-message` is no longer empty
+         (an invalid code changes only the message).
+       - Capture `price_after` (float).
+    
+    3. ASSERTION:
+       - IF "empty" or "invalid": `expected = price_before` (No change).
+       - IF "SAVE15" and valid: `expected = price_before * 0.85`.
+       - IF "FREESHIP": `expected = price_before - 10`.
+       - Assert `abs(price_after - expected) < 0.01`.
+    
+    4. FINISH:
+       - driver.quit() immediately (no pause).
+       
+    Return ONLY raw Python code.
+    """
+
+# How the target page is described, by DOM_DIGEST_ENABLED
+TARGET_PAGE_KINDS = {
+    True: "compact DOM digest: interactive elements, ids, labels, forms, JS handlers",
+    False: "raw HTML",
+}
+
+# "standard" keeps the fixed pauses (handy for watching a run);
+# "fast" waits on conditions and is post-processed by script_postprocess
+SCRIPT_MODES = ("standard", "fast")
+SELENIUM_SCRIPT_TEMPLATES = {"standard": SELENIUM_SCRIPT_TEMPLATE, "fast": SELENIUM_FAST_SCRIPT_TEMPLATE}
+
+
+def build_test_case_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", TEST_CASE_SYSTEM_PROMPT),
+        ("human", "{input}"),
+    ])
+
+
+def build_test_case_repair_prompt():
+    from langchain_core.prompts import ChatPromptTemplate
+    return ChatPromptTemplate.from_messages([
+        ("system", TEST_CASE_REPAIR_PROMPT),
+        ("human", "{items}"),
+    ])
+
+
+def build_script_prompt(mode: str = "standard"):
+    from langchain_core.prompts import PromptTemplate
+    prompt = PromptTemplate.from_template(SELENIUM_SCRIPT_TEMPLATES[mode])
+    return prompt.partial(target_page_kind=TARGET_PAGE_KINDS[DOM_DIGEST_ENABLED])
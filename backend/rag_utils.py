@@ -1,137 +1,643 @@
 import os
-import shutil
-from langchain_community.document_loaders import DirectoryLoader, TextLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_chroma import Chroma
-from langchain_groq import ChatGroq
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains import create_retrieval_chain
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from dotenv import load_dotenv
-
-# Load environment variables
-load_dotenv()
-
-DB_PATH = "./vector_db"
-
-def build_knowledge_base(upload_dir: str):
+import json
+import asyncio
+import time
+import hashlib
+
+from .config import (
+    LLM_MODEL, LLM_TEMPERATURE, BATCH_MAX_PARALLEL, DOM_DIGEST_ENABLED, VECTOR_BACKEND,
+    EMBEDDING_BATCH_SIZE, EMBEDDING_PROCESSES, RETRIEVER_FETCH_K, MMR_LAMBDA, TEST_CASE_REPAIR_ATTEMPTS
+)
+from .plan_merge import merge_test_cases
+from .case_records import TestCaseCollector, parse_test_cases
+from .prompts import STANDARD_SCRIPT_SLEEP_SECONDS
+from .metrics import stage, STAGE_SECONDS, LLM_TOKENS, RETRIEVED_CHUNKS, INGESTED_CHUNKS, TEST_CASE_REPAIRS
+from .resources import registry
+from .cache import response_cache, make_key, normalize_query, test_case_namespace, SCRIPTS
+from .dom_digest import get_dom_digest
+from .index_store import active_db_path, prepare_generation, activate_generation, discard_generation
+from .loader import list_files, iter_split_files, content_hash, decode_text
+from .projects import DEFAULT_PROJECT, project_db_root, project_upload_dir
+from .context_packing import pack_context
+from .tokens import count_tokens
+from .script_postprocess import optimize_script
+from .concurrency import LLMUnavailableError
+
+# Maps each source file to its content hash and the ids of its chunks,
+# so a rebuild only touches what actually changed.
+MANIFEST_FILE = "manifest.json"
+
+# Chunks are embedded and persisted in batches so job progress can be reported.
+# Each batch holds one encoder batch per embedding worker process.
+EMBED_BATCH_SIZE = EMBEDDING_BATCH_SIZE * max(EMBEDDING_PROCESSES, 1)
+
+def load_manifest(db_path: str):
+    manifest_path = os.path.join(db_path, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    # An index written by another vector backend cannot be diffed: rebuild it
+    if manifest.get("backend", "chroma") != VECTOR_BACKEND:
+        return {}
+    return manifest.get("documents", {})
+
+def save_manifest(documents: dict, db_path: str):
+    # Write to a temp file first so a crash never leaves a half-written manifest
+    manifest_path = os.path.join(db_path, MANIFEST_FILE)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"backend": VECTOR_BACKEND, "documents": documents}, f, indent=2)
+    os.replace(tmp_path, manifest_path)
+
+def file_digest(data: bytes):
+    # What clients send to /documents/check: the SHA-256 of the file as uploaded
+    return hashlib.sha256(data).hexdigest()
+
+def check_documents(hashes: dict, project_id: str = DEFAULT_PROJECT):
+    """
+    Compares a client's document set ({filename: SHA-256 of its bytes}) with
+    the project's uploads and its active index. Only files listed in
+    "upload" need to be sent; "unchanged" ones are already indexed as-is.
+    """
+    upload_dir = project_upload_dir(project_id)
+    db_path = active_db_path(project_db_root(project_id))
+    manifest = load_manifest(db_path) if db_path else {}
+
+    on_server = {}
+    for path, source in list_files(upload_dir) if os.path.isdir(upload_dir) else []:
+        with open(path, "rb") as f:
+            data = f.read()
+        text = decode_text(data)
+        # Indexed means the active generation holds this exact content (files
+        # that are not text are skipped by ingestion, so they count as indexed)
+        indexed = text is None or manifest.get(source, {}).get("hash") == content_hash(text)
+        on_server[source] = (file_digest(data), indexed)
+
+    unchanged, upload = [], []
+    for name, digest in sorted(hashes.items()):
+        server_digest, indexed = on_server.get(name, (None, False))
+        (unchanged if server_digest == digest and indexed else upload).append(name)
+    removed = sorted(set(on_server) - set(hashes))
+    return {
+        "project_id": project_id,
+        "indexed": db_path is not None,
+        "unchanged": unchanged,
+        "upload": upload,
+        "removed": removed,
+        "up_to_date": db_path is not None and not upload and not removed,
+    }
+
+def _no_progress(fraction: float, stage: str):
+    pass
+
+def _open_next_generation(db_root: str, copy_active: bool):
+    with stage("ingest", "prepare"):
+        new_db_path = prepare_generation(db_root, copy_active=copy_active)
+        return registry.open_vector_store(new_db_path), new_db_path
+
+def build_knowledge_base(upload_dir: str, progress=None, project_id: str = DEFAULT_PROJECT):
+    """
+    Builds the project's next index generation in a side directory and swaps
+    it in once it is complete. progress(fraction, stage) is called as work advances.
+
+    Files are loaded and split in worker processes and their chunks are
+    embedded in batches as they arrive, so memory stays bounded by the
+    in-flight window rather than the corpus size. Binary or undecodable
+    files are skipped and reported in the result.
+    """
+    progress = progress or _no_progress
     print(f"Processing files from: {upload_dir}")
-    loader = DirectoryLoader(upload_dir, glob="**/*", loader_cls=TextLoader)
-    documents = loader.load()
+    progress(0.02, "scanning")
+    with stage("ingest", "scan"):
+        files = list_files(upload_dir)
+
+    db_root = project_db_root(project_id)
+    current_db_path = active_db_path(db_root)
+    manifest = load_manifest(current_db_path) if current_db_path else {}
     
-    if not documents:
+    if not files and not manifest:
         return {"status": "error", "message": "No documents found."}
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    chunks = text_splitter.split_documents(documents)
+    new_manifest = {}
+    counts = {"added": 0, "updated": 0, "deleted": 0, "unchanged": 0, "skipped": 0}
+    skipped_files = []
+    pending = []
+    ids_to_delete = []
+    total_chunks = 0
+    embedded = 0
+    load_seconds = split_seconds = embed_seconds = 0.0
+    vector_store = None
+    new_db_path = None
+    known_hashes = {source: entry["hash"] for source, entry in manifest.items()}
 
-    print(f"Created {len(chunks)} chunks.")
+    try:
+        # 1. Stream files through the workers, diffing each against the manifest
+        for done, item in enumerate(iter_split_files(files, known_hashes), start=1):
+            progress(0.05 + 0.85 * done / len(files), f"processing {done}/{len(files)} files")
+            load_seconds += item["load_seconds"]
+            split_seconds += item["split_seconds"]
+            source = item["source"]
+            previous = manifest.get(source)
 
-    embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    
-    if os.path.exists(DB_PATH):
-        shutil.rmtree(DB_PATH)
+            if item["status"] == "skipped":
+                # Treated as absent: a previously indexed version is removed below
+                counts["skipped"] += 1
+                skipped_files.append({"source": source, "reason": item["reason"]})
+                print(f"Skipping {source}: {item['reason']}")
+                continue
 
-    Chroma.from_documents(
-        documents=chunks, 
-        embedding=embedding_model, 
-        persist_directory=DB_PATH
-    )
+            if item["status"] == "unchanged":
+                counts["unchanged"] += 1
+                new_manifest[source] = previous
+                total_chunks += len(previous["chunk_ids"])
+                continue
+
+            chunks = item["chunks"]
+            chunk_ids = [chunk.id for chunk in chunks]
+            total_chunks += len(chunk_ids)
+
+            if previous:
+                # Only embed chunks whose content changed; drop the ones that vanished
+                counts["updated"] += 1
+                old_ids = set(previous["chunk_ids"])
+                pending.extend(c for c in chunks if c.id not in old_ids)
+                ids_to_delete.extend(old_ids - set(chunk_ids))
+            else:
+                counts["added"] += 1
+                pending.extend(chunks)
+
+            new_manifest[source] = {"hash": item["hash"], "chunk_ids": chunk_ids}
+
+            # 2. Embed full batches while the workers keep splitting
+            while len(pending) >= EMBED_BATCH_SIZE:
+                if vector_store is None:
+                    vector_store, new_db_path = _open_next_generation(db_root, copy_active=bool(manifest))
+                batch, pending = pending[:EMBED_BATCH_SIZE], pending[EMBED_BATCH_SIZE:]
+                embed_started = time.perf_counter()
+                vector_store.add_documents(batch)
+                embed_seconds += time.perf_counter() - embed_started
+                embedded += len(batch)
+
+        # 3. Files that disappeared since the last build
+        for source, previous in manifest.items():
+            if source not in new_manifest:
+                counts["deleted"] += 1
+                ids_to_delete.extend(previous["chunk_ids"])
+
+        STAGE_SECONDS.observe(load_seconds, pipeline="ingest", stage="load")
+        STAGE_SECONDS.observe(split_seconds, pipeline="ingest", stage="split")
+
+        result = {
+            "status": "success",
+            "chunks_processed": total_chunks,
+            "chunks_embedded": embedded + len(pending),
+            "chunks_deleted": len(ids_to_delete),
+            **counts,
+            "skipped_files": skipped_files,
+        }
+        INGESTED_CHUNKS.inc(result["chunks_embedded"], action="embedded")
+        INGESTED_CHUNKS.inc(len(ids_to_delete), action="deleted")
+        INGESTED_CHUNKS.inc(total_chunks - result["chunks_embedded"], action="unchanged")
+
+        if vector_store is None and not pending and not ids_to_delete:
+            # Nothing changed: keep serving the current generation as is
+            progress(1.0, "unchanged")
+            return result
+
+        print(f"Embedded {result['chunks_embedded']} chunks, deleting {len(ids_to_delete)}.")
+
+        # 4. Flush the last partial batch and apply deletions
+        progress(0.92, "finishing index")
+        if vector_store is None:
+            vector_store, new_db_path = _open_next_generation(db_root, copy_active=bool(manifest))
+        if pending:
+            embed_started = time.perf_counter()
+            vector_store.add_documents(pending)
+            embed_seconds += time.perf_counter() - embed_started
+        if ids_to_delete:
+            vector_store.delete(ids=ids_to_delete)
+
+        STAGE_SECONDS.observe(embed_seconds, pipeline="ingest", stage="embed")
+        result["embedding_seconds"] = round(embed_seconds, 3)
+        result["chunks_per_second"] = round(result["chunks_embedded"] / embed_seconds, 1) if embed_seconds else None
+
+        with stage("ingest", "persist"):
+            from .vector_index import NumpyVectorStore
+            if isinstance(vector_store, NumpyVectorStore):
+                vector_store.persist()
+            save_manifest(new_manifest, new_db_path)
+    except Exception:
+        if new_db_path is not None:
+            discard_generation(new_db_path)
+        raise
+
+    # 5. Atomic swap: new queries go to the new generation
+    with stage("ingest", "activate"):
+        activate_generation(new_db_path, db_root)
+        registry.swap_vector_store(vector_store, project_id, new_db_path)
+
+    # Cached test cases were grounded in chunks that may no longer exist
+    response_cache.clear(test_case_namespace(project_id))
+    progress(1.0, "done")
     
-    return {"status": "success", "chunks_processed": len(chunks)}
+    return result
 
 def get_llm():
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        raise ValueError("GROQ_API_KEY not found")
-    
-    return ChatGroq(
-        model="llama-3.3-70b-versatile",
-        temperature=0.1,
-        api_key=api_key
+    """
+    Returns the shared LLM client (created once per process).
+    """
+    return registry.get_llm()
+
+# Bumped when what gets cached changes: since v2 only answers whose
+# test cases all validate (after repair) are cached
+TEST_CASE_CACHE_VERSION = 2
+
+def _test_case_cache_key(query: str, docs):
+    chunk_ids = sorted(doc.metadata.get("chunk_id", doc.page_content) for doc in docs)
+    return make_key(normalize_query(query), chunk_ids, LLM_MODEL, LLM_TEMPERATURE, TEST_CASE_CACHE_VERSION)
+
+def _track_models():
+    # The LLM gateway (and LangChain) load lazily, like the chains themselves
+    from .llm_gateway import track_answering_models
+    return track_answering_models()
+
+def _from_primary(models):
+    # Keys name LLM_MODEL: an answer from the gateway's fallback model is
+    # served but not cached, so it is not replayed once the primary recovers
+    return models <= {LLM_MODEL}
+
+def _cacheable(models, collector):
+    # A refusal or an answer with items the repair could not fix is served
+    # as is but not cached: the next request gets a fresh generation
+    return _from_primary(models) and bool(collector.records) and not collector.invalid
+
+def _script_cache_key(test_case: str, html_content: str, mode: str = "standard"):
+    # Canonicalise the JSON so key order/whitespace differences still hit
+    try:
+        test_case_key = json.dumps(json.loads(test_case), sort_keys=True)
+    except ValueError:
+        test_case_key = test_case.strip()
+    return make_key(test_case_key, content_hash(html_content), mode, DOM_DIGEST_ENABLED, LLM_MODEL, LLM_TEMPERATURE)
+
+def _fetch_candidates(retriever, vector):
+    # RETRIEVER_FETCH_K nearest chunks, reordered by MMR (relevant but diverse)
+    return retriever.vectorstore.max_marginal_relevance_search_by_vector(
+        vector, k=RETRIEVER_FETCH_K, fetch_k=RETRIEVER_FETCH_K, lambda_mult=MMR_LAMBDA
     )
 
-def generate_test_cases(query: str):
+def _fetch_candidates_batch(retriever, vectors):
+    # The numpy index scores every query in one matmul; other stores go one by one
+    store = retriever.vectorstore
+    if hasattr(store, "max_marginal_relevance_search_by_vectors"):
+        return store.max_marginal_relevance_search_by_vectors(
+            vectors, k=RETRIEVER_FETCH_K, fetch_k=RETRIEVER_FETCH_K, lambda_mult=MMR_LAMBDA
+        )
+    return [_fetch_candidates(retriever, vector) for vector in vectors]
+
+async def aretrieve(query: str, pipeline: str, project_id: str = DEFAULT_PROJECT):
     """
-    Updated to use the modern 'create_retrieval_chain'
+    Returns (documents, packing stats) for the query: MMR candidates merged,
+    de-duplicated and packed to CONTEXT_TOKEN_BUDGET. Embedding, search and
+    packing run as timed stages on the bounded blocking-work executor.
     """
-    # 1. Load DB
-    embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    vector_store = Chroma(persist_directory=DB_PATH, embedding_function=embedding_model)
-    retriever = vector_store.as_retriever(search_kwargs={"k": 3})
+    # Opening the project's store (first use, new generation) and loading
+    # the embedding model block: neither may run on the event loop
+    retriever = await asyncio.to_thread(registry.get_retriever, project_id)
+    with stage(pipeline, "embed_query"):
+        vector = await asyncio.to_thread(lambda: registry.get_embedding_model().embed_query(query))
+    with stage(pipeline, "retrieve"):
+        candidates = await asyncio.to_thread(_fetch_candidates, retriever, vector)
+    with stage(pipeline, "pack"):
+        docs, context = await asyncio.to_thread(pack_context, candidates)
+    RETRIEVED_CHUNKS.observe(context["chunks_used"])
+    return docs, context
 
-    # 2. Define Prompt
-    system_prompt = (
-        "You are a QA Automation Lead. Use the context provided below to generate comprehensive test cases. "
-        "Output strictly JSON format with keys: test_id, description, expected_result, grounded_in. "
-        "Do not output Markdown code blocks.\n\n"
-        "Context: {context}"
-    )
-    
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", system_prompt),
-        ("human", "{input}"),
-    ])
-
-    # 3. Create the Chain (The Modern Way)
-    llm = get_llm()
-    question_answer_chain = create_stuff_documents_chain(llm, prompt)
-    rag_chain = create_retrieval_chain(retriever, question_answer_chain)
-
-    # 4. Run it
-    response = rag_chain.invoke({"input": query})
-    
-    # The answer is in the 'answer' key
-    return response["answer"]
+async def aretrieve_batch(queries: list, pipeline: str, project_id: str = DEFAULT_PROJECT):
+    """
+    aretrieve for many queries at once: one embedding batch and one
+    search for all of them. Returns [(docs, context), ...] in query order.
+    """
+    retriever = await asyncio.to_thread(registry.get_retriever, project_id)
+    with stage(pipeline, "embed_query"):
+        vectors = await asyncio.to_thread(lambda: registry.get_embedding_model().embed_documents(list(queries)))
+    with stage(pipeline, "retrieve"):
+        candidates = await asyncio.to_thread(_fetch_candidates_batch, retriever, vectors)
+    with stage(pipeline, "pack"):
+        packed = await asyncio.to_thread(lambda: [pack_context(c) for c in candidates])
+    for _, context in packed:
+        RETRIEVED_CHUNKS.observe(context["chunks_used"])
+    return packed
 
-def generate_selenium_script(test_case: str, html_content: str):
-    llm = get_llm()
-    
-    prompt_text = f"""
-    You are a Senior SDET. Write a Python Selenium script for the SPECIFIC test case provided below.
-    
-    --- INPUT DATA ---
-    Test Case JSON: {test_case}
-    Target HTML: {html_content}
-    
-    --- FILE LOCATION ---
-    The HTML file is located at: "assets/checkout.html" (Relative to the script).
-    
-    --- SCOPE RESTRICTION ---
-    1. Generate code ONLY for the specific test case.
-    
-    --- LOGIC FLOW ---
-    1. SETUP:
-       - Init Driver.
-       - Define path: `file_path = os.path.abspath("assets/checkout.html")`
-       - Open file: `driver.get(f"file:///{{file_path}}")`
-       
-       # --- SMART CART LOGIC ---
-       - IF the test description contains "empty", DO NOT add items.
-       - ELSE IF testing 'SAVE15' or generic discount, add items (`btn-add-headphones`) to ensure total > 0.
-       - IF testing 'FREESHIP', select 'express' shipping.
-       
-       - Wait 1s for JS updates.
-    
-    2. CAPTURE & ACTION:
-       - Capture `price_before` (float).
-       - Perform Action (Input Code -> Click Apply).
-       - Wait 1s (or WebDriverWait if text expects to change).
-       - Capture `price_after` (float).
-    
-    3. ASSERTION:
-       - IF "empty" or "invalid": `expected = price_before` (No change).
-       - IF "SAVE15" and valid: `expected = price_before * 0.85`.
-       - IF "FREESHIP": `expected = price_before - 10`.
-       - Assert `abs(price_after - expected) < 0.01`.
-    
-    4. FINISH:
-       - time.sleep(10)
-       - driver.quit()
-       
-    Return ONLY raw Python code.
+def _record_tokens(pipeline: str, prompt_tokens: int, completion_text: str):
+    LLM_TOKENS.observe(prompt_tokens, pipeline=pipeline, kind="prompt")
+    LLM_TOKENS.observe(count_tokens(completion_text), pipeline=pipeline, kind="completion")
+
+def _test_case_prompt_text(query: str, docs):
+    # What the stuff-documents chain sends (for token accounting only)
+    context = "\n\n".join(doc.page_content for doc in docs)
+    return registry.get_test_case_prompt().format(input=query, context=context)
+
+def _repair_inputs(query: str, docs, collector, pending):
+    items = "\n\n".join(f"[{i}] {item['error']}:\n{item['raw']}" for i, item in enumerate(pending, 1))
+    sources = sorted({doc.metadata.get("source", "unknown") for doc in docs})
+    return {
+        "input": query, "items": items, "count": len(pending),
+        "existing_ids": ", ".join(sorted(collector.test_ids)) or "none",
+        "sources": ", ".join(sources) or "none",
+    }
+
+async def _arepair_test_cases(query: str, docs, collector, pipeline: str):
     """
-    
-    response = llm.invoke(prompt_text)
-    return response.content
\ No newline at end of file
+    Re-requests only the invalid items of an answer (collector.invalid),
+    up to TEST_CASE_REPAIR_ATTEMPTS times; the valid records are kept as
+    they are. Fixed items are added to the collector and returned; what
+    could not be fixed stays in collector.invalid.
+    """
+    repaired = []
+    for _ in range(TEST_CASE_REPAIR_ATTEMPTS):
+        pending = collector.invalid
+        if not pending:
+            break
+        inputs = _repair_inputs(query, docs, collector, pending)
+        try:
+            with stage(pipeline, "repair"):
+                message = await registry.get_test_case_repair_chain().ainvoke(inputs)
+        except Exception as e:
+            # The valid test cases are still worth returning
+            print(f"Test-case repair failed: {e}")
+            break
+        _record_tokens(pipeline, count_tokens(registry.get_test_case_repair_prompt().format(**inputs)), message.content)
+
+        fixed = TestCaseCollector()
+        fixed.feed(message.content)
+        fixed.finish()
+        # A fixed item replaces the invalid one with its test_id, otherwise the next one in order
+        unresolved = list(pending)
+        for record in fixed.records[:len(pending)]:
+            match = next((item for item in unresolved if item["test_id"] == record["test_id"]), None)
+            unresolved.remove(match or unresolved[0])
+            repaired.append(collector.add_record(record))
+        collector.invalid = unresolved
+
+    if repaired:
+        TEST_CASE_REPAIRS.inc(len(repaired), outcome="repaired")
+    if collector.invalid and TEST_CASE_REPAIR_ATTEMPTS > 0:
+        TEST_CASE_REPAIRS.inc(len(collector.invalid), outcome="failed")
+    return repaired
+
+def _repaired_answer(answer: str, collector, repaired):
+    # What gets cached: the raw answer, or the valid records once some were repaired
+    return json.dumps(collector.records, indent=2) if repaired else answer
+
+async def agenerate_test_cases(query: str, project_id: str = DEFAULT_PROJECT):
+    """
+    Generates test cases for the query: the LLM call is native async and the
+    vector search runs on the bounded blocking-work executor.
+    Identical concurrent queries share one LLM call.
+    Returns {"answer", "test_cases", "invalid", "repaired", "prompt_tokens",
+    "context", "cached"}: test_cases are the validated records (see
+    case_records.py), invalid what was left after the repair call.
+    """
+    docs, context = await aretrieve(query, "generate_tests", project_id)
+    return await _agenerate_answer(query, docs, context, "generate_tests", project_id)
+
+async def _agenerate_answer(query: str, docs, context: dict, pipeline: str, project_id: str):
+    # Shared by single queries and test plans (same cache entries)
+    key = _test_case_cache_key(query, docs)
+    # Encoding the whole packed context is CPU work: keep it off the event loop
+    prompt_tokens = await asyncio.to_thread(lambda: count_tokens(_test_case_prompt_text(query, docs)))
+    computed = []
+    models = []
+
+    async def compute():
+        models.append(_track_models())
+        with stage(pipeline, "llm"):
+            answer = await registry.get_test_case_chain().ainvoke({"input": query, "context": docs})
+        _record_tokens(pipeline, prompt_tokens, answer)
+        collector = TestCaseCollector()
+        collector.feed(answer)
+        collector.finish()
+        repaired = await _arepair_test_cases(query, docs, collector, pipeline)
+        computed.append((collector, repaired))
+        return _repaired_answer(answer, collector, repaired)
+
+    with stage(pipeline, "generate"):
+        answer = await response_cache.get_or_compute(
+            test_case_namespace(project_id), key, compute, cache_if=lambda _: _cacheable(models[0], computed[0][0])
+        )
+    if computed:
+        collector, repaired = computed[0]
+        records, invalid = collector.records, collector.invalid
+    else:
+        # Cached answers validate in full; a request that joined an in-flight
+        # call gets its answer as the repair left it
+        (records, invalid), repaired = parse_test_cases(answer), []
+    return {
+        "answer": answer, "test_cases": records, "invalid": invalid, "repaired": len(repaired),
+        "prompt_tokens": prompt_tokens, "context": context, "cached": not computed,
+    }
+
+async def agenerate_test_plan(queries: list, project_id: str = DEFAULT_PROJECT, max_parallel: int = BATCH_MAX_PARALLEL):
+    """
+    One test plan for many feature queries: retrieval is batched, the
+    generations run concurrently (max_parallel at a time) and the answers
+    are merged and de-duplicated with stable ids (see plan_merge.py).
+    A feature whose generation fails is reported, not fatal.
+    Returns {"test_cases", "features", "merge"}.
+    """
+    # The same feature asked twice is generated once
+    unique = {}
+    for query in queries:
+        unique.setdefault(normalize_query(query), query.strip())
+    queries = list(unique.values())
+
+    retrieved = await aretrieve_batch(queries, "test_plan", project_id)
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run(query, docs, context):
+        async with semaphore:
+            try:
+                return await _agenerate_answer(query, docs, context, "test_plan", project_id), None
+            except Exception as e:
+                return None, str(e)
+
+    results = await asyncio.gather(*(run(q, docs, context) for q, (docs, context) in zip(queries, retrieved)))
+
+    features, parsed = [], []
+    for query, (result, error) in zip(queries, results):
+        cases = result["test_cases"] if result else []
+        parsed.append((query, cases))
+        features.append({
+            "query": query,
+            "test_cases": len(cases),
+            "invalid": len(result["invalid"]) if result else 0,
+            "repaired": result["repaired"] if result else 0,
+            "cached": result["cached"] if result else False,
+            "prompt_tokens": result["prompt_tokens"] if result else 0,
+            "error": error,
+        })
+    if features and all(f["error"] for f in features):
+        # Nothing generated at all: a 503, like a single failing query
+        raise LLMUnavailableError(f"Every feature failed: {features[0]['error']}")
+
+    with stage("test_plan", "merge"):
+        test_cases, merge_stats = merge_test_cases(parsed)
+    # Records are validated per answer; count what was dropped there
+    merge_stats["invalid"] += sum(f["invalid"] for f in features)
+    return {"test_cases": test_cases, "features": features, "merge": merge_stats}
+
+def _script_inputs(test_case: str, html_content: str):
+    # The digest (cached by HTML hash) replaces the raw markup in the prompt
+    target_page = get_dom_digest(html_content) if DOM_DIGEST_ENABLED else html_content
+    return {"test_case": test_case, "target_page": target_page}
+
+def finish_script(script: str, mode: str):
+    """
+    Fast mode: validates the script and rewrites leftover fixed sleeps
+    into condition waits. Returns (script, report); report is None in
+    standard mode. The saving is estimated against a standard-mode run.
+    The cache keeps the raw LLM output.
+    """
+    if mode != "fast":
+        return script, None
+    return optimize_script(script, STANDARD_SCRIPT_SLEEP_SECONDS)
+
+async def agenerate_selenium_script(test_case: str, html_content: str, mode: str = "standard"):
+    """
+    Generates the script for one test case; the LLM gateway applies the rate
+    budget, so only cache misses are charged. Returns (script, report)
+    like finish_script.
+    """
+    key = _script_cache_key(test_case, html_content, mode)
+    models = []
+
+    async def compute():
+        models.append(_track_models())
+        script_chain = registry.get_script_chain(mode)
+        # Parsing a large page is CPU work: keep it off the event loop
+        with stage("generate_script", "prompt"):
+            inputs = await asyncio.to_thread(_script_inputs, test_case, html_content)
+            prompt_text = registry.get_script_prompt(mode).format(**inputs)
+        with stage("generate_script", "llm"):
+            response = await script_chain.ainvoke(inputs)
+        _record_tokens("generate_script", count_tokens(prompt_text), response.content)
+        return response.content
+
+    with stage("generate_script", "generate"):
+        script = await response_cache.get_or_compute(SCRIPTS, key, compute, cache_if=lambda _: _from_primary(models[0]))
+    with stage("generate_script", "postprocess"):
+        return finish_script(script, mode)
+
+async def agenerate_selenium_scripts(test_cases: list, html_content: str, max_parallel: int = BATCH_MAX_PARALLEL,
+                                     mode: str = "standard"):
+    """
+    Fans a whole test plan out to the LLM, at most max_parallel at a time and
+    within the LLM gateway's RPM/TPM budgets. Yields (index, script, report, error)
+    tuples in completion order.
+    """
+    semaphore = asyncio.Semaphore(max_parallel)
+
+    async def run(index, test_case):
+        test_case_json = test_case if isinstance(test_case, str) else json.dumps(test_case)
+        async with semaphore:
+            try:
+                script, report = await agenerate_selenium_script(test_case_json, html_content, mode)
+                return index, script, report, None
+            except Exception as e:
+                return index, None, None, str(e)
+
+    tasks = [asyncio.create_task(run(i, tc)) for i, tc in enumerate(test_cases)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away (or we finished): stop any remaining generations
+        for task in tasks:
+            task.cancel()
+
+async def astream_test_cases(query: str, project_id: str = DEFAULT_PROJECT):
+    """
+    Streams a test-case generation as (event, data) pairs:
+    ("token", text) for each LLM delta, ("test_case", record) as soon as each
+    test case parses and validates, then the repaired ones, and a final
+    ("done", {"answer", "test_cases", "invalid", "repaired", "cached",
+    "prompt_tokens", "context"}).
+    """
+    docs, context = await aretrieve(query, "stream_tests", project_id)
+    key = _test_case_cache_key(query, docs)
+    prompt_tokens = await asyncio.to_thread(lambda: count_tokens(_test_case_prompt_text(query, docs)))
+    namespace = test_case_namespace(project_id)
+    collector = TestCaseCollector()
+
+    cached = await response_cache.alookup(namespace, key)
+    if cached is not None:
+        for record in collector.feed(cached) + collector.finish():
+            yield "test_case", record
+        yield "done", {
+            "answer": cached, "test_cases": collector.records, "invalid": collector.invalid, "repaired": 0,
+            "cached": True, "prompt_tokens": prompt_tokens, "context": context,
+        }
+        return
+
+    parts = []
+    models = _track_models()
+    started = time.perf_counter()
+    with stage("stream_tests", "llm"):
+        async for text in registry.get_test_case_chain().astream({"input": query, "context": docs}):
+            if not parts:
+                STAGE_SECONDS.observe(time.perf_counter() - started, pipeline="stream_tests", stage="llm_first_token")
+            parts.append(text)
+            yield "token", text
+            for record in collector.feed(text):
+                yield "test_case", record
+    for record in collector.finish():
+        yield "test_case", record
+
+    answer = "".join(parts)
+    _record_tokens("stream_tests", prompt_tokens, answer)
+    # Only the items that failed are re-requested; the rest were already sent
+    repaired = await _arepair_test_cases(query, docs, collector, "stream_tests")
+    for record in repaired:
+        yield "test_case", record
+    answer = _repaired_answer(answer, collector, repaired)
+    if _cacheable(models, collector):
+        await response_cache.aset(namespace, key, answer)
+    yield "done", {
+        "answer": answer, "test_cases": collector.records, "invalid": collector.invalid, "repaired": len(repaired),
+        "cached": False, "prompt_tokens": prompt_tokens, "context": context,
+    }
+
+async def astream_selenium_script(test_case: str, html_content: str, mode: str = "standard"):
+    """
+    Streams a script generation as ("token", text) pairs followed by
+    ("done", {"script", "cached", "fast"}). Tokens are the raw LLM output;
+    in fast mode the rewritten script and its report come with "done".
+    """
+    key = _script_cache_key(test_case, html_content, mode)
+    cached = await response_cache.alookup(SCRIPTS, key)
+    if cached is not None:
+        yield "token", cached
+        script, report = finish_script(cached, mode)
+        yield "done", {"script": script, "cached": True, "fast": report}
+        return
+
+    with stage("stream_script", "prompt"):
+        inputs = await asyncio.to_thread(_script_inputs, test_case, html_content)
+    parts = []
+    models = _track_models()
+    started = time.perf_counter()
+    with stage("stream_script", "llm"):
+        async for chunk in registry.get_script_chain(mode).astream(inputs):
+            if chunk.content:
+                if not parts:
+                    STAGE_SECONDS.observe(time.perf_counter() - started, pipeline="stream_script", stage="llm_first_token")
+                parts.append(chunk.content)
+                yield "token", chunk.content
+
+    script = "".join(parts)
+    _record_tokens("stream_script", count_tokens(registry.get_script_prompt(mode).format(**inputs)), script)
+    if _from_primary(models):
+        await response_cache.aset(SCRIPTS, key, script)
+    script, report = finish_script(script, mode)
+    yield "done", {"script": script, "cached": False, "fast": report}
@@ -0,0 +1,64 @@
+import time
+import asyncio
+
+
+def estimate_tokens(text: str):
+    """
+    Cheap token estimate (~4 characters per token) for budgeting.
+    """
+    return max(1, len(text) // 4)
+
+
+class AsyncTokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills at
+    `rate` tokens per second. acquire() waits until enough are available.
+    """
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self._tokens = capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self, amount: float = 1):
+        # A request larger than the bucket would wait forever; cap it
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                await asyncio.sleep((amount - self._tokens) / self.rate)
+
+    def available(self):
+        self._refill()
+        return self._tokens
+
+
+class RateBudget:
+    """
+    Requests-per-minute and tokens-per-minute limits for one API key and model.
+    """
+
+    def __init__(self, requests_per_minute: int, tokens_per_minute: int):
+        self.requests = AsyncTokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = AsyncTokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+
+    async def acquire(self, tokens: int):
+        await self.requests.acquire(1)
+        await self.tokens.acquire(tokens)
+
+    def status(self):
+        return {
+            "requests_available": round(self.requests.available(), 2),
+            "tokens_available": round(self.tokens.available(), 2),
+        }
+
@@ -0,0 +1,281 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from .config import (
+    GROQ_API_KEYS, RETRIEVER_K, VECTOR_BACKEND, NUMPY_INDEX_DTYPE, EMBEDDING_ENGINE,
+    MAX_OPEN_PROJECTS, PROJECT_CACHE_MAX_MB
+)
+from .prompts import SCRIPT_MODES, build_test_case_prompt, build_test_case_repair_prompt, build_script_prompt
+from .index_store import active_db_path, close_vector_store
+from .projects import DEFAULT_PROJECT, project_db_root
+from .tokens import get_tokenizer
+
+# LangChain, Chroma, the embedding model (torch) and the Groq client are
+# imported where they are first used, not here: importing the app stays
+# cheap and health checks answer while warm_up() loads them.
+
+
+def create_llm():
+    from .llm_gateway import create_gateway
+
+    api_keys = GROQ_API_KEYS or [key for key in [os.getenv("GROQ_API_KEY")] if key]
+    if not api_keys:
+        raise ValueError("GROQ_API_KEY not found")
+
+    return create_gateway(api_keys)
+
+
+def _dir_size(path: str):
+    total = 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ProjectHandle:
+    """
+    An open index generation of one project and the retriever built on it.
+    size_bytes (the generation's size on disk) approximates its memory cost.
+    """
+
+    def __init__(self, project_id: str, db_path: str, vector_store):
+        self.project_id = project_id
+        self.db_path = db_path
+        self.vector_store = vector_store
+        self.retriever = vector_store.as_retriever(search_kwargs={"k": RETRIEVER_K})
+        self.size_bytes = _dir_size(db_path) if db_path else 0
+
+
+class ResourceRegistry:
+    """
+    Process-wide home for the expensive objects: the embedding model,
+    the vector store handles, the LLM client and the chains built on them.
+    Everything is created lazily on first use (or by warm_up at startup)
+    and then reused by every request.
+
+    Vector stores are per project and kept in an LRU cache bounded by
+    MAX_OPEN_PROJECTS and PROJECT_CACHE_MAX_MB. Opening one project's
+    store only takes that project's lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._embedding_model = None
+        self._projects = OrderedDict()
+        self._project_locks = {}
+        self._llm = None
+        self._prompts = {}
+        self._test_case_chain = None
+        self._test_case_repair_chain = None
+        self._script_chains = {}
+        self.ready = False
+        self.warmup_error = None
+
+    # ---------------- Embeddings ----------------
+    def get_embedding_model(self):
+        if self._embedding_model is None:
+            with self._lock:
+                if self._embedding_model is None:
+                    from .embeddings import create_embedding_engine
+                    self._embedding_model = create_embedding_engine()
+        return self._embedding_model
+
+    # ---------------- Vector Store ----------------
+    def open_vector_store(self, db_path: str):
+        if VECTOR_BACKEND == "numpy":
+            from .vector_index import NumpyVectorStore
+            return NumpyVectorStore(db_path, self.get_embedding_model(), dtype=NUMPY_INDEX_DTYPE)
+        from langchain_chroma import Chroma
+        return Chroma(persist_directory=db_path, embedding_function=self.get_embedding_model())
+
+    def _project_lock(self, project_id: str):
+        with self._lock:
+            if project_id not in self._project_locks:
+                self._project_locks[project_id] = threading.Lock()
+            return self._project_locks[project_id]
+
+    def _cache_handle(self, handle):
+        with self._lock:
+            replaced = self._projects.get(handle.project_id)
+            self._projects[handle.project_id] = handle
+            self._projects.move_to_end(handle.project_id)
+            self._evict()
+        # The replaced generation stays open for in-flight requests until it is
+        # garbage-collected, unless another process already deleted it
+        if replaced is not None and replaced.db_path != handle.db_path and not os.path.isdir(replaced.db_path or ""):
+            close_vector_store(replaced.db_path)
+
+    def _evict(self):
+        # Least recently used first; the newest handle always stays.
+        # An evicted project is reopened on its next request.
+        max_bytes = PROJECT_CACHE_MAX_MB * 1024 * 1024
+        while len(self._projects) > 1 and (
+            len(self._projects) > MAX_OPEN_PROJECTS
+            or sum(h.size_bytes for h in self._projects.values()) > max_bytes
+        ):
+            project_id, handle = self._projects.popitem(last=False)
+            close_vector_store(handle.db_path)
+            print(f"Closed vector store of project '{project_id}' (LRU)")
+
+    def get_project_handle(self, project_id: str = DEFAULT_PROJECT):
+        """
+        Open handle on the project's active index generation, or None before its first build.
+        The generation pointer is checked on every call: a generation activated
+        by another worker process or a CLI build replaces the cached handle
+        before the old generation is garbage-collected.
+        """
+        db_root = project_db_root(project_id)
+        db_path = active_db_path(db_root)
+        with self._lock:
+            handle = self._projects.get(project_id)
+            if handle is not None and handle.db_path == db_path:
+                self._projects.move_to_end(project_id)
+                return handle
+            if db_path is None:
+                self._projects.pop(project_id, None)
+                return None
+
+        with self._project_lock(project_id):
+            # Another build may have activated a newer generation meanwhile
+            db_path = active_db_path(db_root)
+            with self._lock:
+                handle = self._projects.get(project_id)
+            if db_path is None:
+                return None
+            if handle is None or handle.db_path != db_path:
+                handle = ProjectHandle(project_id, db_path, self.open_vector_store(db_path))
+                self._cache_handle(handle)
+        return handle
+
+    def swap_vector_store(self, vector_store, project_id: str = DEFAULT_PROJECT, db_path: str = None):
+        """
+        Point the project's new requests at a freshly built store. Requests that
+        already hold the old handle (or retriever) finish against the old generation.
+        vector_store=None just drops the cached handle.
+        """
+        if vector_store is None:
+            with self._lock:
+                self._projects.pop(project_id, None)
+            return
+        self._cache_handle(ProjectHandle(project_id, db_path, vector_store))
+
+    # ---------------- LLM & Chains ----------------
+    def get_llm(self):
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = create_llm()
+        return self._llm
+
+    def llm_status(self):
+        """
+        Gateway routes and fallback state ({} until the LLM is created,
+        or when a plain chat model was installed instead).
+        """
+        llm = self._llm
+        return llm.status() if hasattr(llm, "status") else {}
+
+    def _get_prompt(self, name: str, build):
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            with self._lock:
+                prompt = self._prompts.get(name)
+                if prompt is None:
+                    prompt = self._prompts[name] = build()
+        return prompt
+
+    def get_test_case_prompt(self):
+        return self._get_prompt("test_case", build_test_case_prompt)
+
+    def get_test_case_repair_prompt(self):
+        return self._get_prompt("test_case_repair", build_test_case_repair_prompt)
+
+    def get_script_prompt(self, mode: str = "standard"):
+        return self._get_prompt(f"script_{mode}", lambda: build_script_prompt(mode))
+
+    def get_test_case_chain(self):
+        if self._test_case_chain is None:
+            with self._lock:
+                if self._test_case_chain is None:
+                    from langchain.chains.combine_documents import create_stuff_documents_chain
+                    self._test_case_chain = create_stuff_documents_chain(self.get_llm(), self.get_test_case_prompt())
+        return self._test_case_chain
+
+    def get_test_case_repair_chain(self):
+        if self._test_case_repair_chain is None:
+            with self._lock:
+                if self._test_case_repair_chain is None:
+                    self._test_case_repair_chain = self.get_test_case_repair_prompt() | self.get_llm()
+        return self._test_case_repair_chain
+
+    def get_retriever(self, project_id: str = DEFAULT_PROJECT):
+        handle = self.get_project_handle(project_id)
+        if handle is None:
+            raise ValueError(f"Knowledge base of project '{project_id}' has not been built yet. Upload documents first.")
+        return handle.retriever
+
+    def get_script_chain(self, mode: str = "standard"):
+        chain = self._script_chains.get(mode)
+        if chain is None:
+            with self._lock:
+                chain = self._script_chains.get(mode)
+                if chain is None:
+                    chain = self._script_chains[mode] = self.get_script_prompt(mode) | self.get_llm()
+        return chain
+
+    # ---------------- Startup ----------------
+    def warm_up(self):
+        """
+        Import the heavy libraries, load the embedding model, open the store
+        and build the prompts and chains up front so the first real request
+        does not pay for it. Runs in the background after startup.
+        """
+        start = time.perf_counter()
+        try:
+            # Prompts need no credentials: built even if the LLM is not configured
+            self.get_test_case_prompt()
+            self.get_test_case_repair_prompt()
+            for mode in SCRIPT_MODES:
+                self.get_script_prompt(mode)
+            # Embedding one string forces the model weights into memory
+            self.get_embedding_model().embed_query("warm up")
+            # Opens the default project's store and retriever, if it has been built
+            self.get_project_handle()
+            # Context packing counts prompt tokens with the LLM's tokenizer
+            get_tokenizer()
+            self.get_test_case_chain()
+            self.get_test_case_repair_chain()
+            for mode in SCRIPT_MODES:
+                self.get_script_chain(mode)
+            self.warmup_error = None
+            print(f"Warm-up finished in {time.perf_counter() - start:.1f}s")
+        except Exception as e:
+            self.warmup_error = str(e)
+            print(f"Warm-up failed: {e}")
+        self.ready = self.warmup_error is None
+
+    def status(self):
+        with self._lock:
+            handles = list(self._projects.values())
+        return {
+            "ready": self.ready,
+            "embedding_model": self._embedding_model is not None,
+            "embedding_engine": EMBEDDING_ENGINE,
+            "vector_store": any(h.project_id == DEFAULT_PROJECT for h in handles),
+            "active_index": active_db_path(),
+            "open_projects": [h.project_id for h in handles],
+            "project_cache_mb": round(sum(h.size_bytes for h in handles) / (1024 * 1024), 2),
+            "vector_backend": VECTOR_BACKEND,
+            "llm": self._llm is not None,
+            "error": self.warmup_error,
+        }
+
+
+# Shared by the FastAPI app and rag_utils
+registry = ResourceRegistry()
@@ -0,0 +1,447 @@
+import io
+import os
+import ast
+import sys
+import json
+import glob
+import time
+import queue
+import ctypes
+import argparse
+import threading
+import traceback
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .config import (
+    RUNNER_WORKERS, RUNNER_DRIVER, RUNNER_TEST_TIMEOUT_SECONDS, CHROME_BINARY, CHROMEDRIVER_PATH
+)
+from .script_postprocess import optimize_script, strip_fences
+
+# ---------------------------------------------------------
+# Parallel runner for generated Selenium scripts.
+#
+#     python -m backend.runner generated/*.py --workers 4
+#     python -m backend.runner batch.json --driver fake --fast --report report.json
+#
+# Each worker thread owns one headless browser session for the whole
+# suite. Scripts get that session instead of starting a browser:
+# `webdriver.Chrome(...)` is rewritten to return it, and its quit()/close()
+# only end the test. Between tests the session is reset (cookies, storage,
+# about:blank). --driver fake runs against an in-process model of
+# assets/checkout.html (fake_browser.py), with no browser at all.
+#
+# A test that outlives --timeout has its browser killed (ending any wait
+# on it) and _TestTimeout raised in its thread (ending pure-Python loops).
+# Only a script that catches BaseException itself, or hangs inside a C
+# call that never returns, keeps its worker until the suite timeout.
+# ---------------------------------------------------------
+
+DRIVERS = ("chrome", "fake")
+BROWSER_CLASSES = {"Chrome", "Chromium", "ChromiumEdge", "Edge", "Firefox", "Safari", "Remote"}
+CHROME_ARGS = (
+    "--headless=new", "--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu",
+    "--disable-extensions", "--window-size=1280,1024",
+)
+RESET_STORAGE_JS = "try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (e) {}"
+# Name the rewritten browser constructors call
+SESSION_HOOK = "__runner_session__"
+
+
+def create_driver(kind: str = RUNNER_DRIVER):
+    if kind == "fake":
+        from .fake_browser import FakeCheckoutDriver
+        return FakeCheckoutDriver()
+
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+
+    options = webdriver.ChromeOptions()
+    for arg in CHROME_ARGS:
+        options.add_argument(arg)
+    if CHROME_BINARY:
+        options.binary_location = CHROME_BINARY
+    # Without a path, Selenium Manager locates (or fetches) a matching chromedriver
+    service = Service(executable_path=CHROMEDRIVER_PATH) if CHROMEDRIVER_PATH else Service()
+    driver = webdriver.Chrome(options=options, service=service)
+    driver.set_page_load_timeout(RUNNER_TEST_TIMEOUT_SECONDS)
+    return driver
+
+
+class _TestTimeout(BaseException):
+    """
+    Raised in a test's thread when it outlives its timeout. A BaseException
+    so the script's own `except Exception` blocks do not swallow it.
+    """
+
+
+def _async_raise(thread_id: int, exc_type):
+    # Raised at the thread's next bytecode boundary; exc_type=None drops a pending one
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(
+        ctypes.c_ulong(thread_id), ctypes.py_object(exc_type) if exc_type is not None else None
+    )
+
+
+class PooledDriver:
+    """
+    What a script gets instead of a new browser: the worker's session.
+    quit()/close() only mark the test as done, and when `page_url` is set
+    every local file the script opens is replaced by that page.
+    """
+
+    def __init__(self, driver, page_url: str = None):
+        self.__dict__["_driver"] = driver
+        self.__dict__["_page_url"] = page_url
+
+    def get(self, url: str):
+        if self._page_url and url.startswith("file:"):
+            url = self._page_url
+        return self._driver.get(url)
+
+    def quit(self):
+        pass
+
+    close = quit
+
+    def __getattr__(self, name):
+        return getattr(self._driver, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._driver, name, value)
+
+
+class BrowserSession:
+    """
+    One reusable browser, started on first use.
+    """
+
+    def __init__(self, kind: str):
+        self.kind = kind
+        self.driver = None
+        self.starts = 0
+        self.tests_run = 0
+
+    def ensure(self):
+        if self.driver is None:
+            self.driver = create_driver(self.kind)
+            self.starts += 1
+        return self.driver
+
+    def reset(self):
+        """
+        Clears what a test may leave behind; a session that fails to reset
+        is dropped and restarted for the next test.
+        """
+        if self.driver is None:
+            return
+        try:
+            self.driver.delete_all_cookies()
+            self.driver.execute_script(RESET_STORAGE_JS)
+            self.driver.get("about:blank")
+        except Exception as e:
+            print(f"Browser reset failed, restarting it: {e}", file=sys.stderr)
+            self.close()
+
+    def kill(self):
+        # Called by the test timer: ends whatever the script is waiting on
+        self.close()
+
+    def close(self):
+        driver, self.driver = self.driver, None
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+
+
+class _ThreadOutput(io.TextIOBase):
+    """
+    sys.stdout replacement that sends each test's print() output to
+    that test's buffer (tests run on several threads at once).
+    """
+
+    def __init__(self, fallback):
+        self.fallback = fallback
+        self._local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self._local, "buffer", None)
+        return (buffer or self.fallback).write(text)
+
+    def flush(self):
+        self.fallback.flush()
+
+    @contextmanager
+    def capture(self):
+        self._local.buffer = io.StringIO()
+        try:
+            yield self._local.buffer
+        finally:
+            self._local.buffer = None
+
+
+class _UseSession(ast.NodeTransformer):
+    """
+    Rewrites webdriver.Chrome(...) (and the other browser classes, also
+    when imported by name) into a call returning the pooled session.
+    """
+
+    def __init__(self, imported_names):
+        self.imported_names = imported_names
+
+    def visit_Call(self, node):
+        self.generic_visit(node)
+        func = node.func
+        is_browser = (
+            isinstance(func, ast.Attribute) and func.attr in BROWSER_CLASSES
+            and isinstance(func.value, ast.Name) and func.value.id == "webdriver"
+        ) or (isinstance(func, ast.Name) and func.id in self.imported_names)
+        if not is_browser:
+            return node
+        return ast.copy_location(ast.Call(func=ast.Name(id=SESSION_HOOK, ctx=ast.Load()), args=[], keywords=[]), node)
+
+
+def prepare_script(script: str, fast: bool = False):
+    """
+    Returns (source, code object) ready to exec against a pooled session.
+    Raises SyntaxError for scripts that do not parse.
+    """
+    source = optimize_script(script)[0] if fast else strip_fences(script)
+    tree = ast.parse(source)
+    imported = {
+        alias.asname or alias.name
+        for node in ast.walk(tree)
+        if isinstance(node, ast.ImportFrom) and node.module == "selenium.webdriver"
+        for alias in node.names if alias.name in BROWSER_CLASSES
+    }
+    tree = ast.fix_missing_locations(_UseSession(imported).visit(tree))
+    return source, tree
+
+
+def _failure_line(error, filename: str, source: str):
+    """
+    (line number, source line) of the deepest frame inside the script.
+    """
+    frames = [f for f in traceback.extract_tb(error.__traceback__) if f.filename == filename]
+    if not frames:
+        return None, None
+    lineno = frames[-1].lineno
+    lines = source.splitlines()
+    return lineno, lines[lineno - 1].strip() if 0 < lineno <= len(lines) else None
+
+
+def run_test(test: dict, session: BrowserSession, output: _ThreadOutput, page_url: str = None,
+             fast: bool = False, timeout: float = RUNNER_TEST_TIMEOUT_SECONDS):
+    """
+    Runs one script on the session. Returns its result:
+    status passed | failed (assertion) | error | timeout.
+    """
+    test_id = str(test.get("test_id"))
+    filename = f"<script {test_id}>"
+    result = {
+        "test_id": test_id, "status": "error", "duration_s": 0.0, "message": None,
+        "line": None, "source_line": None, "output": "", "browser_reused": session.driver is not None,
+    }
+    try:
+        source, tree = prepare_script(test.get("script", ""), fast)
+        code = compile(tree, filename, "exec")
+    except SyntaxError as e:
+        result["message"] = f"SyntaxError: {e.msg}"
+        result["line"] = e.lineno
+        return result
+    try:
+        driver = PooledDriver(session.ensure(), page_url)
+    except Exception as e:
+        result["message"] = f"Browser failed to start: {e}"
+        return result
+
+    namespace = {"__name__": "__main__", "__file__": filename, SESSION_HOOK: lambda *args, **kwargs: driver}
+    thread_id = threading.get_ident()
+    state = {"running": True, "timed_out": False}
+    lock = threading.Lock()
+
+    def on_timeout():
+        with lock:
+            if not state["running"]:
+                return
+            state["timed_out"] = True
+            _async_raise(thread_id, _TestTimeout)
+        session.kill()
+
+    timer = threading.Timer(timeout, on_timeout)
+    start = time.perf_counter()
+    timer.start()
+    with output.capture() as buffer:
+        # The outer try catches _TestTimeout wherever it lands, even after exec() returned
+        try:
+            try:
+                exec(code, namespace)
+                result["status"] = "passed"
+            except AssertionError as e:
+                result["status"] = "failed"
+                result["line"], result["source_line"] = _failure_line(e, filename, source)
+                result["message"] = str(e) or f"assert failed: {result['source_line']}"
+            except SystemExit as e:
+                result["status"] = "passed" if e.code in (0, None) else "error"
+                result["message"] = None if e.code in (0, None) else f"exit code {e.code}"
+            except Exception as e:
+                result["line"], result["source_line"] = _failure_line(e, filename, source)
+                result["message"] = f"{type(e).__name__}: {e}"
+            finally:
+                timer.cancel()
+                with lock:
+                    state["running"] = False
+                    if state["timed_out"]:
+                        _async_raise(thread_id, None)
+        except _TestTimeout as e:
+            result["line"], result["source_line"] = _failure_line(e, filename, source)
+        if state["timed_out"]:
+            result["status"] = "timeout"
+            result["message"] = f"Timed out after {timeout:g}s"
+    result["duration_s"] = round(time.perf_counter() - start, 3)
+    result["output"] = buffer.getvalue()[-4000:]
+    session.tests_run += 1
+    session.reset()
+    return result
+
+
+def run_suite(tests, workers: int = RUNNER_WORKERS, driver: str = RUNNER_DRIVER, fast: bool = False,
+              page: str = None, timeout: float = RUNNER_TEST_TIMEOUT_SECONDS, on_result=None):
+    """
+    Runs [{"test_id", "script"}, ...] across `workers` pooled browser
+    sessions. on_result(result) is called as each test finishes.
+    Returns {"summary", "results"} with results in input order.
+    """
+    if driver not in DRIVERS:
+        raise ValueError(f"driver must be one of {', '.join(DRIVERS)}")
+    page_url = Path(page).resolve().as_uri() if page else None
+    sessions = [BrowserSession(driver) for _ in range(max(1, min(workers, len(tests))))]
+    idle = queue.Queue()
+    for session in sessions:
+        idle.put(session)
+
+    output = _ThreadOutput(sys.stdout)
+
+    def run(index, test):
+        session = idle.get()
+        try:
+            return index, run_test(test, session, output, page_url, fast, timeout)
+        finally:
+            idle.put(session)
+
+    results = [None] * len(tests)
+    start = time.perf_counter()
+    sys.stdout = output
+    try:
+        with ThreadPoolExecutor(max_workers=len(sessions), thread_name_prefix="runner") as pool:
+            futures = [pool.submit(run, i, test) for i, test in enumerate(tests)]
+            for future in as_completed(futures):
+                index, result = future.result()
+                results[index] = result
+                if on_result is not None:
+                    on_result(result)
+    finally:
+        sys.stdout = output.fallback
+        for session in sessions:
+            session.close()
+
+    counts = {status: 0 for status in ("passed", "failed", "error", "timeout")}
+    for result in results:
+        counts[result["status"]] += 1
+    summary = {
+        "total": len(results),
+        **counts,
+        "duration_s": round(time.perf_counter() - start, 3),
+        "test_seconds": round(sum(r["duration_s"] for r in results), 3),
+        "workers": len(sessions),
+        "browsers_started": sum(s.starts for s in sessions),
+        "driver": driver,
+        "fast": fast,
+    }
+    return {"summary": summary, "results": results}
+
+
+def load_tests(paths):
+    """
+    Tests from .py files, directories of them, or JSON files holding
+    [{"test_id", "script"}, ...] or {test_id: script} (e.g. a batch result).
+    """
+    tests = []
+    for path in paths:
+        if os.path.isdir(path):
+            tests.extend(load_tests(sorted(glob.glob(os.path.join(path, "*.py")))))
+        elif path.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                tests.extend(parse_tests(json.load(f)))
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                tests.append({"test_id": Path(path).stem, "script": f.read()})
+    return tests
+
+
+def parse_tests(data):
+    if isinstance(data, dict):
+        data = data.get("scripts", data)
+    if isinstance(data, dict):
+        return [{"test_id": str(k), "script": v} for k, v in data.items()]
+    if not isinstance(data, list):
+        raise ValueError("expected a list of {test_id, script} or a {test_id: script} object")
+    tests = []
+    for i, item in enumerate(data):
+        if isinstance(item, str):
+            item = {"script": item}
+        if not isinstance(item, dict) or not isinstance(item.get("script"), str):
+            raise ValueError(f"test {i} has no script")
+        tests.append({"test_id": str(item.get("test_id") or f"TC-{i}"), "script": item["script"]})
+    return tests
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run generated Selenium scripts on pooled headless browsers.")
+    parser.add_argument("paths", nargs="*", help=".py files, directories or JSON suites")
+    parser.add_argument("--stdin", action="store_true", help="read a JSON suite from stdin")
+    parser.add_argument("--workers", type=int, default=RUNNER_WORKERS)
+    parser.add_argument("--driver", choices=DRIVERS, default=RUNNER_DRIVER)
+    parser.add_argument("--fast", action="store_true", help="rewrite fixed sleeps into condition waits first")
+    parser.add_argument("--page", help="serve this HTML file whenever a script opens a local file")
+    parser.add_argument("--timeout", type=float, default=RUNNER_TEST_TIMEOUT_SECONDS, help="seconds per test")
+    parser.add_argument("--ndjson", action="store_true", help="print one JSON line per test, then a summary line")
+    parser.add_argument("--report", help="write the JSON report here")
+    args = parser.parse_args(argv)
+
+    tests = load_tests(args.paths)
+    if args.stdin:
+        tests.extend(parse_tests(json.load(sys.stdin)))
+    if not tests:
+        parser.error("no scripts given")
+
+    stdout = sys.stdout
+
+    def emit(result):
+        if args.ndjson:
+            stdout.write(json.dumps(result) + "\n")
+        else:
+            line = f"{result['status'].upper():8} {result['test_id']} ({result['duration_s']:.2f}s)"
+            stdout.write(line + (f"  {result['message']}" if result["message"] else "") + "\n")
+        stdout.flush()
+
+    report = run_suite(tests, args.workers, args.driver, args.fast, args.page, args.timeout, on_result=emit)
+    summary = report["summary"]
+    if args.ndjson:
+        stdout.write(json.dumps({"done": True, **summary}) + "\n")
+    else:
+        stdout.write(
+            f"\n{summary['passed']}/{summary['total']} passed, {summary['failed']} failed, "
+            f"{summary['error']} errors, {summary['timeout']} timeouts in {summary['duration_s']:.2f}s "
+            f"({summary['workers']} workers, {summary['browsers_started']} browsers started)\n"
+        )
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return 0 if summary["passed"] == summary["total"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
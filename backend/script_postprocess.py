@@ -0,0 +1,275 @@
+import ast
+import re
+
+# ---------------------------------------------------------
+# Fast-mode post-processing of generated Selenium scripts.
+#
+# The script is parsed (a syntax error is reported, not hidden) and every
+# fixed time.sleep() left in it is rewritten:
+#   - a sleep right before driver.quit() (or at the very end) is dropped;
+#   - any other sleep becomes a condition wait that returns as soon as the
+#     total price (or the coupon message) changes, bounded by the original
+#     sleep, so the script is never slower than before.
+# Edits are spliced into the source text, keeping the model's comments.
+# ---------------------------------------------------------
+
+# Statements that change the page (the wait snapshots the page before them)
+ACTION_METHODS = {
+    "click", "send_keys", "submit", "clear", "get",
+    "select_by_visible_text", "select_by_value", "select_by_index",
+}
+CLOSE_METHODS = {"quit", "close"}
+# The checkout page recalculates synchronously: a condition wait typically
+# returns after one or two polls
+TYPICAL_CONDITION_WAIT_SECONDS = 0.1
+# Timeout of a rewritten sleep whose duration is not a literal
+DEFAULT_WAIT_SECONDS = 10.0
+
+HELPER_NAMES = {"_page_state", "_wait_for_update"}
+FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*\n|\n?\s*```\s*$")
+
+WAIT_HELPER = '''
+
+def _page_state(driver):
+    from selenium.webdriver.common.by import By
+    return tuple(e.text for name in ("total-price", "coupon-message") for e in driver.find_elements(By.ID, name))
+
+
+def _wait_for_update(driver, before, timeout):
+    """
+    Replaces a fixed sleep: returns as soon as the total price (or the
+    coupon message) differs from `before`, after at most `timeout` seconds.
+    """
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.05).until(
+            lambda d: _page_state(d) and _page_state(d) != before
+        )
+    except TimeoutException:
+        pass
+'''
+
+
+def strip_fences(script: str):
+    """
+    Removes a surrounding Markdown code fence, if the model added one.
+    """
+    return FENCE_RE.sub("", script.strip()).strip() + "\n"
+
+
+def _sleep_aliases(tree):
+    """
+    Names that call time.sleep: "time.sleep" (plus module aliases) and bare
+    names bound by `from time import sleep [as ...]`.
+    """
+    modules, names = {"time"}, set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(a.asname for a in node.names if a.name == "time" and a.asname)
+        elif isinstance(node, ast.ImportFrom) and node.module == "time":
+            names.update(a.asname or a.name for a in node.names if a.name == "sleep")
+    return modules, names
+
+
+def _sleep_seconds(stmt, modules, names):
+    """
+    (True, seconds or None) if stmt is a bare sleep call, else (False, None).
+    """
+    if not isinstance(stmt, ast.Expr) or not isinstance(stmt.value, ast.Call):
+        return False, None
+    func = stmt.value.func
+    is_sleep = (
+        isinstance(func, ast.Attribute) and func.attr == "sleep"
+        and isinstance(func.value, ast.Name) and func.value.id in modules
+    ) or (isinstance(func, ast.Name) and func.id in names)
+    if not is_sleep:
+        return False, None
+    args = stmt.value.args
+    if args and isinstance(args[0], ast.Constant) and isinstance(args[0].value, (int, float)):
+        return True, float(args[0].value)
+    return True, None
+
+
+def _method_call(stmt):
+    if isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call) and isinstance(stmt.value.func, ast.Attribute):
+        return stmt.value.func.attr
+    return None
+
+
+def _driver_name(tree):
+    # The variable bound to webdriver.<Browser>(...)
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Call):
+            func = node.value.func
+            if isinstance(func, ast.Attribute) and isinstance(func.value, ast.Name) and func.value.id == "webdriver":
+                if isinstance(node.targets[0], ast.Name):
+                    return node.targets[0].id
+    return "driver"
+
+
+def _bodies(tree):
+    """
+    Yields (owner, body) for every statement list: the module's, and
+    those of compound statements (if/for/with/try/def...).
+    """
+    for node in ast.walk(tree):
+        for field in ("body", "orelse", "finalbody"):
+            body = getattr(node, field, None)
+            if isinstance(body, list) and body and isinstance(body[0], ast.stmt):
+                yield node, body
+        for handler in getattr(node, "handlers", None) or []:
+            yield handler, handler.body
+
+
+def _only_closing(stmts):
+    return all(_method_call(s) in CLOSE_METHODS for s in stmts)
+
+
+def _is_final(owner, rest, parents):
+    """
+    True if nothing but driver.quit()/close() runs after the statement,
+    looking through the enclosing blocks up to the module.
+    """
+    while True:
+        if not _only_closing(rest):
+            return False
+        if isinstance(owner, ast.Module):
+            return True
+        if isinstance(owner, (ast.FunctionDef, ast.AsyncFunctionDef, ast.For, ast.While, ast.ExceptHandler)):
+            # The caller or the next iteration may still need the page settled
+            return False
+        owner, rest = parents[owner]
+
+
+def _owns_lines(lines, stmt):
+    # Only statements alone on their lines are edited (no `a; b`); a trailing comment is fine
+    first = lines[stmt.lineno - 1]
+    rest = lines[stmt.end_lineno - 1][stmt.end_col_offset:].strip()
+    return first[:stmt.col_offset].strip() == "" and (rest in ("", ";") or rest.startswith("#"))
+
+
+def _trailing_comment(lines, stmt):
+    rest = lines[stmt.end_lineno - 1][stmt.end_col_offset:].strip()
+    return f"  {rest}" if rest.startswith("#") else ""
+
+
+def _expected_wait(tree, modules, names):
+    """
+    (condition waits, expected seconds spent waiting) for a script: each
+    condition wait at its typical duration plus any sleep that is left.
+    """
+    waits, seconds = 0, 0.0
+    # The injected helpers are not waits themselves
+    statements = [s for s in tree.body if not (isinstance(s, ast.FunctionDef) and s.name in HELPER_NAMES)]
+    for node in (n for s in statements for n in ast.walk(s)):
+        if isinstance(node, ast.Expr):
+            is_sleep, duration = _sleep_seconds(node, modules, names)
+            if is_sleep:
+                seconds += duration if duration is not None else DEFAULT_WAIT_SECONDS
+        if isinstance(node, ast.Call):
+            func = node.func
+            if (isinstance(func, ast.Attribute) and func.attr in ("until", "until_not")) or \
+                    (isinstance(func, ast.Name) and func.id == "_wait_for_update"):
+                waits += 1
+                seconds += TYPICAL_CONDITION_WAIT_SECONDS
+    return waits, seconds
+
+
+def optimize_script(script: str, baseline_seconds: float = None):
+    """
+    Validates a generated script and rewrites its fixed sleeps.
+    Returns (script, report); an unparsable script is returned unchanged
+    with report["valid"] = False. The saving is estimated against
+    baseline_seconds of fixed sleeps (default: the sleeps in this script).
+    """
+    source = strip_fences(script)
+    report = {
+        "valid": True,
+        "error": None,
+        "sleeps_found": 0,
+        "sleeps_removed": 0,
+        "sleeps_rewritten": 0,
+        "sleep_seconds_before": 0.0,
+        "estimated_seconds_saved": 0.0,
+    }
+    try:
+        tree = ast.parse(source)
+    except SyntaxError as e:
+        report["valid"] = False
+        report["error"] = f"SyntaxError on line {e.lineno}: {e.msg}"
+        return script, report
+
+    lines = source.splitlines()
+    modules, names = _sleep_aliases(tree)
+    driver = _driver_name(tree)
+    # (first line, last line, replacement lines); 1-based, inclusive, last < first = insertion
+    edits = []
+    needs_helper = False
+
+    bodies = list(_bodies(tree))
+    # statement -> (its owner, the statements after it)
+    parents = {stmt: (owner, body[i + 1:]) for owner, body in bodies for i, stmt in enumerate(body)}
+
+    for owner, body in bodies:
+        for i, stmt in enumerate(body):
+            is_sleep, seconds = _sleep_seconds(stmt, modules, names)
+            if not is_sleep:
+                continue
+            report["sleeps_found"] += 1
+            report["sleep_seconds_before"] += seconds or 0.0
+            if not _owns_lines(lines, stmt):
+                continue
+            indent = lines[stmt.lineno - 1][:stmt.col_offset]
+
+            if _is_final(owner, body[i + 1:], parents):
+                # Pause before closing the browser: nothing to wait for
+                replacement = [] if len(body) > 1 else [indent + "pass"]
+                edits.append((stmt.lineno, stmt.end_lineno, replacement))
+                report["sleeps_removed"] += 1
+                continue
+
+            # Snapshot the page before the run of actions that precedes the sleep
+            start = i
+            while start > 0 and _method_call(body[start - 1]) in ACTION_METHODS and _owns_lines(lines, body[start - 1]):
+                start -= 1
+            before = "None"
+            if start < i:
+                action = body[start]
+                action_indent = lines[action.lineno - 1][:action.col_offset]
+                edits.append((action.lineno, action.lineno - 1, [f"{action_indent}_page_before = _page_state({driver})"]))
+                before = "_page_before"
+            timeout = seconds if seconds is not None else DEFAULT_WAIT_SECONDS
+            wait = f"{indent}_wait_for_update({driver}, {before}, {timeout:g}){_trailing_comment(lines, stmt)}"
+            edits.append((stmt.lineno, stmt.end_lineno, [wait]))
+            needs_helper = True
+            report["sleeps_rewritten"] += 1
+
+    if needs_helper:
+        # After the last top-level import, or at the top
+        imports = [n for n in tree.body if isinstance(n, (ast.Import, ast.ImportFrom))]
+        after = imports[-1].end_lineno if imports else 0
+        edits.append((after + 1, after, WAIT_HELPER.rstrip("\n").split("\n") + [""]))
+
+    for first, last, replacement in sorted(edits, key=lambda e: (e[0], e[1]), reverse=True):
+        lines[first - 1:max(last, first - 1)] = replacement
+
+    result = "\n".join(lines) + "\n"
+    try:
+        result_tree = ast.parse(result)
+    except SyntaxError as e:
+        # Should not happen; never hand back a broken rewrite
+        report["error"] = f"Rewrite skipped (SyntaxError on line {e.lineno}: {e.msg})"
+        result, result_tree = source, tree
+
+    waits, expected = _expected_wait(result_tree, modules, names)
+    baseline = report["sleep_seconds_before"] if baseline_seconds is None else max(baseline_seconds, report["sleep_seconds_before"])
+    report.update({
+        "condition_waits": waits,
+        "expected_wait_seconds": round(expected, 2),
+        "baseline_sleep_seconds": round(baseline, 2),
+        "estimated_seconds_saved": round(max(0.0, baseline - expected), 2),
+    })
+    report["sleep_seconds_before"] = round(report["sleep_seconds_before"], 2)
+    return result, report
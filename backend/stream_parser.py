@@ -0,0 +1,110 @@
+import json
+
+# Keys under which a wrapping object may hold the list of test cases
+WRAPPER_KEYS = {"test_cases", "testcases", "tests", "test_plan", "cases", "items"}
+
+
+class IncrementalJSONParser:
+    """
+    Pulls complete JSON objects out of a token stream as soon as they close.
+
+    Handles the shapes the model produces for a test plan:
+    a top-level array of objects, an object wrapping such an array
+    (e.g. {"test_cases": [...]}) or a single object. Leading prose or
+    Markdown fences are skipped. Only the outermost objects that sit
+    directly inside an array are emitted; nested objects stay inside them.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_key = None
+        self._capture_start = None
+        self._capture_depth = None
+        self.emitted = 0
+        self.errors = []
+        self.truncated = False
+
+    def feed(self, text: str):
+        """
+        Adds text and returns the list of objects completed by it.
+        Objects that close but do not parse are recorded in self.errors.
+        """
+        self.buffer += text
+        completed = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            ch = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._stack == ["{"]:
+                        # Remember keys of the wrapper object
+                        self._last_key = buffer[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                # Strings only count once we are inside JSON
+                if self._stack:
+                    self._in_string = True
+                    self._string_start = i
+            elif ch in "[{":
+                if ch == "{" and self._capture_start is None and self._is_list_of_cases():
+                    self._capture_start = i
+                    self._capture_depth = len(self._stack)
+                self._stack.append(ch)
+            elif ch in "]}":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._capture_start is not None and len(self._stack) == self._capture_depth:
+                    raw = buffer[self._capture_start:i + 1]
+                    self._capture_start = None
+                    self._capture_depth = None
+                    try:
+                        item = json.loads(raw)
+                    except ValueError as e:
+                        self.errors.append({"raw": raw, "error": str(e)})
+                        continue
+                    self.emitted += 1
+                    completed.append(item)
+        self._pos = len(buffer)
+        return completed
+
+    def _is_list_of_cases(self):
+        if self._stack == ["["]:
+            return True
+        return self._stack == ["{", "["] and (self._last_key or "").lower() in WRAPPER_KEYS
+
+    def finish(self):
+        """
+        Call at end of stream. If no array elements were found, falls back to
+        parsing the whole buffer (single object, or fenced JSON). An object
+        still open when the stream ended is recorded in self.errors.
+        """
+        if self._capture_start is not None:
+            self.truncated = True
+            self.errors.append({"raw": self.buffer[self._capture_start:], "error": "truncated"})
+            self._capture_start = None
+            self._capture_depth = None
+        if self.emitted:
+            return []
+        clean = self.buffer.replace("```json", "").replace("```", "").strip()
+        try:
+            parsed = json.loads(clean)
+        except ValueError:
+            return []
+        if isinstance(parsed, dict):
+            if isinstance(parsed.get("test_cases"), list):
+                return parsed["test_cases"]
+            return [parsed]
+        if isinstance(parsed, list):
+            return parsed
+        return []
@@ -0,0 +1,49 @@
+import threading
+
+from .config import LLM_TOKENIZER
+from .ratelimit import estimate_tokens
+
+# ---------------------------------------------------------
+# Prompt token counting with the LLM's own tokenizer.
+# Falls back to the 4-chars-per-token estimate if the tokenizer
+# cannot be loaded (e.g. no network on first start), and while it is
+# still loading: counting never waits for the download.
+# ---------------------------------------------------------
+
+_tokenizer = None
+_loaded = False
+_loading = False
+_lock = threading.Lock()
+
+
+def get_tokenizer():
+    global _tokenizer, _loaded
+    if not _loaded:
+        with _lock:
+            if not _loaded:
+                try:
+                    from tokenizers import Tokenizer
+                    _tokenizer = Tokenizer.from_pretrained(LLM_TOKENIZER)
+                except Exception as e:
+                    print(f"Tokenizer '{LLM_TOKENIZER}' unavailable, estimating tokens instead: {e}")
+                _loaded = True
+    return _tokenizer
+
+
+def _load_in_background():
+    # Normally warm_up() has loaded it already; otherwise the first count starts it
+    global _loading
+    with _lock:
+        if _loaded or _loading:
+            return
+        _loading = True
+    threading.Thread(target=get_tokenizer, name="tokenizer-load", daemon=True).start()
+
+
+def count_tokens(text: str):
+    if not _loaded:
+        _load_in_background()
+    tokenizer = _tokenizer
+    if tokenizer is None:
+        return estimate_tokens(text)
+    return len(tokenizer.encode(text, add_special_tokens=False).ids)
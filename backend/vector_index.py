@@ -0,0 +1,217 @@
+import os
+import json
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.vectorstores import VectorStore
+from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+# ---------------------------------------------------------
+# In-memory NumPy vector index.
+#
+# For corpora of a few thousand chunks a brute-force scan over a
+# contiguous, L2-normalised matrix is faster than any ANN store:
+# top-k is one matmul plus argpartition. The matrix lives on disk
+# as .npy and is memory-mapped, so opening an index is instant.
+# ---------------------------------------------------------
+
+EMBEDDINGS_FILE = "embeddings.npy"
+CHUNKS_FILE = "chunks.json"
+
+# Rows converted to float32 at a time when the index is stored as float16
+FLOAT16_BLOCK_ROWS = 8192
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    LangChain-compatible vector store backed by a memory-mapped matrix of
+    normalised embeddings. Scores are cosine similarities.
+    Writes (add/delete) happen in memory; persist() saves them.
+    """
+
+    def __init__(self, persist_directory: str, embedding_function, dtype: str = "float32"):
+        self.persist_directory = persist_directory
+        self.embedding_function = embedding_function
+        self.dtype = np.dtype(dtype)
+        self._ids = []
+        self._texts = []
+        self._metadatas = []
+        self._matrix = np.zeros((0, 0), dtype=self.dtype)
+        self._load()
+
+    @property
+    def embeddings(self):
+        return self.embedding_function
+
+    # ---------------- Persistence ----------------
+    def _load(self):
+        matrix_path = os.path.join(self.persist_directory, EMBEDDINGS_FILE)
+        chunks_path = os.path.join(self.persist_directory, CHUNKS_FILE)
+        if not (os.path.exists(matrix_path) and os.path.exists(chunks_path)):
+            return
+        with open(chunks_path, "r", encoding="utf-8") as f:
+            chunks = json.load(f)
+        self._ids = chunks["ids"]
+        self._texts = chunks["texts"]
+        self._metadatas = chunks["metadatas"]
+        self._matrix = np.load(matrix_path, mmap_mode="r")
+
+    def persist(self):
+        """
+        Writes the matrix and chunk table (atomically) and re-maps the matrix from disk.
+        """
+        os.makedirs(self.persist_directory, exist_ok=True)
+        matrix_path = os.path.join(self.persist_directory, EMBEDDINGS_FILE)
+        chunks_path = os.path.join(self.persist_directory, CHUNKS_FILE)
+
+        matrix = np.ascontiguousarray(self._matrix, dtype=self.dtype)
+        tmp_matrix = matrix_path + ".tmp.npy"
+        np.save(tmp_matrix, matrix)
+        tmp_chunks = chunks_path + ".tmp"
+        with open(tmp_chunks, "w", encoding="utf-8") as f:
+            json.dump({"ids": self._ids, "texts": self._texts, "metadatas": self._metadatas}, f)
+
+        # Drop our mapping of the old file before replacing it
+        self._matrix = matrix
+        os.replace(tmp_matrix, matrix_path)
+        os.replace(tmp_chunks, chunks_path)
+        self._matrix = np.load(matrix_path, mmap_mode="r")
+
+    # ---------------- Writes ----------------
+    def add_texts(self, texts, metadatas=None, ids=None, **kwargs):
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [f"{len(self._ids) + i}" for i in range(len(texts))]
+
+        vectors = _normalize(self.embedding_function.embed_documents(texts)).astype(self.dtype)
+        if self._matrix.size == 0:
+            self._matrix = vectors
+        else:
+            self._matrix = np.vstack([self._matrix, vectors])
+        self._ids.extend(ids)
+        self._texts.extend(texts)
+        self._metadatas.extend(metadatas)
+        return list(ids)
+
+    def delete(self, ids=None, **kwargs):
+        if not ids:
+            return None
+        drop = set(ids)
+        keep = [i for i, chunk_id in enumerate(self._ids) if chunk_id not in drop]
+        self._matrix = np.asarray(self._matrix)[keep] if keep else np.zeros((0, 0), dtype=self.dtype)
+        self._ids = [self._ids[i] for i in keep]
+        self._texts = [self._texts[i] for i in keep]
+        self._metadatas = [self._metadatas[i] for i in keep]
+        return True
+
+    def get_by_ids(self, ids):
+        positions = {chunk_id: i for i, chunk_id in enumerate(self._ids)}
+        return [self._document(positions[i]) for i in ids if i in positions]
+
+    def count(self):
+        return len(self._ids)
+
+    # ---------------- Search ----------------
+    def _document(self, row: int):
+        return Document(id=self._ids[row], page_content=self._texts[row], metadata=self._metadatas[row])
+
+    def _scores(self, query_matrix):
+        """
+        Cosine similarity of every query (rows) against every chunk (columns).
+        """
+        if self.dtype == np.float32:
+            return query_matrix @ self._matrix.T
+        # float16 storage: upcast in blocks so BLAS does the work
+        blocks = [
+            query_matrix @ np.asarray(self._matrix[start:start + FLOAT16_BLOCK_ROWS], dtype=np.float32).T
+            for start in range(0, len(self._ids), FLOAT16_BLOCK_ROWS)
+        ]
+        return np.hstack(blocks)
+
+    def _top_rows(self, query_vectors, k: int):
+        """
+        Batched top-k: one matmul for all queries, then argpartition per row.
+        Returns one [(row, score), ...] list per query, best first.
+        """
+        queries = _normalize(np.atleast_2d(query_vectors))
+        scores = self._scores(queries)
+        k = min(k, scores.shape[1])
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in enumerate(top):
+            ordered = candidates[np.argsort(-scores[row, candidates])]
+            results.append([(int(i), float(scores[row, i])) for i in ordered])
+        return results
+
+    def search_by_vectors(self, query_vectors, k: int = 4):
+        """
+        Returns one [(Document, score), ...] list per query.
+        """
+        if not self._ids:
+            return [[] for _ in range(len(query_vectors))]
+        return [[(self._document(i), score) for i, score in hits] for hits in self._top_rows(query_vectors, k)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs):
+        return self.search_by_vectors([self.embedding_function.embed_query(query)], k)[0]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.search_by_vectors([embedding], k)[0]]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs):
+        return [doc for doc, _ in self.similarity_search_with_score(query, k)]
+
+    def max_marginal_relevance_search_by_vector(self, embedding, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs):
+        """
+        Top fetch_k by similarity, then k of them picked by MMR using the stored vectors.
+        """
+        if not self._ids:
+            return []
+        rows = [i for i, _ in self._top_rows([embedding], fetch_k)[0]]
+        vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+        selected = maximal_marginal_relevance(
+            _normalize(embedding), vectors, k=min(k, len(rows)), lambda_mult=lambda_mult
+        )
+        return [self._document(rows[i]) for i in selected]
+
+    def max_marginal_relevance_search_by_vectors(self, embeddings, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5):
+        """
+        Batched max_marginal_relevance_search_by_vector: one matmul finds the
+        fetch_k candidates of every query, then MMR runs per query.
+        Returns one list of Documents per query.
+        """
+        if not self._ids:
+            return [[] for _ in embeddings]
+        results = []
+        for embedding, hits in zip(embeddings, self._top_rows(embeddings, fetch_k)):
+            rows = [i for i, _ in hits]
+            vectors = np.asarray(self._matrix[rows], dtype=np.float32)
+            selected = maximal_marginal_relevance(
+                _normalize(embedding), vectors, k=min(k, len(rows)), lambda_mult=lambda_mult
+            )
+            results.append([self._document(rows[i]) for i in selected])
+        return results
+
+    def max_marginal_relevance_search(self, query: str, k: int = 4, fetch_k: int = 20, lambda_mult: float = 0.5, **kwargs):
+        embedding = self.embedding_function.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(embedding, k, fetch_k, lambda_mult)
+
+    def _select_relevance_score_fn(self):
+        # Cosine similarity of normalised vectors, mapped from [-1, 1] to [0, 1]
+        return lambda score: (score + 1.0) / 2.0
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, persist_directory: str = "./numpy_index", **kwargs):
+        ids = kwargs.pop("ids", None)
+        store = cls(persist_directory, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        store.persist()
+        return store
@@ -0,0 +1,99 @@
+"""
+Embedding throughput per engine, plus a retrieval-equivalence check
+against the torch (sentence-transformers) reference.
+
+    python -m benchmarks.embedding_bench --chunks 2000
+    python -m benchmarks.embedding_bench --engines torch onnx-int8 --batch-sizes 32 64 128
+
+Each candidate engine must keep every chunk embedding within --min-cosine
+of the reference and at least --min-overlap mean top-k agreement;
+the exit code is 1 if any engine fails the check.
+"""
+import sys
+import json
+import time
+import argparse
+
+from backend.config import EMBEDDING_MODEL_NAME
+from backend.embeddings import create_embedding_engine, check_retrieval_equivalence
+
+from .retrieval_bench import make_corpus
+
+QUERIES = [
+    "discount code SAVE15 applies 15 percent",
+    "express shipping costs extra",
+    "payment fails with an invalid card",
+    "cart quantity cannot be negative",
+    "form validation shows an error in red",
+]
+
+
+def time_engine(engine, texts, batch_size: int):
+    engine.batch_size = batch_size
+    # First call pays for lazy init (thread pools, pool start-up)
+    engine.embed_documents(texts[:batch_size])
+    start = time.perf_counter()
+    engine.embed_documents(texts)
+    elapsed = time.perf_counter() - start
+    return {
+        "batch_size": batch_size,
+        "seconds": round(elapsed, 3),
+        "chunks_per_second": round(len(texts) / elapsed, 1),
+    }
+
+
+def run(n_chunks: int, engines, batch_sizes, k: int, min_cosine: float, min_overlap: float):
+    texts = [doc.page_content for doc in make_corpus(n_chunks)]
+    results = {"model": EMBEDDING_MODEL_NAME, "chunks": n_chunks, "engines": {}}
+
+    reference = None
+    for name in engines:
+        load_start = time.perf_counter()
+        engine = create_embedding_engine(name)
+        load_s = time.perf_counter() - load_start
+        entry = {
+            "load_s": round(load_s, 3),
+            "throughput": [time_engine(engine, texts, size) for size in batch_sizes],
+        }
+        if reference is None:
+            reference = engine
+            entry["reference"] = True
+        else:
+            entry["equivalence"] = check_retrieval_equivalence(
+                reference, engine, texts, QUERIES, k=k, min_cosine=min_cosine, min_overlap=min_overlap
+            )
+        results["engines"][name] = entry
+        print(f"{name}: {entry['throughput']}", file=sys.stderr)
+
+    for engine_result in results["engines"].values():
+        if "equivalence" in engine_result and not engine_result["equivalence"]["equivalent"]:
+            results["passed"] = False
+            break
+    else:
+        results["passed"] = True
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--engines", nargs="+", default=["torch", "onnx", "onnx-int8"],
+                        help="the first engine is the reference for the equivalence check")
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[32, 64, 128])
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--min-cosine", type=float, default=0.98)
+    parser.add_argument("--min-overlap", type=float, default=0.9)
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args.chunks, args.engines, args.batch_sizes, args.k, args.min_cosine, args.min_overlap)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0 if results["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
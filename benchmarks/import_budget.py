@@ -0,0 +1,119 @@
+"""
+Cold-start budget: how long a fresh process takes to import the app and
+answer its liveness check, compared with importing everything warm-up
+loads (LangChain, Chroma, the embedding and LLM clients).
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --runs 5 --max-fraction 0.5 --max-seconds 1.0
+
+Every measurement runs in a new interpreter (nothing cached in
+sys.modules). The exit code is 1 if the liveness time exceeds
+--max-seconds or --max-fraction of the full import, or if importing
+backend.main loads any of the heavy packages below: they belong in
+ResourceRegistry.warm_up(), not at module level.
+"""
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# Must not be imported by `import backend.main`
+HEAVY_PACKAGES = [
+    "langchain", "langchain_core", "langchain_chroma", "langchain_groq", "langchain_text_splitters",
+    "langchain_huggingface", "chromadb", "groq", "torch", "sentence_transformers", "transformers",
+    "tokenizers", "onnxruntime", "numpy", "selenium",
+]
+
+# What warm-up imports; loading these before serving is the old cold start
+WARM_UP_MODULES = [
+    "backend.llm_gateway", "backend.embeddings", "backend.vector_index", "langchain_chroma",
+    "langchain.chains.combine_documents", "langchain_text_splitters", "langchain_groq",
+    "sentence_transformers",
+]
+
+LIVENESS_CODE = """
+import sys, json, time
+start = time.perf_counter()
+from backend.main import app
+imported = time.perf_counter() - start
+# The test client itself is not part of the app's start-up cost
+from fastapi.testclient import TestClient
+client = TestClient(app)
+start = time.perf_counter()
+response = client.get("/")
+seconds = imported + time.perf_counter() - start
+heavy = sorted({m.split(".")[0] for m in sys.modules} & set(HEAVY))
+print(json.dumps({"import_s": imported, "liveness_s": seconds, "status": response.status_code, "heavy": heavy}))
+"""
+
+FULL_CODE = """
+import json, time, importlib
+start = time.perf_counter()
+import backend.main
+missing = []
+for name in MODULES:
+    try:
+        importlib.import_module(name)
+    except ImportError:
+        missing.append(name)
+print(json.dumps({"full_s": time.perf_counter() - start, "missing": missing}))
+"""
+
+
+def measure(code: str):
+    output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def run(runs: int, max_fraction: float, max_seconds: float):
+    liveness = [measure(f"HEAVY = {HEAVY_PACKAGES!r}\n" + LIVENESS_CODE) for _ in range(runs)]
+    full = [measure(f"MODULES = {WARM_UP_MODULES!r}\n" + FULL_CODE) for _ in range(runs)]
+
+    liveness_s = statistics.median(r["liveness_s"] for r in liveness)
+    full_s = statistics.median(r["full_s"] for r in full)
+    fraction = liveness_s / full_s if full_s else 0.0
+    heavy = sorted({name for r in liveness for name in r["heavy"]})
+    failures = []
+    if heavy:
+        failures.append(f"importing backend.main loads {', '.join(heavy)}")
+    if liveness_s > max_seconds:
+        failures.append(f"liveness took {liveness_s:.3f}s (budget {max_seconds:g}s)")
+    if fraction > max_fraction:
+        failures.append(f"liveness is {fraction:.0%} of the full import (budget {max_fraction:.0%})")
+    if any(r["status"] != 200 for r in liveness):
+        failures.append("GET / did not answer 200")
+
+    return {
+        "runs": runs,
+        "import_seconds": round(statistics.median(r["import_s"] for r in liveness), 3),
+        "liveness_seconds": round(liveness_s, 3),
+        "full_import_seconds": round(full_s, 3),
+        "fraction_of_full": round(fraction, 3),
+        # Not installed here, so the full import is an underestimate
+        "missing_modules": full[0]["missing"],
+        "heavy_packages_loaded": heavy,
+        "failures": failures,
+        "passed": not failures,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median is used)")
+    parser.add_argument("--max-fraction", type=float, default=0.5)
+    parser.add_argument("--max-seconds", type=float, default=1.0)
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args.runs, args.max_fraction, args.max_seconds)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0 if results["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
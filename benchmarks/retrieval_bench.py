@@ -0,0 +1,150 @@
+"""
+Retrieval latency: Chroma vs the in-memory NumPy index.
+
+    python -m benchmarks.retrieval_bench --chunks 2000 --queries 200
+    python -m benchmarks.retrieval_bench --fake-embeddings   # offline
+
+Query vectors are embedded up front so the numbers isolate retrieval
+(store open + top-k search); the numpy backend is also measured in
+batched multi-query mode.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+
+from langchain_core.documents import Document
+
+from backend.vector_index import NumpyVectorStore
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(samples_ms):
+    return {
+        "n": len(samples_ms),
+        "mean_ms": round(statistics.mean(samples_ms), 4),
+        "p50_ms": round(percentile(samples_ms, 50), 4),
+        "p95_ms": round(percentile(samples_ms, 95), 4),
+        "p99_ms": round(percentile(samples_ms, 99), 4),
+    }
+
+
+def make_corpus(n_chunks: int):
+    topics = ["discount code", "shipping", "payment", "cart quantity", "validation", "coupon", "express", "checkout"]
+    return [
+        Document(
+            id=f"chunk-{i}",
+            page_content=f"Rule {i}: {topics[i % len(topics)]} behaviour number {i}. " * 8,
+            metadata={"source": f"spec_{i // 20}.md", "chunk_id": f"chunk-{i}"},
+        )
+        for i in range(n_chunks)
+    ]
+
+
+def get_embeddings(fake: bool):
+    if fake:
+        from .stubs import HashEmbeddings
+        return HashEmbeddings()
+    from backend.embeddings import create_embedding_engine
+    return create_embedding_engine()
+
+
+def time_searches(search, query_vectors, k):
+    samples = []
+    for vector in query_vectors:
+        start = time.perf_counter()
+        search(vector, k)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def run(n_chunks: int, n_queries: int, k: int, fake: bool, dtype: str):
+    embeddings = get_embeddings(fake)
+    docs = make_corpus(n_chunks)
+    queries = [f"test the {t} rules" for t in ("discount", "shipping", "payment", "cart", "coupon")] * (n_queries // 5 + 1)
+    query_vectors = embeddings.embed_documents(queries[:n_queries])
+    workdir = tempfile.mkdtemp(prefix="retrieval_bench_")
+    results = {"chunks": n_chunks, "queries": n_queries, "k": k, "fake_embeddings": fake}
+
+    try:
+        # ---------------- NumPy ----------------
+        numpy_dir = os.path.join(workdir, "numpy")
+        build_start = time.perf_counter()
+        store = NumpyVectorStore(numpy_dir, embeddings, dtype=dtype)
+        store.add_documents(docs)
+        store.persist()
+        build_s = time.perf_counter() - build_start
+
+        open_start = time.perf_counter()
+        store = NumpyVectorStore(numpy_dir, embeddings, dtype=dtype)
+        open_ms = (time.perf_counter() - open_start) * 1000
+
+        single = time_searches(store.similarity_search_by_vector, query_vectors, k)
+        batch_start = time.perf_counter()
+        store.search_by_vectors(query_vectors, k)
+        batch_ms = (time.perf_counter() - batch_start) * 1000
+        results["numpy"] = {
+            "dtype": dtype,
+            "build_s": round(build_s, 3),
+            "open_ms": round(open_ms, 3),
+            "search": summarize(single),
+            "batched_total_ms": round(batch_ms, 3),
+            "batched_per_query_ms": round(batch_ms / len(query_vectors), 4),
+        }
+
+        # ---------------- Chroma ----------------
+        try:
+            from langchain_chroma import Chroma
+        except ImportError:
+            results["chroma"] = {"skipped": "langchain_chroma not installed"}
+        else:
+            chroma_dir = os.path.join(workdir, "chroma")
+            build_start = time.perf_counter()
+            Chroma.from_documents(docs, embeddings, persist_directory=chroma_dir)
+            build_s = time.perf_counter() - build_start
+
+            open_start = time.perf_counter()
+            chroma = Chroma(persist_directory=chroma_dir, embedding_function=embeddings)
+            open_ms = (time.perf_counter() - open_start) * 1000
+
+            single = time_searches(chroma.similarity_search_by_vector, query_vectors, k)
+            results["chroma"] = {
+                "build_s": round(build_s, 3),
+                "open_ms": round(open_ms, 3),
+                "search": summarize(single),
+            }
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--dtype", default="float32", choices=["float32", "float16"])
+    parser.add_argument("--fake-embeddings", action="store_true", help="use deterministic hash embeddings (offline)")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args.chunks, args.queries, args.k, args.fake_embeddings, args.dtype)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
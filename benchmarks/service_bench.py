@@ -0,0 +1,365 @@
+"""
+Offline end-to-end benchmark of the QA agent service.
+
+    python -m benchmarks.service_bench --fake-embeddings --output results.json
+    python -m benchmarks.service_bench --corpus-sizes 10 100 500 --concurrency 1 8 32
+    python -m benchmarks.service_bench --fake-embeddings --llm-server --llm-server-rpm 120
+
+Runs without network access or a Groq key: the LLM is a deterministic
+StubChatModel with configurable latency and output size, and
+--fake-embeddings swaps the embedding model for hash vectors.
+With --llm-server the same stub answers over HTTP (stub_llm_server.py)
+behind the real LLM gateway, so its rate limiting and retries are timed too.
+All state (index, uploads, cache) lives in a temporary directory.
+
+Measures:
+  1. ingestion throughput of build_knowledge_base per corpus size
+     (full build and no-op rebuild)
+  2. retrieval latency against the built index
+  3. p50/p95/p99 latency and throughput of /upload-documents/,
+     /generate-tests/ and /generate-script/ under concurrent load,
+     through a real uvicorn server on localhost
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+
+from .retrieval_bench import summarize
+from .stubs import HashEmbeddings, StubChatModel
+
+TOPICS = ["discount code", "shipping", "payment", "cart quantity", "validation", "coupon", "express", "checkout"]
+QUERIES = [
+    "Generate positive and negative tests for the discount code.",
+    "Generate tests for express shipping.",
+    "Generate tests for cart quantity validation.",
+    "Generate tests for the payment form.",
+]
+TEST_CASE = {
+    "test_id": "TC-001",
+    "description": "Apply SAVE15 to a non-empty cart",
+    "expected_result": "Total is reduced by 15%",
+    "grounded_in": "product_specs.md",
+}
+JOB_POLL_SECONDS = 0.05
+
+
+def configure_environment(workdir: str, args):
+    """
+    Points every path at the scratch directory and lifts the production
+    throttles. Must run before anything under backend/ is imported,
+    since backend.config reads the environment at import time.
+    """
+    os.environ["DB_PATH"] = os.path.join(workdir, "vector_db")
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    os.environ["STAGING_DIR"] = os.path.join(workdir, "staging")
+    os.environ["PROJECTS_DIR"] = os.path.join(workdir, "projects")
+    os.environ["PAGES_DIR"] = os.path.join(workdir, "pages")
+    os.environ["CACHE_PATH"] = os.path.join(workdir, "cache", "responses.sqlite3")
+    os.environ["CACHE_ENABLED"] = "true" if args.cache else "false"
+    os.environ["LLM_REQUESTS_PER_MINUTE"] = str(10 ** 6)
+    os.environ["LLM_TOKENS_PER_MINUTE"] = str(10 ** 9)
+    os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
+    if args.vector_backend:
+        os.environ["VECTOR_BACKEND"] = args.vector_backend
+    if args.llm_server:
+        os.environ["LLM_BASE_URL"] = f"http://127.0.0.1:{start_llm_server(args)}"
+        os.environ["GROQ_API_KEYS"] = ",".join(f"bench-key-{i + 1}" for i in range(args.llm_server_keys))
+
+
+def start_llm_server(args):
+    """
+    Serves benchmarks/stub_llm_server.py in a background thread; returns its port.
+    """
+    import uvicorn
+    from .stub_llm_server import build_parser, create_app
+
+    port = free_port()
+    stub_args = build_parser().parse_args([
+        "--latency", str(args.llm_latency), "--tps", str(args.llm_tps), "--tokens", str(args.llm_tokens),
+        "--rpm", str(args.llm_server_rpm),
+    ])
+    server = uvicorn.Server(uvicorn.Config(create_app(stub_args), host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    return port
+
+
+def install_stubs(args):
+    from backend.resources import registry
+    if not args.llm_server:
+        registry._llm = StubChatModel(
+            latency=args.llm_latency, tokens_per_second=args.llm_tps, output_tokens=args.llm_tokens
+        )
+    if args.fake_embeddings:
+        registry._embedding_model = HashEmbeddings()
+    return registry
+
+
+def write_corpus(upload_dir: str, n_docs: int, prefix: str = "spec"):
+    os.makedirs(upload_dir, exist_ok=True)
+    for i in range(n_docs):
+        topic = TOPICS[i % len(TOPICS)]
+        paragraphs = [
+            f"Rule {i}.{p}: the {topic} behaviour must be validated (case {i * 31 + p}). "
+            f"When the user changes the {topic}, the total is recalculated and an error is shown in red."
+            for p in range(16)
+        ]
+        with open(os.path.join(upload_dir, f"{prefix}_{i:05d}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# {topic.title()} specification {i}\n\n" + "\n\n".join(paragraphs))
+
+
+# ---------------- 1. Ingestion ----------------
+def bench_ingestion(registry, corpus_sizes, workdir: str):
+    from backend.config import DB_PATH
+    from backend.rag_utils import build_knowledge_base
+
+    results = []
+    for n_docs in corpus_sizes:
+        # Fresh index and corpus for every size
+        shutil.rmtree(DB_PATH, ignore_errors=True)
+        registry.swap_vector_store(None)
+        upload_dir = os.path.join(workdir, f"corpus_{n_docs}")
+        write_corpus(upload_dir, n_docs)
+
+        start = time.perf_counter()
+        full = build_knowledge_base(upload_dir)
+        full_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        build_knowledge_base(upload_dir)
+        noop_s = time.perf_counter() - start
+
+        results.append({
+            "documents": n_docs,
+            "chunks": full["chunks_processed"],
+            "full_build_s": round(full_s, 3),
+            "chunks_per_second": round(full["chunks_processed"] / full_s, 1),
+            "embedding_seconds": full.get("embedding_seconds"),
+            "noop_rebuild_s": round(noop_s, 3),
+        })
+        print(f"ingestion {n_docs} docs: {results[-1]}", file=sys.stderr)
+    return results
+
+
+# ---------------- 2. Retrieval ----------------
+def bench_retrieval(registry, n_queries: int):
+    retriever = registry.get_retriever()
+    retriever.invoke(QUERIES[0])
+    samples = []
+    for i in range(n_queries):
+        start = time.perf_counter()
+        retriever.invoke(QUERIES[i % len(QUERIES)] + f" #{i}")
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
+
+
+# ---------------- 3. Endpoints under load ----------------
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int):
+    import uvicorn
+    from backend.main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    return server, thread
+
+
+async def wait_until_ready(client, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            response = await client.get("/ready")
+            if response.status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not become ready")
+
+
+async def call_generate_tests(client, i: int, html: str):
+    return await client.post("/generate-tests/", data={"query": QUERIES[i % len(QUERIES)] + f" (run {i})"})
+
+
+async def call_generate_script(client, i: int, html: str):
+    test_case = dict(TEST_CASE, test_id=f"TC-{i:04d}")
+    return await client.post("/generate-script/", data={"test_case_json": json.dumps(test_case), "html_content": html})
+
+
+async def call_upload(client, i: int, html: str):
+    """
+    Uploads one new document (added on top of the corpus) and waits
+    for its ingestion job to finish.
+    """
+    content = f"# Upload {i}\n\nThe coupon rule {i} applies to carts over {i % 90 + 10} dollars."
+    files = {"files": (f"upload_{i:05d}_{time.time_ns()}.md", content.encode("utf-8"), "text/markdown")}
+    response = await client.post("/upload-documents/", files=files, data={"prune": "false"})
+    if response.status_code != 202:
+        return response
+    status_url = response.json()["status_url"]
+    while True:
+        status = await client.get(status_url)
+        if status.json()["status"] in ("succeeded", "failed"):
+            return status
+        await asyncio.sleep(JOB_POLL_SECONDS)
+
+
+ENDPOINTS = {
+    "/upload-documents/": call_upload,
+    "/generate-tests/": call_generate_tests,
+    "/generate-script/": call_generate_script,
+}
+
+
+async def run_load(client, call, concurrency: int, total: int, html: str):
+    latencies = []
+    statuses = {}
+    counter = iter(range(total))
+
+    async def worker():
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                response = await call(client, i, html)
+                ok = response.status_code < 400 and response.json().get("status") != "failed"
+                status = str(response.status_code) if ok or response.status_code >= 400 else "job_failed"
+            except Exception as e:
+                ok, status = False, type(e).__name__
+            statuses[status] = statuses.get(status, 0) + 1
+            if ok:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "concurrency": concurrency,
+        "requests": total,
+        "succeeded": len(latencies),
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+    }
+    if latencies:
+        result["latency"] = summarize(latencies)
+    return result
+
+
+async def bench_endpoints(port: int, levels, requests_per_level: int, html: str):
+    import httpx
+
+    results = {}
+    limits = httpx.Limits(max_connections=max(levels) * 2)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300.0, limits=limits) as client:
+        await wait_until_ready(client)
+        for path, call in ENDPOINTS.items():
+            results[path] = []
+            for concurrency in levels:
+                total = max(requests_per_level, concurrency)
+                level = await run_load(client, call, concurrency, total, html)
+                results[path].append(level)
+                print(f"{path} x{concurrency}: {level.get('latency')} {level['throughput_rps']} rps", file=sys.stderr)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return None
+
+
+def run(args):
+    workdir = tempfile.mkdtemp(prefix="service_bench_")
+    configure_environment(workdir, args)
+    registry = install_stubs(args)
+
+    with open(args.html, "r", encoding="utf-8") as f:
+        html = f.read()
+
+    from backend.config import VECTOR_BACKEND, EMBEDDING_ENGINE
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "vector_backend": VECTOR_BACKEND,
+            "embeddings": "hash" if args.fake_embeddings else EMBEDDING_ENGINE,
+            "cache": args.cache,
+            "llm_latency_s": args.llm_latency,
+            "llm_tokens_per_second": args.llm_tps,
+            "llm_output_tokens": args.llm_tokens,
+            "llm_server": args.llm_server,
+        },
+    }
+
+    server = None
+    try:
+        results["ingestion"] = bench_ingestion(registry, args.corpus_sizes, workdir)
+
+        # The server keeps serving the last (largest) corpus
+        from backend.config import UPLOAD_DIR
+        shutil.rmtree(UPLOAD_DIR, ignore_errors=True)
+        shutil.copytree(os.path.join(workdir, f"corpus_{args.corpus_sizes[-1]}"), UPLOAD_DIR)
+        results["retrieval"] = bench_retrieval(registry, args.queries)
+
+        port = free_port()
+        server, thread = start_server(port)
+        results["endpoints"] = asyncio.run(bench_endpoints(port, args.concurrency, args.requests, html))
+        if args.llm_server:
+            results["llm_gateway"] = registry.llm_status()
+    finally:
+        if server is not None:
+            server.should_exit = True
+            thread.join(timeout=10)
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus-sizes", nargs="+", type=int, default=[10, 50, 200], help="documents per ingestion run")
+    parser.add_argument("--queries", type=int, default=200, help="retrieval samples")
+    parser.add_argument("--concurrency", nargs="+", type=int, default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=32, help="requests per endpoint and concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM time to first token (s)")
+    parser.add_argument("--llm-tps", type=float, default=250.0, help="stub LLM output tokens per second")
+    parser.add_argument("--llm-tokens", type=int, default=300, help="stub LLM output tokens per answer")
+    parser.add_argument("--llm-server", action="store_true", help="call the stub over HTTP through the LLM gateway")
+    parser.add_argument("--llm-server-keys", type=int, default=2, help="API keys the gateway rotates across")
+    parser.add_argument("--llm-server-rpm", type=int, default=0, help="stub server requests per minute per key (0 = unlimited)")
+    parser.add_argument("--vector-backend", choices=["chroma", "numpy"])
+    parser.add_argument("--cache", action="store_true", help="keep the response cache on (off by default)")
+    parser.add_argument("--fake-embeddings", action="store_true", help="use deterministic hash embeddings (offline)")
+    parser.add_argument("--html", default="assets/checkout.html")
+    parser.add_argument("--output", help="write the JSON result here as well as to stdout")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Local stand-in for the Groq chat-completions API, for exercising the
+LLM gateway (rate limiting, retries, key rotation, fallback) offline.
+
+    python -m benchmarks.stub_llm_server --port 8400 --rpm 60 --error-rate 0.1
+    LLM_BASE_URL=http://127.0.0.1:8400 GROQ_API_KEYS=a,b uvicorn backend.main:app
+
+Answers come from StubChatModel, so they have the same shape as in the
+service benchmark. Limits are enforced per API key (like the real
+provider): over --rpm a key gets 429 with a Retry-After header.
+--slow-model makes one model slow, to trigger the latency SLO fallback.
+"""
+import sys
+import time
+import json
+import uuid
+import random
+import asyncio
+import argparse
+import threading
+from collections import deque
+
+from .stubs import StubChatModel, TOKEN_RE
+
+
+class StubState:
+    def __init__(self, args):
+        self.args = args
+        self.calls = deque()
+        self.requests_by_key = {}
+        self.lock = threading.Lock()
+
+    def admit(self, api_key: str):
+        """
+        Seconds until the key may call again (0 = admitted).
+        """
+        if not self.args.rpm:
+            return 0.0
+        now = time.monotonic()
+        with self.lock:
+            window = self.requests_by_key.setdefault(api_key, deque())
+            while window and now - window[0] > 60:
+                window.popleft()
+            if len(window) >= self.args.rpm:
+                return 60 - (now - window[0])
+            window.append(now)
+        return 0.0
+
+
+def create_app(args):
+    from fastapi import FastAPI, Request
+    from fastapi.responses import JSONResponse, StreamingResponse
+    from langchain_core.messages import HumanMessage
+
+    app = FastAPI()
+    state = StubState(args)
+    app.state.stub = state
+
+    def latency_of(model: str):
+        return args.slow_latency if model == args.slow_model else args.latency
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        api_key = request.headers.get("authorization", "").removeprefix("Bearer ").strip()
+        model = body.get("model", "stub")
+        state.calls.append((time.time(), api_key[-4:], model))
+
+        wait = state.admit(api_key)
+        if wait:
+            return JSONResponse(
+                status_code=429, headers={"retry-after": f"{wait:.2f}"},
+                content={"error": {"message": "Rate limit reached", "type": "tokens", "code": "rate_limit_exceeded"}},
+            )
+        if random.random() < args.error_rate:
+            return JSONResponse(status_code=503, content={"error": {"message": "Service unavailable", "type": "internal_server_error"}})
+
+        stub = StubChatModel(latency=latency_of(model), tokens_per_second=args.tps, output_tokens=args.tokens)
+        messages = [HumanMessage(content=str(m.get("content", ""))) for m in body.get("messages", [])]
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        prompt_tokens = sum(len(TOKEN_RE.findall(m.content)) for m in messages)
+
+        if not body.get("stream"):
+            await asyncio.sleep(stub.latency + stub._delay(len(stub._render(messages))))
+            text = "".join(stub._render(messages))
+            completion_tokens = len(TOKEN_RE.findall(text))
+            return {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                          "total_tokens": prompt_tokens + completion_tokens},
+            }
+
+        def chunk(delta, finish_reason=None):
+            data = {
+                "id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(data)}\n\n"
+
+        async def events():
+            await asyncio.sleep(stub.latency)
+            yield chunk({"role": "assistant", "content": ""})
+            for text in stub._chunks(messages):
+                await asyncio.sleep(stub._delay(stub.chunk_tokens))
+                yield chunk({"content": text})
+            yield chunk({}, "stop")
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.get("/stats")
+    def stats():
+        calls = list(state.calls)
+        by_model, by_key = {}, {}
+        for _, key, model in calls:
+            by_model[model] = by_model.get(model, 0) + 1
+            by_key[key] = by_key.get(key, 0) + 1
+        return {"calls": len(calls), "by_model": by_model, "by_key": by_key}
+
+    return app
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8400)
+    parser.add_argument("--latency", type=float, default=0.3, help="time to first token (s)")
+    parser.add_argument("--tps", type=float, default=250.0, help="output tokens per second")
+    parser.add_argument("--tokens", type=int, default=300, help="output tokens per answer")
+    parser.add_argument("--rpm", type=int, default=0, help="requests per minute per API key (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls answered with 503")
+    parser.add_argument("--slow-model", help="model that answers with --slow-latency instead")
+    parser.add_argument("--slow-latency", type=float, default=5.0)
+    return parser
+
+
+def main(argv=None):
+    import uvicorn
+
+    args = build_parser().parse_args(argv)
+    uvicorn.run(create_app(args), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
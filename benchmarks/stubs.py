@@ -0,0 +1,115 @@
+import re
+import json
+import time
+import asyncio
+import hashlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+# ---------------------------------------------------------
+# Deterministic local stand-ins so benchmarks run offline.
+# ---------------------------------------------------------
+
+# A "token" for the stub LLM: one word with its leading whitespace
+TOKEN_RE = re.compile(r"\s*\S+")
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic pseudo-embeddings (seeded from a hash of the text) with the
+    same dimensionality as all-MiniLM-L6-v2. No model download, no torch.
+    """
+
+    def __init__(self, size: int = 384):
+        self.size = size
+
+    def _embed(self, text: str):
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.size).astype(np.float32)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str):
+        return self._embed(text)
+
+
+class StubChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Groq chat model. Waits `latency` seconds
+    (time to first token), then emits `output_tokens` tokens at
+    `tokens_per_second`. Test-case prompts get a JSON list of test cases,
+    script prompts get a Python script; the content depends only on the prompt.
+    """
+
+    latency: float = 0.3
+    tokens_per_second: float = 250.0
+    output_tokens: int = 300
+    # Tokens per streamed chunk (keeps event-loop wake-ups realistic)
+    chunk_tokens: int = 4
+
+    @property
+    def _llm_type(self):
+        return "stub-chat"
+
+    def _render(self, messages):
+        prompt = "\n".join(str(m.content) for m in messages)
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        if "Selenium" in prompt:
+            lines = [
+                "import os", "from selenium import webdriver", "from selenium.webdriver.common.by import By",
+                "", "driver = webdriver.Chrome()",
+                'driver.get(f"file:///{os.path.abspath(\'assets/checkout.html\')}")',
+            ]
+            step = 0
+            while len(TOKEN_RE.findall("\n".join(lines))) < self.output_tokens - 2:
+                lines.append(f"# step {step} ({digest[step % 56:step % 56 + 8]})")
+                step += 1
+            text = "\n".join(lines + ["driver.quit()"])
+        else:
+            cases = []
+            while not cases or len(TOKEN_RE.findall(json.dumps(cases))) < self.output_tokens:
+                i = len(cases)
+                cases.append({
+                    "test_id": f"TC-{i + 1:03d}",
+                    "description": f"Check rule {digest[i % 56:i % 56 + 8]} on the checkout page",
+                    "expected_result": "The page shows the documented behaviour.",
+                    "grounded_in": "product_specs.md",
+                })
+            text = json.dumps(cases)
+        return TOKEN_RE.findall(text)
+
+    def _chunks(self, messages):
+        tokens = self._render(messages)
+        return ["".join(tokens[i:i + self.chunk_tokens]) for i in range(0, len(tokens), self.chunk_tokens)]
+
+    def _delay(self, n_tokens: int):
+        return n_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+
+    def _result(self, messages):
+        text = "".join(self._render(messages))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency + self._delay(len(self._render(messages))))
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency + self._delay(len(self._render(messages))))
+        return self._result(messages)
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            time.sleep(self._delay(self.chunk_tokens))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(messages):
+            await asyncio.sleep(self._delay(self.chunk_tokens))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=chunk))
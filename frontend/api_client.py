@@ -0,0 +1,148 @@
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# ---------------------------------------------------------
+# HTTP client layer for the Streamlit app.
+#
+# One QAClient is shared by every session and rerun (app.get_client()
+# caches it with st.cache_resource):
+#   - a pooled requests.Session keeps connections to the backend alive;
+#   - results are cached under content hashes (documents, page, test
+#     case, mode), so a rerun or a repeated click costs no request;
+#   - documents are hash-checked with the server first and only new or
+#     changed files are uploaded;
+#   - the target page is registered once and sent as its html_id.
+# ---------------------------------------------------------
+
+POOL_SIZE = 16
+RESULT_CACHE_SIZE = 256
+# Idempotent reads are retried on connection errors and gateway hiccups
+GET_RETRY = Retry(total=3, backoff_factor=0.3, status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET"}))
+
+
+def sha256(data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha256(data).hexdigest()
+
+
+def corpus_fingerprint(hashes: dict):
+    # One hash for a whole document set ({filename: sha256})
+    return sha256(json.dumps(sorted(hashes.items())))
+
+
+class ApiError(Exception):
+    def __init__(self, response):
+        try:
+            detail = response.json().get("detail", response.text)
+        except ValueError:
+            detail = response.text
+        super().__init__(f"{response.status_code}: {detail}")
+        self.status_code = response.status_code
+        self.detail = detail
+
+
+class QAClient:
+    def __init__(self, base_url: str, pool_size: int = POOL_SIZE, cache_size: int = RESULT_CACHE_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=GET_RETRY)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.cache_size = cache_size
+        self._results = OrderedDict()
+        # sha256 of a page -> its html_id on the server
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    # ---------------- HTTP ----------------
+    def get(self, path: str, **kwargs):
+        return self.session.get(self.base_url + path, **kwargs)
+
+    def post(self, path: str, **kwargs):
+        return self.session.post(self.base_url + path, **kwargs)
+
+    # ---------------- Result cache ----------------
+    def _key(self, parts):
+        return sha256(json.dumps(parts, sort_keys=True, default=str))
+
+    def cached(self, *parts):
+        key = self._key(parts)
+        with self._lock:
+            if key in self._results:
+                self._results.move_to_end(key)
+                return self._results[key]
+        return None
+
+    def remember(self, value, *parts):
+        key = self._key(parts)
+        with self._lock:
+            self._results[key] = value
+            self._results.move_to_end(key)
+            while len(self._results) > self.cache_size:
+                self._results.popitem(last=False)
+        return value
+
+    # ---------------- Documents ----------------
+    def sync_documents(self, project_id: str, docs):
+        """
+        docs: [(filename, bytes, mime type)]. Asks the server which files it
+        already has indexed and uploads only the rest (the unchanged ones
+        are kept by name). Returns {"status": "unchanged"} when nothing needs
+        rebuilding, else {"status": "queued", "status_url", "uploaded"}.
+        """
+        hashes = {name: sha256(data) for name, data, _ in docs}
+        response = self.post("/documents/check", data={"project_id": project_id, "hashes_json": json.dumps(hashes)})
+        if response.status_code != 200:
+            raise ApiError(response)
+        check = response.json()
+        result = {"check": check, "fingerprint": corpus_fingerprint(hashes)}
+        if check["up_to_date"]:
+            return {**result, "status": "unchanged"}
+
+        wanted = set(check["upload"])
+        files = [("files", (name, data, mime)) for name, data, mime in docs if name in wanted]
+        response = self.post(
+            "/upload-documents/", files=files or None,
+            data={"project_id": project_id, "keep_json": json.dumps(check["unchanged"])},
+        )
+        if response.status_code != 202:
+            raise ApiError(response)
+        return {**result, "status": "queued", "status_url": response.json()["status_url"], "uploaded": sorted(wanted)}
+
+    # ---------------- Target page ----------------
+    def html_id(self, html: bytes):
+        """
+        Registers the page on first use; afterwards only its id is sent.
+        """
+        digest = sha256(html)
+        with self._lock:
+            html_id = self._pages.get(digest)
+        if html_id is None:
+            response = self.post("/pages/", data={"html_content": html.decode("utf-8")})
+            if response.status_code != 200:
+                raise ApiError(response)
+            html_id = response.json()["html_id"]
+            with self._lock:
+                self._pages[digest] = html_id
+        return html_id
+
+    def post_with_page(self, path: str, html: bytes, data: dict, **kwargs):
+        """
+        POSTs data plus the page's html_id. If the server no longer knows the
+        id (pruned, or a fresh server), the page is registered again and the
+        request retried once.
+        """
+        response = self.post(path, data={**data, "html_id": self.html_id(html)}, **kwargs)
+        if response.status_code == 404:
+            response.close()
+            with self._lock:
+                self._pages.pop(sha256(html), None)
+            response = self.post(path, data={**data, "html_id": self.html_id(html)}, **kwargs)
+        return response
@@ -1,9 +1,13 @@
 import streamlit as st
-import requests
 import json
+import io
+import re
+import zipfile
 import pandas as pd
 from PIL import Image
 import os
+import time
+from api_client import QAClient, ApiError, sha256
 
 # ---------------------------------------------------------
 # 1. PATH SETUP & CONFIGURATION
@@ -30,6 +34,29 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+@st.cache_resource
+def get_client():
+    # One pooled HTTP session and result cache for every session and rerun
+    return QAClient(BACKEND_URL)
+
+client = get_client()
+
+def iter_sse(response):
+    """
+    Yields (event, data) pairs from a server-sent-events response.
+    """
+    event, data_lines = "message", []
+    # chunk_size=None: hand lines over as soon as they arrive instead of buffering
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if line == "":
+            if data_lines:
+                yield event, json.loads("\n".join(data_lines))
+            event, data_lines = "message", []
+        elif line.startswith("event:"):
+            event = line[len("event:"):].strip()
+        elif line.startswith("data:"):
+            data_lines.append(line[len("data:"):].strip())
+
 # ---------------------------------------------------------
 # 2. CUSTOM CSS (RED & BLACK THEME)
 # ---------------------------------------------------------
@@ -138,6 +165,9 @@ with col_title:
     st.title("AUTONOMOUS QA AGENT")
     st.markdown("**SYSTEM STATUS:** `ONLINE` | **MODE:** `RED OPS`")
 
+# Every knowledge-base call is scoped to this project
+project_id = st.sidebar.text_input("PROJECT ID", value="default", help="Letters, digits, '-' or '_'. Each project has its own knowledge base.")
+
 # ---------------------------------------------------------
 # 4. TABS LAYOUT
 # ---------------------------------------------------------
@@ -168,18 +198,38 @@ with tab1:
             st.error("NO DOCUMENTS DETECTED.")
         else:
             with st.spinner("VECTORIZING DOCUMENTS..."):
-                files = []
-                for doc in uploaded_docs:
-                    files.append(("files", (doc.name, doc.getvalue(), doc.type)))
-                
+                docs = [(doc.name, doc.getvalue(), doc.type) for doc in uploaded_docs]
+                corpus = st.session_state.setdefault('corpus', {})
                 try:
-                    response = requests.post(f"{BACKEND_URL}/upload-documents/", files=files)
-                    if response.status_code == 200:
-                        st.markdown('<div class="success-box">CORE SYSTEMS ONLINE. VECTORS INDEXED.</div>', unsafe_allow_html=True)
-                        with st.expander("VIEW VECTOR METADATA"):
-                            st.json(response.json())
+                    # Only files the server has not indexed yet are uploaded
+                    sync = client.sync_documents(project_id, docs)
+                    if sync["status"] == "unchanged":
+                        corpus[project_id] = sync["fingerprint"]
+                        st.markdown('<div class="success-box">KNOWLEDGE BASE UP TO DATE. NOTHING TO UPLOAD.</div>', unsafe_allow_html=True)
                     else:
-                        st.error(f"SYSTEM FAILURE: {response.text}")
+                        st.caption(f"UPLOADING {len(sync['uploaded'])} OF {len(docs)} FILES ({len(sync['check']['unchanged'])} UNCHANGED)")
+                        # Ingestion runs as a background job: poll until it finishes
+                        progress_bar = st.progress(0.0, text="QUEUED")
+                        while True:
+                            job = client.get(sync["status_url"]).json()
+                            progress_bar.progress(job["progress"], text=job["stage"].upper())
+                            if job["status"] in ("succeeded", "failed"):
+                                break
+                            time.sleep(0.5)
+
+                        if job["status"] == "succeeded":
+                            corpus[project_id] = sync["fingerprint"]
+                            st.markdown('<div class="success-box">CORE SYSTEMS ONLINE. VECTORS INDEXED.</div>', unsafe_allow_html=True)
+                            skipped = job["result"].get("skipped_files") or []
+                            if skipped:
+                                st.warning("SKIPPED (not text): " + ", ".join(f["source"] for f in skipped))
+                        else:
+                            corpus.pop(project_id, None)
+                            st.error(f"SYSTEM FAILURE: {job['error'] or job['result']}")
+                        with st.expander("VIEW VECTOR METADATA"):
+                            st.json(job)
+                except ApiError as e:
+                    st.error(f"SYSTEM FAILURE: {e}")
                 except Exception as e:
                     st.error(f"CONNECTION LOST: {e}")
 
@@ -202,45 +252,80 @@ with tab2:
         generate_tc_btn = st.button("EXECUTE PLAN")
 
     if generate_tc_btn:
+        # Cached per query and document set (known once this session synced the docs)
+        fingerprint = st.session_state.get('corpus', {}).get(project_id)
+        cached = client.cached("tests", project_id, feature_query, fingerprint) if fingerprint else None
         if not feature_query:
             st.warning("INPUT REQUIRED.")
+        elif cached is not None:
+            st.session_state['test_cases'] = cached["test_cases"]
+            st.caption(f"CONTEXT: {cached['prompt_tokens']} PROMPT TOKENS (CACHED)")
         else:
-            with st.spinner("NEURAL PROCESSING..."):
-                try:
-                    payload = {"query": feature_query}
-                    response = requests.post(f"{BACKEND_URL}/generate-tests/", data=payload)
-                    
+            live_status = st.empty()
+            live_table = st.empty()
+            streamed_cases = []
+            live_status.markdown("`NEURAL PROCESSING...`")
+            try:
+                payload = {"query": feature_query, "project_id": project_id}
+                # Stream: each test case arrives as soon as the model finishes it
+                with client.post("/generate-tests/stream", data=payload, stream=True) as response:
                     if response.status_code == 200:
-                        data = response.json()
-                        tc_raw = data.get("test_cases", [])
-                        
-                        # --- ROBUST JSON PARSING ---
-                        if isinstance(tc_raw, str):
-                            try:
-                                clean_json = tc_raw.replace("```json", "").replace("```", "").strip()
-                                parsed_data = json.loads(clean_json)
-                            except:
-                                st.session_state['test_cases'] = []
-                                st.error("DATA CORRUPTION DETECTED (Invalid JSON): " + tc_raw)
-                                parsed_data = []
-                        else:
-                            parsed_data = tc_raw
-
-                        # Unwrap dictionary if needed
-                        if isinstance(parsed_data, dict):
-                            if "test_cases" in parsed_data:
-                                final_list = parsed_data["test_cases"]
-                            else:
-                                final_list = [parsed_data]
-                        elif isinstance(parsed_data, list):
-                            final_list = parsed_data
-                        else:
-                            final_list = []
-
-                        st.session_state['test_cases'] = final_list
-                        
+                        for event, data in iter_sse(response):
+                            if event == "test_case":
+                                streamed_cases.append(data)
+                                live_status.markdown(f"`RECEIVING... {len(streamed_cases)} SCENARIOS`")
+                                live_table.dataframe(pd.DataFrame(streamed_cases), use_container_width=True)
+                            elif event == "done":
+                                # Validated (and repaired) records, parsed by the server
+                                final_list = data["test_cases"]
+                                st.session_state['test_cases'] = final_list
+                                if not final_list:
+                                    st.error("DATA CORRUPTION DETECTED (Invalid JSON): " + data["answer"])
+                                elif fingerprint and not data["invalid"]:
+                                    client.remember({"test_cases": final_list, "prompt_tokens": data["prompt_tokens"]},
+                                                    "tests", project_id, feature_query, fingerprint)
+                                if data["repaired"] or data["invalid"]:
+                                    st.caption(f"REPAIRED: {data['repaired']} | DISCARDED: {len(data['invalid'])}")
+                                st.caption(f"CONTEXT: {data['prompt_tokens']} PROMPT TOKENS")
+                            elif event == "error":
+                                st.error(f"SERVER ERROR: {data['detail']}")
                     else:
                         st.error(f"SERVER ERROR: {response.text}")
+            except Exception as e:
+                st.error(f"NETWORK ERROR: {e}")
+            # The full table is rendered below from session state
+            live_status.empty()
+            live_table.empty()
+
+    # Whole product spec at once: one merged, de-duplicated plan
+    with st.expander("BULK PLAN (MULTIPLE FEATURES)"):
+        default_features = "Discount codes\nShipping options\nPayment methods\nCheckout form validation"
+        features_text = st.text_area("ONE FEATURE PER LINE:", value=default_features, height=120)
+        if st.button("EXECUTE BULK PLAN"):
+            features = [line.strip() for line in features_text.splitlines() if line.strip()]
+            fingerprint = st.session_state.get('corpus', {}).get(project_id)
+            plan = client.cached("plan", project_id, features, fingerprint) if fingerprint else None
+            if not features:
+                st.warning("INPUT REQUIRED.")
+            else:
+                try:
+                    if plan is None:
+                        with st.spinner(f"PLANNING {len(features)} FEATURES..."):
+                            response = client.post("/generate-test-plan/", data={"queries_json": json.dumps(features), "project_id": project_id})
+                        if response.status_code != 200:
+                            raise ApiError(response)
+                        plan = response.json()
+                        if fingerprint and not any(f["error"] for f in plan["features"]):
+                            client.remember(plan, "plan", project_id, features, fingerprint)
+                    st.session_state['test_cases'] = plan["test_cases"]
+                    merge = plan["merge"]
+                    st.caption(f"{merge['test_cases']} SCENARIOS FROM {len(plan['features'])} FEATURES "
+                               f"({merge['duplicates_removed']} DUPLICATES MERGED)")
+                    for feature in plan["features"]:
+                        if feature["error"]:
+                            st.error(f"{feature['query']}: {feature['error']}")
+                except ApiError as e:
+                    st.error(f"SERVER ERROR: {e}")
                 except Exception as e:
                     st.error(f"NETWORK ERROR: {e}")
 
@@ -257,7 +342,7 @@ with tab2:
         df = pd.DataFrame(tcs)
         if not df.empty:
             df.columns = [c.lower() for c in df.columns]
-            desired_cols = ['test_id', 'description', 'expected_result', 'grounded_in']
+            desired_cols = ['test_id', 'feature', 'description', 'expected_result', 'grounded_in']
             final_cols = [c for c in desired_cols if c in df.columns]
             
             if final_cols:
@@ -294,36 +379,176 @@ with tab2:
                     }
 
             selected_label = st.selectbox("SELECT TARGET SCENARIO:", list(tc_options.keys()))
+            fast_mode = st.checkbox("FAST MODE (EXPLICIT WAITS, NO FIXED SLEEPS)", value=True)
+            script_mode = "fast" if fast_mode else "standard"
             
+            uploaded_html.seek(0)
+            html_bytes = uploaded_html.getvalue()
+            html_hash = sha256(html_bytes)
+
             if st.button("GENERATE PAYLOAD (PYTHON SCRIPT)"):
                 selected_case = tc_options[selected_label]
-                uploaded_html.seek(0) 
-                html_content = uploaded_html.getvalue().decode("utf-8")
-                
-                with st.spinner("WRITING CODE..."):
+                cached = client.cached("script", selected_case, html_hash, script_mode)
+                if cached is not None:
+                    st.session_state['generated_script'], st.session_state['script_report'] = cached
+                else:
                     payload = {
                         "test_case_json": json.dumps(selected_case),
-                        "html_content": html_content
+                        "mode": script_mode
                     }
+                    live_code = st.empty()
                     try:
-                        resp = requests.post(f"{BACKEND_URL}/generate-script/", data=payload)
-                        if resp.status_code == 200:
-                            raw_script = resp.json().get("script", "")
-                            clean_script = raw_script.replace("```python", "").replace("```", "").strip()
-                            st.session_state['generated_script'] = clean_script
-                        else:
-                            st.error(f"Error: {resp.text}")
+                        # The page goes up once (registered by hash); tokens stream into the code view
+                        with client.post_with_page("/generate-script/stream", html_bytes, payload, stream=True) as resp:
+                            if resp.status_code == 200:
+                                partial = ""
+                                for event, data in iter_sse(resp):
+                                    if event == "token":
+                                        partial += data
+                                        live_code.code(partial, language='python')
+                                    elif event == "done":
+                                        raw_script = data.get("script", "")
+                                        clean_script = raw_script.replace("```python", "").replace("```", "").strip()
+                                        st.session_state['generated_script'] = clean_script
+                                        st.session_state['script_report'] = data.get("fast")
+                                        client.remember((clean_script, data.get("fast")), "script", selected_case, html_hash, script_mode)
+                                    elif event == "error":
+                                        st.error(f"Error: {data['detail']}")
+                            else:
+                                st.error(f"Error: {resp.text}")
                     except Exception as e:
                         st.error(f"Connection Error: {e}")
+                    live_code.empty()
 
             # Show Script
             if 'generated_script' in st.session_state:
                 st.markdown("#### GENERATED SCRIPT")
                 st.code(st.session_state['generated_script'], language='python')
+                report = st.session_state.get('script_report')
+                if report and report.get("valid"):
+                    st.caption(
+                        f"FAST MODE: {report['sleeps_removed']} SLEEPS REMOVED, {report['sleeps_rewritten']} REWRITTEN "
+                        f"→ ~{report['estimated_seconds_saved']}s SAVED PER RUN"
+                    )
+                elif report:
+                    st.warning(f"SCRIPT DID NOT VALIDATE: {report['error']}")
                 
                 st.download_button(
                     label="DOWNLOAD .PY FILE",
                     data=st.session_state['generated_script'],
                     file_name="test_script.py",
                     mime="text/x-python"
-                )
\ No newline at end of file
+                )
+            st.divider()
+
+            # --- BATCH MODE: ALL SCENARIOS AT ONCE ---
+            st.markdown("#### BATCH MODE")
+            if st.button(f"GENERATE ALL {len(tc_options)} PAYLOADS"):
+                all_cases = list(tc_options.values())
+                cached = client.cached("batch", all_cases, html_hash, script_mode)
+                if cached is not None:
+                    batch_scripts, batch_errors = dict(cached["scripts"]), {}
+                    st.caption(f"{len(batch_scripts)} PAYLOADS FROM CACHE")
+                else:
+                    batch_scripts = {}
+                    batch_errors = {}
+
+                    progress_bar = st.progress(0.0, text="DISPATCHING...")
+                    live_log = st.empty()
+                    try:
+                        payload = {
+                            "test_cases_json": json.dumps(all_cases),
+                            "mode": script_mode
+                        }
+                        # Results stream back one NDJSON line per script as they finish
+                        with client.post_with_page("/generate-scripts/batch", html_bytes, payload, stream=True) as resp:
+                            if resp.status_code != 200:
+                                st.error(f"Error: {resp.text}")
+                            else:
+                                for raw_line in resp.iter_lines(chunk_size=None):
+                                    if not raw_line:
+                                        continue
+                                    item = json.loads(raw_line)
+                                    if item.get("done"):
+                                        if "estimated_seconds_saved" in item:
+                                            st.caption(f"FAST MODE: ~{item['estimated_seconds_saved']}s SAVED ACROSS THE PLAN")
+                                        # Only a complete plan is worth replaying
+                                        if not batch_errors:
+                                            client.remember({"scripts": dict(batch_scripts)}, "batch", all_cases, html_hash, script_mode)
+                                        break
+                                    if "script" in item:
+                                        clean = item["script"].replace("```python", "").replace("```", "").strip()
+                                        batch_scripts[item["test_id"]] = clean
+                                    else:
+                                        batch_errors[item["test_id"]] = item["error"]
+                                    finished = len(batch_scripts) + len(batch_errors)
+                                    progress_bar.progress(finished / len(all_cases), text=f"{finished}/{len(all_cases)} COMPLETE")
+                                    live_log.markdown(f"`{item['test_id']}` {'READY' if 'script' in item else 'FAILED'}")
+                    except Exception as e:
+                        st.error(f"Connection Error: {e}")
+
+                st.session_state['batch_scripts'] = batch_scripts
+                st.session_state['batch_errors'] = batch_errors
+
+            if st.session_state.get('batch_scripts') or st.session_state.get('batch_errors'):
+                batch_scripts = st.session_state.get('batch_scripts', {})
+                batch_errors = st.session_state.get('batch_errors', {})
+                st.markdown(f"**PAYLOADS READY:** `{len(batch_scripts)}` | **FAILED:** `{len(batch_errors)}`")
+                for t_id, err in batch_errors.items():
+                    st.error(f"{t_id}: {err}")
+
+                if batch_scripts:
+                    # Bundle every script into one zip archive
+                    zip_buffer = io.BytesIO()
+                    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+                        for t_id, script in batch_scripts.items():
+                            safe_name = re.sub(r"[^A-Za-z0-9_-]+", "_", str(t_id))
+                            archive.writestr(f"test_{safe_name}.py", script)
+
+                    st.download_button(
+                        label="DOWNLOAD ALL (.ZIP)",
+                        data=zip_buffer.getvalue(),
+                        file_name="test_scripts.zip",
+                        mime="application/zip"
+                    )
+
+                    # --- EXECUTION: RUN THE SUITE ON POOLED HEADLESS BROWSERS ---
+                    if st.button(f"EXECUTE SUITE ({len(batch_scripts)} SCRIPTS)"):
+                        payload = {"scripts_json": json.dumps(batch_scripts)}
+                        run_results = []
+                        run_progress = st.progress(0.0, text="LAUNCHING BROWSERS...")
+                        try:
+                            with client.post_with_page("/run-scripts/", html_bytes, payload, stream=True) as resp:
+                                if resp.status_code != 200:
+                                    st.error(f"Error: {resp.text}")
+                                else:
+                                    for raw_line in resp.iter_lines(chunk_size=None):
+                                        if not raw_line:
+                                            continue
+                                        item = json.loads(raw_line)
+                                        if item.get("done"):
+                                            st.session_state['run_summary'] = item
+                                            break
+                                        run_results.append(item)
+                                        run_progress.progress(len(run_results) / len(batch_scripts), text=f"{len(run_results)}/{len(batch_scripts)} EXECUTED")
+                        except Exception as e:
+                            st.error(f"Connection Error: {e}")
+                        st.session_state['run_results'] = run_results
+
+                    if st.session_state.get('run_summary'):
+                        summary = st.session_state['run_summary']
+                        if summary.get("error"):
+                            st.error(f"RUN ABORTED: {summary['error']}")
+                        else:
+                            st.markdown(
+                                f"**PASSED:** `{summary['passed']}/{summary['total']}` | **FAILED:** `{summary['failed']}` | "
+                                f"**ERRORS:** `{summary['error'] + summary['timeout']}` | **WALL TIME:** `{summary['duration_s']}s` "
+                                f"ON `{summary['workers']}` BROWSERS"
+                            )
+                        st.dataframe(
+                            [
+                                {"test_id": r["test_id"], "status": r["status"].upper(), "seconds": r["duration_s"], "detail": r["message"] or ""}
+                                for r in st.session_state.get('run_results', [])
+                            ],
+                            use_container_width=True
+                        )
@@ -0,0 +1,4 @@
+import os
+
+# No tokenizer downloads during tests; token counts fall back to the estimate
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
@@ -0,0 +1,75 @@
+import json
+
+from backend import case_records
+from backend.stream_parser import IncrementalJSONParser
+
+CASES = [
+    {"test_id": "TC-001", "description": "Apply SAVE15", "expected_result": "15% off", "grounded_in": "product_specs.md"},
+    {"test_id": "TC-002", "description": "Free shipping", "expected_result": "Shipping is 0", "grounded_in": "ui.md"},
+]
+
+
+def feed_chars(parser, text):
+    completed = []
+    for ch in text:
+        completed.extend(parser.feed(ch))
+    return completed
+
+
+def test_parser_emits_each_object_as_it_closes():
+    parser = IncrementalJSONParser()
+    text = "Here are the tests:\n```json\n" + json.dumps(CASES) + "\n```"
+    first_close = text.index("}") + 1
+    assert feed_chars(parser, text[:first_close]) == [CASES[0]]
+    assert feed_chars(parser, text[first_close:]) == [CASES[1]]
+    assert parser.finish() == [] and parser.errors == []
+
+
+def test_parser_reads_wrapped_lists_but_not_nested_objects():
+    nested = dict(CASES[0], steps=[{"action": "type"}, {"action": "click"}])
+    parser = IncrementalJSONParser()
+    text = json.dumps({"summary": {"count": 2}, "test_cases": [nested, CASES[1]]})
+    assert feed_chars(parser, text) == [nested, CASES[1]]
+
+
+def test_parser_falls_back_to_a_single_object():
+    parser = IncrementalJSONParser()
+    assert parser.feed("```json\n" + json.dumps(CASES[0]) + "\n```") == []
+    assert parser.finish() == [CASES[0]]
+
+
+def test_parser_records_malformed_and_truncated_objects():
+    parser = IncrementalJSONParser()
+    text = '[{"test_id": "TC-001", "description": oops}, ' + json.dumps(CASES[1]) + ', {"test_id": "TC-003", "desc'
+    assert parser.feed(text) == [CASES[1]]
+    parser.finish()
+    assert parser.truncated
+    assert [e["raw"][:22] for e in parser.errors] == ['{"test_id": "TC-001", ', '{"test_id": "TC-003", ']
+    assert parser.errors[1]["error"] == "truncated"
+
+
+def test_collector_normalises_keys_and_keeps_ids_unique():
+    collector = case_records.TestCaseCollector()
+    answer = json.dumps([
+        CASES[0],
+        {"Test ID": "TC-001", "Scenario": "Invalid code", "Expected Result": "Error shown", "Source": ["a.md", "b.md"]},
+    ])
+    assert [r["test_id"] for r in collector.feed(answer)] == ["TC-001", "TC-001-2"]
+    assert collector.finish() == []
+    assert collector.records[1] == {
+        "test_id": "TC-001-2", "description": "Invalid code", "expected_result": "Error shown", "grounded_in": "a.md, b.md",
+    }
+    assert collector.test_ids == {"TC-001", "TC-001-2"} and collector.invalid == []
+
+
+def test_collector_keeps_invalid_items_for_repair():
+    answer = '[{"test_id": "TC-001", "description": "Empty", "expected_result": "", "grounded_in": "ui.md"}, {"test_id": "TC-002", "descr'
+    records, invalid = case_records.parse_test_cases(answer)
+    assert records == []
+    assert [(i["test_id"], i["error"]) for i in invalid] == [("TC-001", "missing expected_result"), ("TC-002", "truncated")]
+
+
+def test_collector_reports_an_answer_without_test_cases():
+    records, invalid = case_records.parse_test_cases("Sorry, I cannot help with that.")
+    assert records == []
+    assert invalid == [{"raw": "Sorry, I cannot help with that.", "error": "no test cases found", "test_id": None}]
@@ -0,0 +1,63 @@
+import pytest
+from langchain_core.documents import Document
+
+from backend import context_packing
+from backend.context_packing import pack_context
+from backend.ratelimit import estimate_tokens
+
+SPEC = (
+    "The discount code SAVE15 takes fifteen percent off the cart total. "
+    "Only one code can be applied per order and it cannot be combined with free shipping. "
+    "Express shipping costs ten dollars and standard shipping is free above fifty dollars. "
+    "An invalid code shows an error message in red below the coupon field."
+)
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    # Counts must not change if the real tokenizer finishes loading mid-test
+    monkeypatch.setattr(context_packing, "count_tokens", estimate_tokens)
+
+
+def chunk(text, chunk_id, source="product_specs.md", start=None):
+    metadata = {"source": source, "chunk_id": chunk_id}
+    if start is not None:
+        metadata["start_index"] = start
+    return Document(page_content=text, metadata=metadata)
+
+
+def test_overlapping_chunks_of_a_file_are_stitched_in_order():
+    first, second = SPEC[:150], SPEC[100:]
+    # The second chunk ranks higher; start_index restores document order
+    docs, stats = pack_context([chunk(second, "b", start=100), chunk(first, "a", start=0)])
+    assert [d.page_content for d in docs] == [SPEC]
+    assert docs[0].metadata["chunk_ids"] == ["b", "a"] and docs[0].metadata["start_index"] == 0
+    assert stats["chunks_used"] == 2 and stats["passages"] == 1
+
+
+def test_other_files_and_gaps_are_not_stitched():
+    docs, _ = pack_context([chunk(SPEC[:100], "a"), chunk(SPEC[150:], "b"), chunk(SPEC[50:150], "c", source="ui.md")])
+    assert [d.metadata["chunk_id"] for d in docs] == ["a", "b", "c"]
+
+
+def test_near_duplicates_are_dropped():
+    reworded = SPEC.replace("red", "bold red")
+    docs, stats = pack_context([chunk(SPEC, "a"), chunk(reworded, "b", source="faq.md"), chunk("Totals use two decimals.", "c")])
+    assert [d.metadata["chunk_id"] for d in docs] == ["a", "c"]
+    assert stats["duplicates_removed"] == 1
+
+
+def test_budget_skips_a_long_candidate_for_shorter_ones():
+    short = "Totals are shown with two decimals."
+    budget = estimate_tokens(SPEC) + estimate_tokens(short) + 2
+    long_text = " ".join(f"Clause {i} of the refund policy applies to orders." for i in range(20))
+    docs, stats = pack_context([chunk(SPEC, "a"), chunk(long_text, "b", source="policy.md"), chunk(short, "c", source="ui.md")],
+                               token_budget=budget)
+    assert [d.metadata["chunk_id"] for d in docs] == ["a", "c"]
+    assert stats["context_tokens"] <= budget and stats["chunks_used"] == 2
+
+
+def test_max_chunks_caps_the_context():
+    candidates = [chunk(f"Rule {i}: " + " ".join(f"word{i}x{j}" for j in range(12)), str(i), source=f"{i}.md") for i in range(5)]
+    docs, stats = pack_context(candidates, max_chunks=3)
+    assert [d.metadata["chunk_id"] for d in docs] == ["0", "1", "2"] and stats["candidates"] == 5
@@ -0,0 +1,11 @@
+from benchmarks.import_budget import run
+
+
+def test_app_imports_without_heavy_packages():
+    """
+    Importing backend.main stays light and answers GET / within the budget
+    (see benchmarks/import_budget.py for the thresholds).
+    """
+    results = run(runs=1, max_fraction=0.5, max_seconds=1.0)
+    assert results["heavy_packages_loaded"] == []
+    assert results["passed"], results["failures"]
@@ -0,0 +1,87 @@
+import os
+import json
+
+import pytest
+
+from backend import rag_utils, resources
+from backend.cache import ResponseCache
+from backend.index_store import active_db_path
+from benchmarks.service_bench import write_corpus
+from benchmarks.stubs import HashEmbeddings
+
+PROJECT = "manifest-test"
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """
+    Builds go to tmp_path on the numpy backend with hash embeddings.
+    Returns (upload dir, db root).
+    """
+    db_root = str(tmp_path / "db")
+    monkeypatch.setattr(rag_utils, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(resources, "VECTOR_BACKEND", "numpy")
+    monkeypatch.setattr(rag_utils, "project_db_root", lambda project_id: db_root)
+    monkeypatch.setattr(resources, "project_db_root", lambda project_id: db_root)
+    monkeypatch.setattr(rag_utils, "response_cache", ResponseCache(str(tmp_path / "cache.sqlite3"), 60, 100))
+    monkeypatch.setattr(resources.registry, "_embedding_model", HashEmbeddings())
+    upload_dir = str(tmp_path / "uploads")
+    write_corpus(upload_dir, 3)
+    yield upload_dir, db_root
+    resources.registry.swap_vector_store(None, PROJECT)
+
+
+def build(upload_dir):
+    return rag_utils.build_knowledge_base(upload_dir, project_id=PROJECT)
+
+
+def index_ids(db_root):
+    return set(resources.registry.get_project_handle(PROJECT).vector_store._ids)
+
+
+def manifest(db_root):
+    with open(os.path.join(active_db_path(db_root), rag_utils.MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)["documents"]
+
+
+def test_first_build_indexes_every_file(project):
+    upload_dir, db_root = project
+    result = build(upload_dir)
+    assert (result["added"], result["unchanged"]) == (3, 0)
+    assert result["chunks_embedded"] == result["chunks_processed"] > 3
+    documents = manifest(db_root)
+    assert sorted(documents) == ["spec_00000.md", "spec_00001.md", "spec_00002.md"]
+    assert index_ids(db_root) == {i for entry in documents.values() for i in entry["chunk_ids"]}
+
+
+def test_unchanged_corpus_keeps_the_active_generation(project):
+    upload_dir, db_root = project
+    build(upload_dir)
+    generation = active_db_path(db_root)
+    result = build(upload_dir)
+    assert (result["unchanged"], result["chunks_embedded"], result["chunks_deleted"]) == (3, 0, 0)
+    assert active_db_path(db_root) == generation
+
+
+def test_rebuild_applies_only_the_diff(project):
+    upload_dir, db_root = project
+    build(upload_dir)
+    before = manifest(db_root)
+
+    with open(os.path.join(upload_dir, "spec_00000.md"), "a", encoding="utf-8") as f:
+        f.write("\n\nRule 0.99: a coupon entered twice is applied once.")
+    os.remove(os.path.join(upload_dir, "spec_00001.md"))
+    with open(os.path.join(upload_dir, "logo.png"), "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\xff\xfe\x00")
+    result = build(upload_dir)
+
+    assert {k: result[k] for k in ("added", "updated", "deleted", "unchanged", "skipped")} == \
+        {"added": 0, "updated": 1, "deleted": 1, "unchanged": 1, "skipped": 1}
+    assert result["skipped_files"][0]["source"] == "logo.png"
+    after = manifest(db_root)
+    assert sorted(after) == ["spec_00000.md", "spec_00002.md"]
+    assert after["spec_00002.md"] == before["spec_00002.md"]
+    # Only the edited tail of spec_00000.md is embedded again
+    changed = set(after["spec_00000.md"]["chunk_ids"]) - set(before["spec_00000.md"]["chunk_ids"])
+    assert 0 < result["chunks_embedded"] == len(changed) < len(after["spec_00000.md"]["chunk_ids"])
+    assert index_ids(db_root) == {i for entry in after.values() for i in entry["chunk_ids"]}
@@ -0,0 +1,84 @@
+import time
+import asyncio
+import threading
+from collections import deque
+
+import pytest
+
+from backend.llm_gateway import LLMGateway, Route, track_answering_models
+from benchmarks.service_bench import free_port
+from benchmarks.stub_llm_server import build_parser, create_app
+
+RPM = 3
+
+
+@pytest.fixture(scope="module")
+def stub_server():
+    """
+    benchmarks/stub_llm_server.py on a free port: (base URL, its state).
+    """
+    import uvicorn
+
+    app = create_app(build_parser().parse_args(["--latency", "0.01", "--tokens", "20", "--rpm", str(RPM)]))
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=free_port(), log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    yield f"http://127.0.0.1:{server.config.port}", app.state.stub
+    server.should_exit = True
+    thread.join(timeout=5)
+
+
+def make_gateway(base_url: str):
+    """
+    Primary model on keys a and b, fallback model on key c.
+    """
+    from langchain_groq import ChatGroq
+
+    routes = []
+    for model, key in (("primary", "key-a"), ("primary", "key-b"), ("fallback", "key-c")):
+        client = ChatGroq(model=model, api_key=key, base_url=base_url, timeout=10, max_retries=0)
+        routes.append(Route(f"{key}/{model}", model, client, requests_per_minute=1000, tokens_per_minute=10 ** 6))
+    return LLMGateway(routes=routes, primary_model="primary", fallback_model="fallback", max_retries=2, backoff_max=2.0)
+
+
+def exhaust(state, key: str):
+    # The stub counts requests per key over the last minute
+    state.requests_by_key[key] = deque([time.monotonic()] * RPM)
+
+
+def test_rotation_on_429_then_fallback(stub_server):
+    base_url, state = stub_server
+    state.requests_by_key.clear()
+    gateway = make_gateway(base_url)
+    a, b, c = gateway.routes
+
+    async def call():
+        models = track_answering_models()
+        message = await gateway.ainvoke("Generate test cases for the discount code")
+        assert message.content
+        return models
+
+    # One event loop throughout: the provider clients keep their connections
+    async def scenario():
+        # Idle keys take turns
+        for _ in range(2):
+            await call()
+        assert (a.calls, b.calls) == (1, 1)
+
+        # key-a throttled: its 429 moves the call to key-b right away
+        exhaust(state, "key-a")
+        state.requests_by_key.pop("key-b", None)
+        for _ in range(2):
+            assert await call() == {"primary"}
+        assert a.rate_limited == 1 and a.cooldown_left() > gateway.backoff_max
+        assert b.calls == 3 and b.errors == 0
+
+        # Every primary key throttled for longer than backoff_max: the fallback answers
+        exhaust(state, "key-b")
+        started = time.monotonic()
+        assert await call() == {"fallback"}
+        assert c.calls == 1 and time.monotonic() - started < gateway.backoff_max
+
+    asyncio.run(scenario())
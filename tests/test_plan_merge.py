@@ -0,0 +1,39 @@
+from backend.plan_merge import merge_test_cases, stable_test_id
+
+
+def case(test_id, description, expected, source="product_specs.md"):
+    return {"test_id": test_id, "description": description, "expected_result": expected, "grounded_in": source}
+
+
+DISCOUNT = case("TC-001", "Apply the SAVE15 discount code at checkout", "The total drops by 15%")
+SHIPPING = case("TC-002", "Choose express shipping", "Ten dollars are added to the total")
+
+
+def test_duplicates_across_features_are_merged():
+    near_duplicate = case("TC-007", "Apply the SAVE15 discount code at checkout", "The total drops by 15% right away", "ui.md")
+    cases, stats = merge_test_cases([
+        ("discounts", [DISCOUNT, SHIPPING]),
+        ("shipping", [dict(SHIPPING, test_id="TC-001"), near_duplicate]),
+    ])
+    assert [c["source_test_id"] for c in cases] == ["TC-001", "TC-002"]
+    assert cases[0]["features"] == ["discounts", "shipping"] and cases[0]["feature"] == "discounts"
+    assert cases[0]["grounded_in"] == "product_specs.md"
+    assert stats == {"generated": 4, "invalid": 0, "duplicates_removed": 2, "test_cases": 2}
+
+
+def test_ids_come_from_the_content():
+    cases, _ = merge_test_cases([("discounts", [DISCOUNT])])
+    again, _ = merge_test_cases([("other", [SHIPPING]), ("discounts", [dict(DISCOUNT, test_id="X-9", description="apply the  SAVE15 discount code AT checkout")])])
+    assert cases[0]["test_id"] == stable_test_id(DISCOUNT) == again[1]["test_id"]
+    assert cases[0]["test_id"].startswith("TP-") and len(cases[0]["test_id"]) == 11
+
+
+def test_invalid_cases_are_counted_not_kept():
+    cases, stats = merge_test_cases([("discounts", [DISCOUNT, {"description": "No expected result"}, "not an object"])])
+    assert len(cases) == 1 and stats["invalid"] == 2 and stats["generated"] == 3
+
+
+def test_distinct_cases_stay_apart_below_the_threshold():
+    similar = case("TC-003", "Apply the SAVE15 discount code twice", "Only one discount is applied")
+    cases, stats = merge_test_cases([("discounts", [DISCOUNT, similar])], threshold=0.9)
+    assert len(cases) == 2 and stats["duplicates_removed"] == 0
@@ -0,0 +1,36 @@
+import os
+import sys
+import json
+import subprocess
+
+from backend.runner import run_suite
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_sample_script_passes_on_fake_driver():
+    """
+    test_run.py (a generated script) runs through the CLI on the in-process
+    checkout model, with its fixed sleeps rewritten into condition waits.
+    """
+    completed = subprocess.run(
+        [sys.executable, "-m", "backend.runner", "test_run.py", "--driver", "fake", "--fast", "--ndjson"],
+        cwd=ROOT, capture_output=True, text=True, timeout=60,
+    )
+    lines = [json.loads(line) for line in completed.stdout.splitlines() if line.startswith("{")]
+    assert completed.returncode == 0, completed.stdout + completed.stderr
+    assert lines[-1]["done"] and lines[-1]["passed"] == lines[-1]["total"] == 1
+
+
+def test_statuses_and_pure_python_timeout():
+    tests = [
+        {"test_id": "ok", "script": "print('fine')"},
+        {"test_id": "failed", "script": "assert 1 == 2, 'nope'"},
+        {"test_id": "error", "script": "raise ValueError('bad')"},
+        {"test_id": "spin", "script": "while True:\n    pass\n"},
+    ]
+    report = run_suite(tests, workers=2, driver="fake", timeout=1.0)
+    statuses = {r["test_id"]: r["status"] for r in report["results"]}
+    assert statuses == {"ok": "passed", "failed": "failed", "error": "error", "spin": "timeout"}
+    spin = report["results"][3]
+    assert spin["duration_s"] < 5 and spin["source_line"] in ("while True:", "pass")
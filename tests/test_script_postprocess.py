@@ -0,0 +1,65 @@
+import ast
+
+from backend.script_postprocess import optimize_script
+
+SCRIPT = '''```python
+import time
+from selenium import webdriver
+from selenium.webdriver.common.by import By
+
+browser = webdriver.Chrome()
+browser.get("file:///checkout.html")
+browser.find_element(By.ID, "discount-code").send_keys("SAVE15")
+browser.find_element(By.ID, "apply-discount").click()
+time.sleep(3)  # wait for the total
+assert browser.find_element(By.ID, "total-price").text == "85.00"
+time.sleep(2)
+browser.quit()
+```'''
+
+
+def test_sleeps_become_condition_waits_or_are_dropped():
+    script, report = optimize_script(SCRIPT)
+    ast.parse(script)
+    lines = script.splitlines()
+    assert "```" not in script and "time.sleep" not in script
+    # The snapshot is taken before the run of actions that precedes the sleep
+    snapshot = lines.index("_page_before = _page_state(browser)")
+    assert lines[snapshot + 1] == 'browser.get("file:///checkout.html")'
+    assert "_wait_for_update(browser, _page_before, 3)  # wait for the total" in lines
+    assert lines[-1] == "browser.quit()" and lines[-2].startswith("assert ")
+    assert (report["sleeps_found"], report["sleeps_rewritten"], report["sleeps_removed"]) == (2, 1, 1)
+    assert report["sleep_seconds_before"] == 5.0 and report["condition_waits"] == 1
+    assert report["estimated_seconds_saved"] == 4.9
+
+
+def test_sleeps_inside_loops_and_functions_are_kept_as_waits():
+    script, report = optimize_script(
+        "from time import sleep as pause\n"
+        "def apply(driver):\n"
+        "    driver.find_element('id', 'apply').click()\n"
+        "    pause(delay)\n"
+        "for code in ['A', 'B']:\n"
+        "    pause(1)\n"
+    )
+    assert "    _wait_for_update(driver, _page_before, 10)" in script
+    assert "    _wait_for_update(driver, None, 1)" in script
+    assert report["sleeps_rewritten"] == 2 and report["sleeps_removed"] == 0
+
+
+def test_statements_sharing_a_line_are_left_alone():
+    script, report = optimize_script("import time\nx = 1; time.sleep(2)\n")
+    assert script == "import time\nx = 1; time.sleep(2)\n"
+    assert report["sleeps_found"] == 1 and report["sleeps_rewritten"] == report["sleeps_removed"] == 0
+
+
+def test_invalid_script_is_returned_unchanged():
+    script, report = optimize_script("driver.get('x'\n")
+    assert script == "driver.get('x'\n"
+    assert not report["valid"] and report["error"].startswith("SyntaxError on line")
+
+
+def test_saving_is_estimated_against_the_baseline():
+    _, report = optimize_script("import time\ntime.sleep(1)\n", baseline_seconds=12.0)
+    assert report["sleeps_removed"] == 1
+    assert report["baseline_sleep_seconds"] == 12.0 and report["estimated_seconds_saved"] == 12.0